@@ -0,0 +1,453 @@
+import fcntl
+import json
+import os
+import threading
+import zlib
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+from api.answers import typed_answer
+from api.archive import submission_archive
+from api.models import Answer, Choice, Question, Submission
+from api.sharding import shards
+
+CATEGORICAL_QUESTION_TYPES = ("radio", "checkbox")
+
+# Bumped when the layout of the files changes, so that matrices in an old layout are rebuilt
+FORMAT_VERSION = 1
+
+
+def radio_dtype(max_choice_id):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_choice_id <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def checkbox_dtype(max_choice_id):
+    # One bit per choice_id, with bit (choice_id - 1) set for each selected choice
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_choice_id <= np.iinfo(dtype).bits:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+class FormMatrix:
+    """
+    The radio and checkbox answers to a form, as one NumPy column per question indexed by
+    submission, in submission id order. Radio columns hold the selected choice_id and checkbox
+    columns hold the bitmask of selected choice_ids, each in the smallest unsigned type which
+    fits the question's choices, with 0 for submissions which did not answer the question.
+    Textbox answers are not included.
+
+    Columns are stored as .npy files under ANALYTICS_ROOT/form-<id>/, which are memory mapped
+    and preallocated to a capacity which doubles as submissions are added. `refresh` applies the
+    submissions and answers written since the last refresh, found by their increasing ids, from
+    the database and from the archive, so that a rebuilt matrix still counts archived
+    submissions. As updates to a submission replace all of its answers with new rows, updated
+    submissions are overwritten in place.
+    """
+
+    # Guard the refreshes of each form within a process, by a fixed number of locks which forms
+    # are hashed to. Refreshes by different processes are serialized by a file lock.
+    locks = [threading.Lock() for _ in range(64)]
+
+    # Number of submissions the columns are first allocated for
+    initial_capacity = 1024
+    # Number of answers, or of archived submissions, read and written at a time
+    chunk_size = 10000
+
+    def __init__(self, form_id, root=None):
+        self.form_id = form_id
+        self.path = Path(root or settings.ANALYTICS_ROOT) / f"form-{form_id}"
+        self.meta = None
+
+    @property
+    def lock(self):
+        return self.locks[zlib.crc32(str(self.path).encode()) % len(self.locks)]
+
+    def refresh(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self.lock, open(self.path / "lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self.meta = self.load_meta()
+                self.apply_new_rows()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return self
+
+    def load_meta(self):
+        try:
+            with open(self.path / "meta.json") as meta_file:
+                meta = json.load(meta_file)
+            if meta["format"] == FORMAT_VERSION:
+                return meta
+        except FileNotFoundError:
+            pass
+        return {
+            "format": FORMAT_VERSION,
+            "rows": 0,
+            "capacity": 0,
+            "last_submission_id": 0,
+            "last_answer_id": 0,
+            "columns": {},
+        }
+
+    def save_meta(self):
+        # Written last, and replaced atomically, so that an interrupted refresh is redone
+        temp_path = self.path / "meta.json.tmp"
+        with open(temp_path, "w") as meta_file:
+            json.dump(self.meta, meta_file)
+        os.replace(temp_path, self.path / "meta.json")
+
+    def apply_new_rows(self):
+        meta = self.meta
+        questions = list(
+            Question.all_objects.filter(
+                form_id=self.form_id, question_type__in=CATEGORICAL_QUESTION_TYPES
+            ).values_list("id", "question_type")
+        )
+        choice_ids = {question_id: [] for question_id, _ in questions}
+        for question_id, choice_id in (
+            Choice.objects.filter(question_id__in=choice_ids.keys())
+            .order_by("choice_id")
+            .values_list("question_id", "choice_id")
+        ):
+            choice_ids[question_id].append(choice_id)
+
+        columns_added = False
+        for question_id, question_type in questions:
+            if str(question_id) not in meta["columns"]:
+                columns_added = True
+                max_choice_id = max(choice_ids[question_id], default=1)
+                dtype = (radio_dtype if question_type == "radio" else checkbox_dtype)(
+                    max_choice_id
+                )
+                meta["columns"][str(question_id)] = {
+                    "question_type": question_type,
+                    "dtype": dtype.str,
+                    "choice_ids": choice_ids[question_id],
+                }
+                if meta["capacity"]:
+                    self.create_column(
+                        self.column_path(question_id), dtype, meta["capacity"]
+                    )
+
+        # The last answer id is read before submissions, as submissions are committed with their
+        # answers, so that the submissions of the answers up to it are read. Both are read
+        # before the archive, as submissions are archived before they are deleted.
+        using = shards.for_read(shards.for_form(self.form_id))
+        last_answer_id = (
+            Answer.objects.using(using)
+            .order_by("-id")
+            .values_list("id", flat=True)
+            .first()
+            or 0
+        )
+        submission_ids = list(
+            Submission.objects.using(using)
+            .filter(form_id=self.form_id, id__gt=meta["last_submission_id"])
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        index = submission_archive.get_index(self.form_id)
+        index = index[
+            np.searchsorted(index[:, 0], meta["last_submission_id"], side="right") :
+        ]
+        answer_chunks = self.answer_chunks(using, choice_ids.keys(), last_answer_id)
+        answers = next(answer_chunks, None)
+        if answers is None and not submission_ids and not len(index):
+            # Nothing to write, unless questions were added
+            if columns_added:
+                self.save_meta()
+            return
+
+        # Submissions being archived may be in both
+        submission_ids = np.union1d(
+            np.array(submission_ids, dtype=np.int64), index[:, 0]
+        )
+        rows = meta["rows"] + len(submission_ids)
+        if rows > meta["capacity"]:
+            self.grow(max(self.initial_capacity, 2 * rows))
+
+        submissions = self.open_column(self.path / "submissions.npy", "r+")
+        submissions[meta["rows"] : rows] = submission_ids
+        submissions.flush()
+
+        # Archived answers are older than the answers of the same submissions in the database
+        for start in range(0, len(index), self.chunk_size):
+            self.write_answers(
+                self.archived_answers(index[start : start + self.chunk_size]),
+                submissions[:rows],
+            )
+        if answers is not None:
+            for answers in chain([answers], answer_chunks):
+                self.write_answers(answers, submissions[:rows])
+
+        meta["rows"] = rows
+        if len(submission_ids):
+            meta["last_submission_id"] = int(submission_ids[-1])
+        self.save_meta()
+
+    def answer_chunks(self, using, question_ids, last_answer_id):
+        """
+        Yields the answers to the given questions written since the last refresh, up to
+        `last_answer_id`, in arrays of up to `chunk_size` rows of (answer id, submission id,
+        question id, choice_id, choice_mask), in id order.
+        """
+        after_id = self.meta["last_answer_id"]
+        while after_id < last_answer_id:
+            chunk = list(
+                Answer.objects.using(using)
+                .filter(
+                    question_id__in=question_ids,
+                    id__gt=after_id,
+                    id__lte=last_answer_id,
+                )
+                .order_by("id")
+                .values_list(
+                    "id", "submission_id", "question_id", "choice_id", "choice_mask"
+                )[: self.chunk_size]
+            )
+            if not chunk:
+                return
+            # Typed columns which are not set, e.g. of answers which could not be parsed, are 0
+            yield np.array(
+                [
+                    (answer_id, submission_id, question_id, choice_id or 0, mask or 0)
+                    for answer_id, submission_id, question_id, choice_id, mask in chunk
+                ],
+                dtype=np.int64,
+            )
+            if len(chunk) < self.chunk_size:
+                return
+            after_id = chunk[-1][0]
+
+    def archived_answers(self, index):
+        """
+        Returns the answers to the radio and checkbox questions of the archived submissions in
+        `index`, as rows of (answer id, submission id, question id, choice_id, choice_mask).
+        Archived answers are stored as text, and are parsed again.
+        """
+        answers = []
+        for submission_id, block in index:
+            row = submission_archive.get_row(
+                self.form_id, int(block), int(submission_id)
+            )
+            for answer in row["answers"]:
+                column = self.meta["columns"].get(str(answer["question_id"]))
+                if column is None:
+                    continue
+                try:
+                    choice_id, mask = typed_answer(
+                        column["question_type"], answer["answer"]
+                    )
+                except ValueError:
+                    choice_id = mask = None
+                answers.append(
+                    (
+                        answer["id"],
+                        row["id"],
+                        answer["question_id"],
+                        choice_id or 0,
+                        mask or 0,
+                    )
+                )
+        return np.array(answers, dtype=np.int64).reshape(-1, 5)
+
+    def write_answers(self, answers, submissions):
+        """
+        Writes the values of `answers`, rows of (answer id, submission id, question id,
+        choice_id, choice_mask) in the order they were written, to the rows of their
+        submissions.
+        """
+        if not len(answers):
+            return
+        self.meta["last_answer_id"] = max(
+            self.meta["last_answer_id"], int(answers[:, 0].max())
+        )
+
+        # Answers whose submission is not in the matrix are skipped, rather than written to the
+        # row of the next submission
+        row_indexes = np.searchsorted(submissions, answers[:, 1])
+        found = row_indexes < len(submissions)
+        found[found] = submissions[row_indexes[found]] == answers[found, 1]
+        answers, row_indexes = answers[found], row_indexes[found]
+        for question_id in np.unique(answers[:, 2]):
+            value_index = (
+                3
+                if self.meta["columns"][str(question_id)]["question_type"] == "radio"
+                else 4
+            )
+            answered = answers[:, 2] == question_id
+            column = self.open_column(self.column_path(question_id), "r+")
+            column[row_indexes[answered]] = answers[answered, value_index]
+            column.flush()
+
+    def column_path(self, question_id):
+        return self.path / f"question-{question_id}.npy"
+
+    def create_column(self, path, dtype, capacity, values=None):
+        temp_path = path.with_suffix(".npy.tmp")
+        column = np.lib.format.open_memmap(
+            temp_path, mode="w+", dtype=dtype, shape=(capacity,)
+        )
+        if values is not None:
+            column[: len(values)] = values
+        column.flush()
+        del column
+        os.replace(temp_path, path)
+
+    def open_column(self, path, mode="r"):
+        return np.load(path, mmap_mode=mode)
+
+    def grow(self, capacity):
+        rows = self.meta["rows"]
+        paths = [(self.path / "submissions.npy", np.dtype(np.int64))] + [
+            (self.column_path(question_id), np.dtype(column["dtype"]))
+            for question_id, column in self.meta["columns"].items()
+        ]
+        for path, dtype in paths:
+            values = self.open_column(path)[:rows] if rows else None
+            self.create_column(path, dtype, capacity, values)
+        self.meta["capacity"] = capacity
+
+    def column(self, question_id):
+        """
+        Returns the values of a question's column, one per submission.
+        """
+        if not self.meta["capacity"]:
+            return np.zeros(0, dtype=self.meta["columns"][str(question_id)]["dtype"])
+        return self.open_column(self.column_path(question_id))[: self.meta["rows"]]
+
+    def choice_ids(self, question_id):
+        return self.meta["columns"][str(question_id)]["choice_ids"]
+
+    def has_question(self, question_id):
+        return str(question_id) in self.meta["columns"]
+
+    @property
+    def question_ids(self):
+        return [int(question_id) for question_id in self.meta["columns"]]
+
+    def indicators(self, question_id, choice_ids=None):
+        """
+        Returns a boolean matrix of (submissions, choice_ids), of whether each submission selected
+        each of the given choices of a question, or of all its choices.
+        """
+        choice_ids = np.array(
+            self.choice_ids(question_id) if choice_ids is None else choice_ids,
+            dtype=np.uint64,
+        )
+        values = self.column(question_id).astype(np.uint64)[:, np.newaxis]
+        if self.meta["columns"][str(question_id)]["question_type"] == "radio":
+            return values == choice_ids
+        return (values >> (choice_ids - np.uint64(1))) & np.uint64(1) == 1
+
+    def select(self, filters):
+        """
+        Returns a boolean mask of the submissions which, for each (question id, choice_ids) in
+        `filters`, selected any of the given choices.
+        """
+        selected = np.ones(self.meta["rows"], dtype=bool)
+        for question_id, choice_ids in filters:
+            selected &= self.indicators(question_id, choice_ids).any(axis=1)
+        return selected
+
+    def counts(self, question_id, selected):
+        """
+        Returns {choice_id: number of selected submissions which selected the choice}.
+        """
+        counts = self.indicators(question_id)[selected].sum(axis=0)
+        return dict(zip(self.choice_ids(question_id), counts.tolist()))
+
+    def crosstab(self, question_id, by_question_id, selected):
+        """
+        Returns {choice_id: {by choice_id: count}} of the selected submissions which selected
+        both choices.
+        """
+        indicators = self.indicators(question_id)[selected].astype(np.int64)
+        by_indicators = self.indicators(by_question_id)[selected].astype(np.int64)
+        counts = indicators.T @ by_indicators
+        by_choice_ids = self.choice_ids(by_question_id)
+        return {
+            choice_id: dict(zip(by_choice_ids, row))
+            for choice_id, row in zip(self.choice_ids(question_id), counts.tolist())
+        }
+
+
+class FormAnalytics:
+    """
+    Counts the answers of a form's matrix from URL parameters:
+    * `question`: a radio or checkbox question to count the choices of. Defaults to every radio
+      and checkbox question of the form
+    * `by`: a second question, to cross-tabulate the choices of `question` against
+    * `filter`: `<question id>:<comma separated choice_ids>`, only counts submissions which
+      selected any of the choices. Can be given multiple times, to require every filter
+    """
+
+    INVALID_INTEGER_MESSAGE = "A valid integer is required."
+    UNKNOWN_QUESTION_MESSAGE = "Not a radio or checkbox question of this form!"
+    INVALID_FILTER_MESSAGE = (
+        "Filters must be a question id and comma separated choice_ids, e.g. 1:2,3"
+    )
+    BY_WITHOUT_QUESTION_MESSAGE = "question is required to cross-tabulate by!"
+
+    def __init__(self, matrix, params):
+        self.matrix = matrix
+        self.params = params
+
+    def get_results(self):
+        params = self.params
+        question_id = self.parse_question(params, "question")
+        by_question_id = self.parse_question(params, "by")
+        if by_question_id is not None and question_id is None:
+            raise ValidationError({"by": [self.BY_WITHOUT_QUESTION_MESSAGE]})
+        filters = [self.parse_filter(value) for value in params.getlist("filter")]
+
+        selected = self.matrix.select(filters)
+        question_ids = (
+            [question_id] if question_id is not None else self.matrix.question_ids
+        )
+        results = {
+            "form_id": self.matrix.form_id,
+            "submissions": int(selected.sum()),
+            "counts": {
+                question_id: self.matrix.counts(question_id, selected)
+                for question_id in question_ids
+            },
+        }
+        if by_question_id is not None:
+            results["crosstab"] = self.matrix.crosstab(
+                question_id, by_question_id, selected
+            )
+        return results
+
+    def parse_question(self, params, name):
+        if name not in params:
+            return None
+        try:
+            question_id = int(params[name])
+        except ValueError:
+            raise ValidationError({name: [self.INVALID_INTEGER_MESSAGE]})
+        if not self.matrix.has_question(question_id):
+            raise ValidationError({name: [self.UNKNOWN_QUESTION_MESSAGE]})
+        return question_id
+
+    def parse_filter(self, value):
+        try:
+            question_id, choice_ids = value.split(":")
+            question_id = int(question_id)
+            choice_ids = [int(choice_id) for choice_id in choice_ids.split(",")]
+        except ValueError:
+            raise ValidationError({"filter": [self.INVALID_FILTER_MESSAGE]})
+        if not self.matrix.has_question(question_id):
+            raise ValidationError({"filter": [self.UNKNOWN_QUESTION_MESSAGE]})
+        if not set(choice_ids).issubset(self.matrix.choice_ids(question_id)):
+            raise ValidationError({"filter": [self.INVALID_FILTER_MESSAGE]})
+        return question_id, choice_ids
@@ -0,0 +1,61 @@
+# Checkbox answers are stored as a bitmask in a signed 64 bit column, with bit (choice_id - 1)
+# set for each selected choice
+MAX_CHECKBOX_CHOICES = 63
+
+
+def parse_choice_ids(question_type, answer):
+    """
+    Returns the choice_ids selected by a radio answer, the choice_id as text, or by a checkbox
+    answer, comma separated choice_ids which may be empty. Returns an empty list for textbox
+    answers.
+
+    Raises ValueError for answers which are not in this format.
+    """
+    if question_type == "radio":
+        return [int(answer)]
+    if question_type == "checkbox":
+        return [int(value) for value in answer.split(",")] if answer else []
+    return []
+
+
+def choice_mask(choice_ids):
+    mask = 0
+    for choice_id in choice_ids:
+        if not 1 <= choice_id <= MAX_CHECKBOX_CHOICES:
+            raise ValueError(f"choice_id {choice_id} cannot be stored in a bitmask")
+        mask |= 1 << (choice_id - 1)
+    return mask
+
+
+def mask_choice_ids(mask):
+    """
+    Returns the choice_ids selected by a checkbox bitmask, in ascending order.
+    """
+    return [bit + 1 for bit in range(MAX_CHECKBOX_CHOICES) if mask & (1 << bit)]
+
+
+def typed_answer(question_type, answer):
+    """
+    Returns the (choice_id, choice_mask) columns of an answer: the selected choice_id of radio
+    answers, and the bitmask of selected choice_ids of checkbox answers. Columns which do not
+    apply to the question type are None.
+
+    Raises ValueError for radio and checkbox answers which cannot be stored as integers.
+    """
+    choice_ids = parse_choice_ids(question_type, answer)
+    if question_type == "radio":
+        return choice_ids[0], None
+    if question_type == "checkbox":
+        return None, choice_mask(choice_ids)
+    return None, None
+
+
+def answer_choice_ids(choice_id, choice_mask):
+    """
+    Returns the choice_ids selected by an answer, from its typed columns.
+    """
+    if choice_id is not None:
+        return [choice_id]
+    if choice_mask is not None:
+        return mask_choice_ids(choice_mask)
+    return []
@@ -0,0 +1,479 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from api.models import Answer, Submission
+from api.sharding import shards
+from api.sqlite import retry_on_busy
+
+# Bumped when the layout of the files changes
+FORMAT_VERSION = 1
+
+
+class SubmissionArchive:
+    """
+    Submissions of closed forms, moved out of the database into compressed, append-only segment
+    files under SUBMISSION_ARCHIVE["ROOT"]/form-<id>/, from which the submission endpoints keep
+    serving them.
+
+    Submissions are archived in id order, in blocks of `block_size` submissions with their
+    answers, each a zlib compressed JSON list. Blocks are appended to the last segment file until
+    it holds `segment_size` bytes. meta.json lists the (segment, offset, length) of every block,
+    and index.npy is the row index: the (submission id, block) of every archived submission,
+    sorted by id. forms.json holds the range of submission ids of each archived form, so that a
+    submission is found from its id alone. Decoded blocks are kept in a per process LRU of
+    `cache_blocks` blocks.
+
+    Archived submissions are read only. A form archived again has the submissions written since
+    appended in new blocks. The tallies of archived answers are kept, and rebuilding the tallies
+    or the analytics matrix of a form counts its archived answers again.
+    """
+
+    def __init__(self, block_size, segment_size, cache_blocks, delete_chunk_size):
+        self.block_size = block_size
+        self.segment_size = segment_size
+        self.cache_blocks = cache_blocks
+        self.delete_chunk_size = delete_chunk_size
+        self.blocks = OrderedDict()
+        # {path: ((inode, modification time), contents)} of the JSON and index files read
+        self.files = {}
+        self.lock = threading.Lock()
+
+    @property
+    def path(self):
+        return Path(settings.SUBMISSION_ARCHIVE["ROOT"])
+
+    def form_path(self, form_id):
+        return self.path / f"form-{form_id}"
+
+    def segment_path(self, form_id, segment):
+        return self.form_path(form_id) / f"segment-{segment:05d}.bin"
+
+    def get(self, submission_id):
+        """
+        Returns the values row of an archived submission, with its answers, or None.
+        """
+        try:
+            submission_id = int(submission_id)
+        except (TypeError, ValueError):
+            return None
+        for form_id, (first_id, last_id) in self.get_forms().items():
+            if not first_id <= submission_id <= last_id:
+                continue
+            index = self.get_index(form_id)
+            position = np.searchsorted(index[:, 0], submission_id)
+            if position < len(index) and index[position, 0] == submission_id:
+                return self.get_row(form_id, int(index[position, 1]), submission_id)
+        return None
+
+    def select(self, form_id=None, id__in=None, after_id=None):
+        """
+        Returns the archived submissions matching the filters of SubmissionFilterBackend, which
+        are paginated with the submissions of the database.
+        """
+        return ArchivedSubmissions(self, form_id, id__in, after_id)
+
+    def form_rows(self, form_id):
+        """
+        Yields the values rows of the archived submissions to a form, in id order.
+        """
+        if form_id not in self.get_forms():
+            return
+        index = self.get_index(form_id)
+        for submission_id, block in index:
+            yield self.get_row(form_id, int(block), int(submission_id))
+
+    def get_forms(self):
+        """
+        Returns {form id: (first, last) archived submission id}, in form id order.
+        """
+        forms = self.read_file(self.path / "forms.json", default={})
+        return {
+            int(form_id): tuple(forms[form_id]) for form_id in sorted(forms, key=int)
+        }
+
+    def get_meta(self, form_id):
+        return self.read_file(
+            self.form_path(form_id) / "meta.json",
+            default={"format": FORMAT_VERSION, "segments": 0, "blocks": []},
+        )
+
+    def get_index(self, form_id):
+        return self.read_file(
+            self.form_path(form_id) / "index.npy",
+            default=np.zeros((0, 2), dtype=np.int64),
+        )
+
+    def read_file(self, path, default):
+        """
+        Reads a JSON or index file, again only once it was replaced.
+        """
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return default
+        # Files are replaced rather than written in place, so a new file has a new inode
+        modified = (stat.st_ino, stat.st_mtime_ns)
+        with self.lock:
+            cached = self.files.get(path)
+        if cached is not None and cached[0] == modified:
+            return cached[1]
+
+        if path.suffix == ".npy":
+            contents = np.load(path, mmap_mode="r")
+        else:
+            with open(path) as json_file:
+                contents = json.load(json_file)
+        with self.lock:
+            self.files[path] = (modified, contents)
+        return contents
+
+    def get_row(self, form_id, block, submission_id):
+        submission_ids, rows = self.get_block(form_id, block)
+        return rows[bisect_left(submission_ids, submission_id)]
+
+    def get_block(self, form_id, block):
+        """
+        Returns the (sorted submission ids, values rows) of a block.
+        """
+        segment, offset, length = self.get_meta(form_id)["blocks"][block]
+        key = (self.segment_path(form_id, segment), offset)
+        with self.lock:
+            decoded = self.blocks.get(key)
+            if decoded is not None:
+                self.blocks.move_to_end(key)
+                return decoded
+
+        with open(key[0], "rb") as segment_file:
+            segment_file.seek(offset)
+            decoded = self.decode_block(form_id, segment_file.read(length))
+
+        with self.lock:
+            self.blocks[key] = decoded
+            self.blocks.move_to_end(key)
+            while len(self.blocks) > self.cache_blocks:
+                self.blocks.popitem(last=False)
+        return decoded
+
+    def encode_block(self, submissions, answers):
+        return zlib.compress(
+            json.dumps(
+                [
+                    [
+                        submission_id,
+                        form_version,
+                        revision,
+                        updated_at.isoformat(),
+                        answers.get(submission_id, []),
+                    ]
+                    for submission_id, form_version, revision, updated_at in submissions
+                ],
+                separators=(",", ":"),
+            ).encode()
+        )
+
+    def decode_block(self, form_id, data):
+        rows = [
+            {
+                "id": submission_id,
+                "form_id": form_id,
+                "form_version": form_version,
+                "revision": revision,
+                "updated_at": datetime.fromisoformat(updated_at),
+                # Archived rows carry their answers, see SubmissionValuesSerializer
+                "answers": [
+                    {"id": answer_id, "answer": answer, "question_id": question_id}
+                    for answer_id, question_id, answer in answers
+                ],
+            }
+            for submission_id, form_version, revision, updated_at, answers in json.loads(
+                zlib.decompress(data)
+            )
+        ]
+        return [row["id"] for row in rows], rows
+
+    def archive(self, form_id):
+        """
+        Moves the submissions of a form, and their answers, from the database to the archive.
+        Submissions are deleted in chunks once their blocks and the index are written, and the
+        ones archived by an interrupted run are deleted again. Submissions are only deleted if
+        their revision is still the archived one: those updated meanwhile stay in the database,
+        where they are served from, and are archived again by the next run.
+
+        Returns the number of submissions archived.
+        """
+        form_path = self.form_path(form_id)
+        form_path.mkdir(parents=True, exist_ok=True)
+        using = shards.for_form(form_id)
+        with open(form_path / "lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                meta = dict(self.get_meta(form_id))
+                meta["blocks"] = list(meta["blocks"])
+                entries, revisions = self.append_blocks(form_id, using, meta)
+                if entries:
+                    self.save_index(form_id, entries)
+                    self.save_json(form_path / "meta.json", meta)
+                    self.save_form_range(form_id)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        revisions = list(revisions.items())
+        for start in range(0, len(revisions), self.delete_chunk_size):
+            delete_submissions(
+                using, dict(revisions[start : start + self.delete_chunk_size])
+            )
+        return len(entries)
+
+    def append_blocks(self, form_id, using, meta):
+        """
+        Appends the submissions of a form which are not archived yet, or were updated since they
+        were archived, to its segments. Returns their (submission id, block) entries, and the
+        {submission id: revision} of every submission read, as archived.
+        """
+        index = self.get_index(form_id)
+        archived_ids = np.array(index[:, 0])
+        submissions = (
+            Submission.objects.using(using)
+            .filter(form_id=form_id)
+            .order_by("id")
+            .values_list("id", "form_version", "revision", "updated_at")
+            .iterator(chunk_size=self.block_size)
+        )
+        entries, revisions = [], {}
+        segment_file = None
+        try:
+            while True:
+                chunk = list(islice(submissions, self.block_size))
+                if not chunk:
+                    break
+                positions = np.searchsorted(archived_ids, [row[0] for row in chunk])
+                new_rows = []
+                for row, position in zip(chunk, positions):
+                    revisions[row[0]] = row[2]
+                    if (
+                        position >= len(archived_ids)
+                        or archived_ids[position] != row[0]
+                        or self.get_row(form_id, int(index[position, 1]), row[0])[
+                            "revision"
+                        ]
+                        != row[2]
+                    ):
+                        new_rows.append(row)
+                chunk = new_rows
+                if not chunk:
+                    continue
+
+                answers = {}
+                for answer_id, submission_id, question_id, answer in (
+                    Answer.objects.using(using)
+                    .filter(submission_id__in=[row[0] for row in chunk])
+                    .order_by("id")
+                    .values_list("id", "submission_id", "question_id", "answer")
+                ):
+                    answers.setdefault(submission_id, []).append(
+                        [answer_id, question_id, answer]
+                    )
+                data = self.encode_block(chunk, answers)
+
+                if segment_file is None or segment_file.tell() >= self.segment_size:
+                    if segment_file is not None:
+                        self.close_segment(segment_file)
+                    segment_file = self.open_segment(form_id, meta)
+                meta["blocks"].append(
+                    [meta["segments"], segment_file.tell(), len(data)]
+                )
+                segment_file.write(data)
+                block = len(meta["blocks"]) - 1
+                entries += [(row[0], block) for row in chunk]
+        finally:
+            if segment_file is not None:
+                self.close_segment(segment_file)
+        return entries, revisions
+
+    def open_segment(self, form_id, meta):
+        # Appends to the last segment, until it is full
+        if meta["segments"]:
+            segment_file = open(self.segment_path(form_id, meta["segments"]), "ab")
+            if segment_file.tell() < self.segment_size:
+                return segment_file
+            segment_file.close()
+        meta["segments"] += 1
+        return open(self.segment_path(form_id, meta["segments"]), "ab")
+
+    def close_segment(self, segment_file):
+        segment_file.flush()
+        os.fsync(segment_file.fileno())
+        segment_file.close()
+
+    def save_index(self, form_id, entries):
+        path = self.form_path(form_id) / "index.npy"
+        index = np.concatenate(
+            [self.get_index(form_id), np.array(entries, dtype=np.int64)]
+        )
+        index = index[np.argsort(index[:, 0], kind="stable")]
+        # Submissions archived again, once updated, keep only their last entry
+        index = index[np.append(index[1:, 0] != index[:-1, 0], True)]
+        temp_path = path.with_suffix(".npy.tmp")
+        with open(temp_path, "wb") as index_file:
+            np.save(index_file, index)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        os.replace(temp_path, path)
+
+    def save_form_range(self, form_id):
+        index = self.get_index(form_id)
+        with open(self.path / "lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                forms = {
+                    str(archived_form_id): list(submission_range)
+                    for archived_form_id, submission_range in self.get_forms().items()
+                }
+                forms[str(form_id)] = [int(index[0, 0]), int(index[-1, 0])]
+                self.save_json(self.path / "forms.json", forms)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def delete(self, form_id):
+        """
+        Deletes the archived submissions of a form, once the form is deleted.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path / "lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                forms = {
+                    str(archived_form_id): list(submission_range)
+                    for archived_form_id, submission_range in self.get_forms().items()
+                    if archived_form_id != form_id
+                }
+                self.save_json(self.path / "forms.json", forms)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        shutil.rmtree(self.form_path(form_id), ignore_errors=True)
+        with self.lock:
+            for key in [
+                key for key in self.blocks if key[0].parent == self.form_path(form_id)
+            ]:
+                del self.blocks[key]
+
+    def save_json(self, path, contents):
+        # Replaced atomically, so that readers see either version
+        temp_path = path.with_name(path.name + ".tmp")
+        with open(temp_path, "w") as json_file:
+            json.dump(contents, json_file)
+        os.replace(temp_path, path)
+
+
+class ArchivedSubmissions:
+    """
+    The archived submissions matching filters, read a keyset page at a time by
+    KeysetPagination in (form_id, id) order.
+    """
+
+    def __init__(self, archive, form_id, id__in, after_id):
+        self.archive = archive
+        self.form_id = form_id
+        self.id__in = id__in
+        self.after_id = after_id
+
+    def keyset_page(self, position, reverse, limit):
+        """
+        Returns up to `limit` values rows after the (form id, submission id) `position`, or
+        before it if `reverse`, in key order.
+        """
+        form_ids = [
+            form_id
+            for form_id in self.archive.get_forms()
+            if self.form_id is None or form_id == self.form_id
+        ]
+        if reverse:
+            form_ids.reverse()
+
+        rows = []
+        for form_id in form_ids:
+            if position is not None and (
+                form_id < position[0] if not reverse else form_id > position[0]
+            ):
+                continue
+            index = self.archive.get_index(form_id)
+            ids = index[:, 0]
+            start, end = 0, len(ids)
+            if self.after_id is not None:
+                start = max(start, np.searchsorted(ids, self.after_id, side="right"))
+            if position is not None and form_id == position[0]:
+                if reverse:
+                    end = min(end, np.searchsorted(ids, position[1], side="left"))
+                else:
+                    start = max(start, np.searchsorted(ids, position[1], side="right"))
+
+            if self.id__in is not None:
+                wanted = sorted(set(self.id__in))
+                positions = [
+                    int(found)
+                    for found, submission_id in zip(
+                        np.searchsorted(ids, wanted), wanted
+                    )
+                    if start <= found < end and ids[found] == submission_id
+                ]
+            else:
+                positions = range(start, end)
+            if reverse:
+                positions = reversed(positions)
+
+            for row_position in islice(positions, limit - len(rows)):
+                submission_id, block = index[row_position]
+                rows.append(
+                    self.archive.get_row(form_id, int(block), int(submission_id))
+                )
+            if len(rows) >= limit:
+                break
+        return rows
+
+
+@retry_on_busy
+def delete_submissions(using, revisions):
+    """
+    Deletes the submissions of {submission id: archived revision}, and their answers, unless
+    they were updated since they were archived. Updated submissions stay in the database, and
+    are archived again by the next run. Returns the number of submissions deleted.
+    """
+    with transaction.atomic(using=using):
+        # Locked until the transaction ends. On SQLite, the transaction instead fails to take
+        # the write lock if another one wrote meanwhile, and is retried.
+        current = (
+            Submission.objects.using(using)
+            .select_for_update()
+            .filter(id__in=revisions.keys())
+            .values_list("id", "revision")
+        )
+        deleted_ids = [
+            submission_id
+            for submission_id, revision in current
+            if revisions[submission_id] == revision
+        ]
+        Answer.objects.using(using).filter(submission_id__in=deleted_ids).delete()
+        Submission.objects.using(using).filter(id__in=deleted_ids).delete()
+    return len(deleted_ids)
+
+
+submission_archive = SubmissionArchive(
+    block_size=settings.SUBMISSION_ARCHIVE["BLOCK_SIZE"],
+    segment_size=settings.SUBMISSION_ARCHIVE["SEGMENT_SIZE"],
+    cache_blocks=settings.SUBMISSION_ARCHIVE["CACHE_BLOCKS"],
+    delete_chunk_size=settings.SUBMISSION_ARCHIVE["DELETE_CHUNK_SIZE"],
+)
@@ -0,0 +1,14 @@
+from django.urls import path
+from . import async_views
+
+# Asynchronous equivalents of the read endpoints in api.urls, for ASGI servers
+urlpatterns = [
+    path("forms/", async_views.form_list, name="async-forms-list"),
+    path("forms/<pk>/", async_views.form_detail, name="async-forms-detail"),
+    path("submissions/", async_views.submission_list, name="async-submissions-list"),
+    path(
+        "submissions/<pk>/",
+        async_views.submission_detail,
+        name="async-submissions-detail",
+    ),
+]
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponseNotAllowed
+
+from .metrics import capture_queries, current_request_metrics
+from .views import FormViewSet, SubmissionViewSet
+
+# NOTE: The ORM of this version of Django is synchronous. Under ASGI, Django runs every
+# synchronous view on one shared thread, so a slow query holds up every other request. These
+# views run the same DRF read actions on a bounded pool of threads instead, each with its own
+# database connection, while the event loop serves any number of slow clients.
+read_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_READ_WORKERS, thread_name_prefix="async-read"
+)
+
+SAFE_METHODS = ("GET", "HEAD")
+
+
+def read_view(viewset, action):
+    view = viewset.as_view({"get": action})
+
+    def render(metrics, request, *args, **kwargs):
+        # Follows the connection lifetime of a request, as the pool threads outlive requests
+        close_old_connections()
+        try:
+            # Query wrappers are installed per thread, so those of the request thread do not see
+            # the queries of the pool thread, which are counted here instead
+            with capture_queries(metrics) if metrics else nullcontext():
+                response = view(request, *args, **kwargs)
+                # Rendered in the pool, rather than on the event loop
+                if hasattr(response, "render"):
+                    response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    render_in_pool = sync_to_async(
+        render, thread_sensitive=False, executor=read_executor
+    )
+
+    async def async_view(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return HttpResponseNotAllowed(SAFE_METHODS)
+        # Passed explicitly, rather than relying on the context being copied to the pool
+        return await render_in_pool(
+            current_request_metrics.get(), request, *args, **kwargs
+        )
+
+    return async_view
+
+
+form_list = read_view(FormViewSet, "list")
+form_detail = read_view(FormViewSet, "retrieve")
+submission_list = read_view(SubmissionViewSet, "list")
+submission_detail = read_view(SubmissionViewSet, "retrieve")
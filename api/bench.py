@@ -0,0 +1,600 @@
+import logging
+import multiprocessing
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from api.ingestion import submission_buffer
+from api.models import Choice, Form, Question
+from api.schema import form_schema_cache
+from api.sharding import shards
+from api.sqlite import retry_on_busy
+from api.writers import bulk_create_with_pks, create_submissions
+
+QUESTION_TYPES = ("radio", "checkbox", "textbox")
+
+# Metrics compared against the baseline, and whether a higher value is worse
+COMPARED_METRICS = {
+    "p50_ms": True,
+    "p90_ms": True,
+    "p99_ms": True,
+    "throughput_rps": False,
+    "queries": True,
+    "peak_memory_kib": True,
+}
+
+# Latency differences below this are never reported, as they are within timer noise
+LATENCY_TOLERANCE_MS = 1.0
+
+# SQLite's defaults, compared with settings.SQLITE_PRAGMAS. The journal mode is stored in the
+# database file, so it is set back explicitly
+DEFAULT_SQLITE_PRAGMAS = {"journal_mode": "delete", "synchronous": "full"}
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    The scale of a benchmark dataset: `forms`, each with `questions` cycling through the question
+    types, `choices` for each radio and checkbox question, and `submissions` answering every
+    question.
+    """
+
+    forms: int
+    questions: int
+    choices: int
+    submissions: int
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    method: str
+    url_name: str
+    args: tuple = ()
+    query: dict = None
+    data: object = None
+
+
+class Benchmark:
+    """
+    Generates a dataset in the current database with bulk inserts, and times every endpoint of
+    the API against it through the Django test client, i.e. through the whole request stack
+    without a network.
+
+    Each scenario is requested once to warm up, then `iterations` times for latency percentiles
+    and throughput, once more counting queries, and once more tracing the peak Python memory
+    allocated while serving the request.
+    """
+
+    # Submissions written per create_submissions transaction while generating the dataset
+    batch_size = 500
+
+    def __init__(self, dataset, iterations):
+        self.dataset = dataset
+        self.iterations = iterations
+        self.random = random.Random(dataset.seed)
+        self.client = Client()
+
+    def run(self, log=None):
+        """
+        Returns the results of every scenario, as a JSON serializable dict.
+        """
+        with self.isolated():
+            self.generate()
+            endpoints = {}
+            for scenario in self.get_scenarios():
+                if log:
+                    log(f"{scenario.method} {scenario.name}")
+                endpoints[scenario.name] = self.measure(scenario)
+
+        return {
+            "dataset": asdict(self.dataset),
+            "iterations": self.iterations,
+            "endpoints": endpoints,
+        }
+
+    @contextmanager
+    def isolated(self):
+        """
+        Keeps the analytics matrices and cached schemas of the generated forms apart from those
+        of the database the benchmark runs next to.
+        """
+        with tempfile.TemporaryDirectory() as analytics_root, override_settings(
+            ANALYTICS_ROOT=analytics_root,
+            # Process-local, as the benchmark runs in one process
+            CACHES={
+                alias: {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": f"bench-{alias}-{uuid.uuid4().hex}",
+                }
+                for alias in settings.CACHES
+            },
+        ):
+            form_schema_cache.clear()
+            try:
+                yield
+            finally:
+                form_schema_cache.clear()
+
+    def generate(self):
+        dataset = self.dataset
+        forms = bulk_create_with_pks(
+            Form,
+            [Form(title=f"Benchmark form {i}") for i in range(1, dataset.forms + 1)],
+        )
+        questions = bulk_create_with_pks(
+            Question,
+            [
+                Question(
+                    form_id=form,
+                    display_order=display_order,
+                    question=f"Question {display_order}",
+                    question_type=self.question_type(display_order),
+                )
+                for form in forms
+                for display_order in range(1, dataset.questions + 1)
+            ],
+        )
+        Choice.objects.bulk_create(
+            [
+                Choice(
+                    question_id=question,
+                    choice_id=choice_id,
+                    choice=f"Choice {choice_id}",
+                )
+                for question in questions
+                if question.question_type != "textbox"
+                for choice_id in range(1, dataset.choices + 1)
+            ]
+        )
+
+        self.form_questions = {
+            form.id: [
+                (question.id, question.question_type)
+                for question in questions
+                if question.form_id_id == form.id
+            ]
+            for form in forms
+        }
+        entries = [
+            (form.id, form.version, self.form_questions[form.id], self.answers(form.id))
+            for form in forms
+            for _ in range(dataset.submissions)
+        ]
+        self.submission_ids = []
+        for start in range(0, len(entries), self.batch_size):
+            submissions = create_submissions(entries[start : start + self.batch_size])
+            self.submission_ids += [submission.id for submission in submissions]
+        self.form_ids = [form.id for form in forms]
+
+    def question_type(self, display_order):
+        return QUESTION_TYPES[(display_order - 1) % len(QUESTION_TYPES)]
+
+    def answers(self, form_id):
+        choice_ids = range(1, self.dataset.choices + 1)
+        answers = []
+        for _, question_type in self.form_questions[form_id]:
+            if question_type == "radio":
+                answer = str(self.random.choice(choice_ids))
+            elif question_type == "checkbox":
+                selected = self.random.sample(
+                    choice_ids, self.random.randint(1, len(choice_ids))
+                )
+                answer = ",".join(str(choice_id) for choice_id in sorted(selected))
+            else:
+                answer = f"Answer {self.random.randint(1, 1000)}"
+            answers.append({"answer": answer, "question_type": question_type})
+        return answers
+
+    def form_data(self, title):
+        return {
+            "title": title,
+            "questions": [
+                {
+                    "display_order": display_order,
+                    "question": f"Question {display_order}",
+                    "question_type": self.question_type(display_order),
+                    "choices": (
+                        [
+                            {"choice_id": choice_id, "choice": f"Choice {choice_id}"}
+                            for choice_id in range(1, self.dataset.choices + 1)
+                        ]
+                        if self.question_type(display_order) != "textbox"
+                        else []
+                    ),
+                }
+                for display_order in range(1, self.dataset.questions + 1)
+            ],
+        }
+
+    def get_scenarios(self):
+        form_id = self.form_ids[0]
+        submission_id = self.submission_ids[0]
+        # A ticket of a submission written through the buffer
+        ticket = uuid.uuid4().hex
+        submission_buffer.set_status(
+            ticket, submission_buffer.CREATED, submission_id=submission_id
+        )
+
+        return [
+            Scenario("forms-list", "GET", "forms-list"),
+            Scenario("forms-create", "POST", "forms-list", data=self.form_data("New")),
+            Scenario("forms-detail", "GET", "forms-detail", args=(form_id,)),
+            Scenario(
+                "forms-update",
+                "PUT",
+                "forms-detail",
+                args=(form_id,),
+                data=self.form_data("Benchmark form 1"),
+            ),
+            Scenario("forms-results", "GET", "forms-results", args=(form_id,)),
+            Scenario("forms-analytics", "GET", "forms-analytics", args=(form_id,)),
+            Scenario(
+                "forms-export-csv",
+                "GET",
+                "forms-export-submissions",
+                args=(form_id,),
+                query={"format": "csv"},
+            ),
+            Scenario(
+                "forms-export-ndjson",
+                "GET",
+                "forms-export-submissions",
+                args=(form_id,),
+                query={"format": "ndjson"},
+            ),
+            Scenario("submissions-list", "GET", "submissions-list"),
+            Scenario(
+                "submissions-list-include-forms",
+                "GET",
+                "submissions-list",
+                query={"include": "forms"},
+            ),
+            Scenario(
+                "submissions-create",
+                "POST",
+                "submissions-list",
+                data={"form_id": form_id, "answers": self.answers(form_id)},
+            ),
+            Scenario(
+                "submissions-detail", "GET", "submissions-detail", args=(submission_id,)
+            ),
+            Scenario(
+                "submissions-update",
+                "PUT",
+                "submissions-detail",
+                args=(submission_id,),
+                data={"answers": self.answers(form_id)},
+            ),
+            Scenario(
+                "submissions-bulk",
+                "POST",
+                "submissions-bulk",
+                data=[
+                    {"form_id": form_id, "answers": self.answers(form_id)}
+                    for _ in range(100)
+                ],
+            ),
+            Scenario("submissions-ticket", "GET", "submissions-ticket", args=(ticket,)),
+            Scenario("metrics", "GET", "metrics"),
+        ]
+
+    def request(self, scenario):
+        response = self.send(scenario, self.client)
+        if response.status_code >= 400:
+            raise AssertionError(
+                f"{scenario.method} {response.request['PATH_INFO']} returned "
+                f"{response.status_code}"
+            )
+        return response
+
+    def send(self, scenario, client):
+        path = reverse(scenario.url_name, args=scenario.args)
+        if scenario.method == "GET":
+            response = client.get(path, scenario.query or {})
+        else:
+            response = getattr(client, scenario.method.lower())(
+                path, scenario.data, content_type="application/json"
+            )
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    def measure(self, scenario):
+        self.request(scenario)
+
+        timings = []
+        start = time.perf_counter()
+        for _ in range(self.iterations):
+            request_start = time.perf_counter()
+            self.request(scenario)
+            timings.append((time.perf_counter() - request_start) * 1000)
+        elapsed = time.perf_counter() - start
+
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in database_aliases()
+            ]
+            self.request(scenario)
+        # Read before the next request, which clears the connections' query logs
+        num_queries = sum(len(queries) for queries in captured)
+
+        tracemalloc.start()
+        try:
+            self.request(scenario)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        p50, p90, p99 = np.percentile(timings, [50, 90, 99]).tolist()
+        return {
+            "method": scenario.method,
+            "url_name": scenario.url_name,
+            "p50_ms": round(p50, 3),
+            "p90_ms": round(p90, 3),
+            "p99_ms": round(p99, 3),
+            "mean_ms": round(sum(timings) / len(timings), 3),
+            "throughput_rps": round(self.iterations / elapsed, 1),
+            "queries": num_queries,
+            "peak_memory_kib": round(peak_memory / 1024, 1),
+        }
+
+
+class ConcurrencyBenchmark:
+    """
+    Compares SQLite's default settings, without retries, with settings.SQLITE_PRAGMAS and the
+    retries of settings.SQLITE_BUSY_RETRY, under concurrent requests.
+
+    For each profile, `writers` processes each make `requests` requests alternately creating and
+    updating submissions, while `readers` processes each make `requests` requests for
+    submissions and forms, all through the Django test client. Workers are forked processes, as
+    application servers run, so that they contend for SQLite's locks rather than for the GIL.
+    Requests failing with a server error, such as "database is locked", are counted as errors.
+    Should run against a database file, as in-memory databases have no journal.
+    """
+
+    def __init__(self, dataset, writers, readers, requests):
+        self.benchmark = Benchmark(dataset, iterations=0)
+        self.writers = writers
+        self.readers = readers
+        self.requests = requests
+
+    def run(self, log=None):
+        """
+        Returns the results of both profiles, as a JSON serializable dict.
+        """
+        profiles = {
+            "default": (DEFAULT_SQLITE_PRAGMAS, 1),
+            "tuned": (settings.SQLITE_PRAGMAS, settings.SQLITE_BUSY_RETRY["ATTEMPTS"]),
+        }
+        results = {}
+        with self.benchmark.isolated():
+            self.benchmark.generate()
+            for name, (pragmas, attempts) in profiles.items():
+                if log:
+                    log(f"{name} profile")
+                results[name] = self.measure(pragmas, attempts)
+
+        return {
+            "dataset": asdict(self.benchmark.dataset),
+            "writers": self.writers,
+            "readers": self.readers,
+            "requests": self.requests,
+            "profiles": results,
+        }
+
+    def measure(self, pragmas, attempts):
+        # Forked, so that workers inherit the generated dataset and the profile's settings
+        context = multiprocessing.get_context("fork")
+        results_queue = context.SimpleQueue()
+        workers = [
+            context.Process(target=self.work, args=("write", index, results_queue))
+            for index in range(self.writers)
+        ] + [
+            context.Process(target=self.work, args=("read", index, results_queue))
+            for index in range(self.readers)
+        ]
+
+        previous_attempts = retry_on_busy.attempts
+        retry_on_busy.attempts = attempts
+        try:
+            with override_settings(SQLITE_PRAGMAS=pragmas):
+                # Connects with the profile's pragmas before any worker does, as the journal
+                # mode can only be changed while no other connection is open. Closed again, as
+                # connections cannot be shared with forked processes
+                connections.close_all()
+                for alias in database_aliases():
+                    connections[alias].ensure_connection()
+                connections.close_all()
+                start = time.perf_counter()
+                for worker in workers:
+                    worker.start()
+                worker_results = [results_queue.get() for _ in workers]
+                elapsed = time.perf_counter() - start
+                for worker in workers:
+                    worker.join()
+        finally:
+            retry_on_busy.attempts = previous_attempts
+
+        results = {"elapsed_s": round(elapsed, 3)}
+        for kind in ("write", "read"):
+            kind_results = [result for result in worker_results if result[0] == kind]
+            timings = [
+                timing for _, timings, _, _ in kind_results for timing in timings
+            ]
+            # Over the time until the last worker of the kind finished
+            kind_elapsed = max((result[3] for result in kind_results), default=0)
+            p50, p99 = np.percentile(timings or [0], [50, 99]).tolist()
+            results.update(
+                {
+                    f"{kind}s_per_s": (
+                        round(len(timings) / kind_elapsed, 1) if kind_elapsed else 0.0
+                    ),
+                    f"{kind}_p50_ms": round(p50, 3),
+                    f"{kind}_p99_ms": round(p99, 3),
+                    f"{kind}_errors": sum(result[2] for result in kind_results),
+                }
+            )
+        return results
+
+    def work(self, kind, index, results_queue):
+        """
+        Runs in a worker process, and puts its kind, successful request timings, number of
+        failed requests and elapsed seconds on `results_queue`.
+        """
+        make_request = self.write if kind == "write" else self.read
+        self.benchmark.random = random.Random(
+            f"{self.benchmark.dataset.seed}-{kind}-{index}"
+        )
+        # Failed requests are counted rather than logged or raised
+        logging.getLogger("django.request").disabled = True
+        client = Client(raise_request_exception=False)
+        timings, errors = [], 0
+        start = time.perf_counter()
+        try:
+            for request_index in range(self.requests):
+                request_start = time.perf_counter()
+                response = make_request(client, index, request_index)
+                if response.status_code >= 500:
+                    errors += 1
+                else:
+                    timings.append((time.perf_counter() - request_start) * 1000)
+        finally:
+            connections.close_all()
+            results_queue.put((kind, timings, errors, time.perf_counter() - start))
+
+    def write(self, client, index, request_index):
+        benchmark = self.benchmark
+        form_id = benchmark.form_ids[index % len(benchmark.form_ids)]
+        if request_index % 2 == 0:
+            scenario = Scenario(
+                "submissions-create",
+                "POST",
+                "submissions-list",
+                data={"form_id": form_id, "answers": benchmark.answers(form_id)},
+            )
+        else:
+            # Every writer updates the submissions of one form, so that updates contend
+            submission_id = benchmark.random.choice(
+                benchmark.submission_ids[: benchmark.dataset.submissions]
+            )
+            scenario = Scenario(
+                "submissions-update",
+                "PUT",
+                "submissions-detail",
+                args=(submission_id,),
+                data={"answers": benchmark.answers(benchmark.form_ids[0])},
+            )
+        return benchmark.send(scenario, client)
+
+    def read(self, client, index, request_index):
+        benchmark = self.benchmark
+        if request_index % 2 == 0:
+            scenario = Scenario(
+                "submissions-detail",
+                "GET",
+                "submissions-detail",
+                args=(benchmark.random.choice(benchmark.submission_ids),),
+            )
+        else:
+            scenario = Scenario(
+                "forms-detail",
+                "GET",
+                "forms-detail",
+                args=(benchmark.random.choice(benchmark.form_ids),),
+            )
+        return benchmark.send(scenario, client)
+
+
+def database_aliases():
+    """
+    Returns the aliases of the databases which the API writes to: the default database, and
+    the shards storing submissions, see api/sharding.py.
+    """
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *shards.aliases]))
+
+
+@contextmanager
+def throwaway_database(name=None):
+    """
+    Runs the block against new test databases for the default database and every shard, created
+    as the test runner would create them, so that the development or production databases are
+    never written to. Test mirrors, such as the read replica, read the new default database.
+    `name` overrides the TEST NAME of the default database, e.g. to create SQLite database
+    files rather than databases in memory, and the shards' files are named after it.
+    """
+    aliases = database_aliases()
+    test_settings = {
+        alias: connections[alias].settings_dict["TEST"] for alias in aliases
+    }
+    old_test_settings = {alias: dict(value) for alias, value in test_settings.items()}
+    for alias, value in test_settings.items():
+        value["SERIALIZE"] = False
+        if name is not None:
+            path = Path(name)
+            value["NAME"] = (
+                path
+                if alias == DEFAULT_DB_ALIAS
+                else path.with_name(f"{path.stem}_{alias}{path.suffix}")
+            )
+    setup_test_environment(debug=False)
+    try:
+        old_config = setup_databases(verbosity=0, interactive=False, aliases=aliases)
+        try:
+            yield
+        finally:
+            teardown_databases(old_config, verbosity=0)
+    finally:
+        teardown_test_environment()
+        for alias, value in test_settings.items():
+            value.clear()
+            value.update(old_test_settings[alias])
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Returns a message for each metric of `results` which is worse than in `baseline` by more
+    than `threshold`, a fraction of the baseline value. Query counts may not grow at all.
+    Endpoints missing from the baseline are not compared.
+    """
+    regressions = []
+    for name, metrics in results["endpoints"].items():
+        baseline_metrics = baseline["endpoints"].get(name)
+        if baseline_metrics is None:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            value, baseline_value = metrics[metric], baseline_metrics[metric]
+            if metric == "queries":
+                worse = value > baseline_value
+            elif higher_is_worse:
+                worse = value > baseline_value * (1 + threshold)
+                if metric.endswith("_ms"):
+                    worse = worse and value - baseline_value > LATENCY_TOLERANCE_MS
+            else:
+                worse = value < baseline_value / (1 + threshold)
+            if worse:
+                regressions.append(
+                    f"{name}: {metric} {value} (baseline {baseline_value})"
+                )
+    return regressions
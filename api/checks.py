@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from api.sharding import SEQUENCE_VENDORS, shards
+from api.tallies import UPSERT_VENDORS
+
+# Cache backends which each process keeps to itself
+PROCESS_LOCAL_CACHE_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """
+    Checks that the caches which must be shared between processes are not process-local.
+    """
+    errors = []
+    for setting in ["FORM_SCHEMA_CACHE", "SUBMISSION_BUFFER"]:
+        alias = getattr(settings, setting)["CACHE_ALIAS"]
+        backend = settings.CACHES.get(alias, {}).get("BACKEND")
+        if backend in PROCESS_LOCAL_CACHE_BACKENDS:
+            errors.append(
+                Error(
+                    f"{setting}['CACHE_ALIAS'] refers to the process-local {alias!r} cache.",
+                    hint="Use a cache shared between processes, e.g. a file based, "
+                    "memcached or Redis cache.",
+                    id="api.E001",
+                )
+            )
+    return errors
+
+
+def write_aliases():
+    """
+    The databases which the api writes to: the default database and the submission shards.
+    """
+    return [
+        DEFAULT_DB_ALIAS,
+        *(alias for alias in shards.aliases if alias != DEFAULT_DB_ALIAS),
+    ]
+
+
+# Not tagged as database checks, which only run when a command asks for them, as the vendor and
+# features of a database are known without connecting to it
+
+
+@register(Tags.compatibility)
+def check_bulk_insert_pks(app_configs, **kwargs):
+    """
+    Checks that bulk_create_with_pks can set the primary keys of bulk inserts, which it reads
+    back on SQLite, on every database written to.
+    """
+    errors = []
+    for alias in write_aliases():
+        connection = connections[alias]
+        if (
+            connection.vendor != "sqlite"
+            and not connection.features.can_return_rows_from_bulk_insert
+        ):
+            errors.append(
+                Error(
+                    f"Cannot read back primary keys of bulk inserts on the {alias!r} "
+                    f"database ({connection.vendor}).",
+                    hint="Use SQLite, or a database which returns rows from bulk inserts, "
+                    "e.g. PostgreSQL.",
+                    id="api.E002",
+                )
+            )
+    return errors
+
+
+@register(Tags.compatibility)
+def check_tally_upserts(app_configs, **kwargs):
+    """
+    Checks that the tallies can be upserted on every shard, which holds them.
+    """
+    return [
+        Error(
+            f"Cannot upsert tallies on the {alias!r} database "
+            f"({connections[alias].vendor}).",
+            hint=f"Use one of: {', '.join(UPSERT_VENDORS)}.",
+            id="api.E003",
+        )
+        for alias in shards.aliases
+        if connections[alias].vendor not in UPSERT_VENDORS
+    ]
+
+
+@register(Tags.compatibility)
+def check_shard_sequences(app_configs, **kwargs):
+    """
+    Checks that the id sequences of every shard but the first, whose range starts at 1, can be
+    moved to the start of the shard's range.
+    """
+    return [
+        Error(
+            f"Cannot reserve the id range of the {alias!r} shard "
+            f"({connections[alias].vendor}).",
+            hint=f"Use one of: {', '.join(SEQUENCE_VENDORS)}.",
+            id="api.E004",
+        )
+        for alias in shards.aliases[1:]
+        if connections[alias].vendor not in SEQUENCE_VENDORS
+    ]
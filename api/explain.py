@@ -0,0 +1,150 @@
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+from contextlib import ExitStack
+
+from django.db import connections, transaction
+from django.urls import reverse
+
+from api.bench import Benchmark, Dataset, Scenario, database_aliases
+from api.metrics import RequestMetrics
+
+EXPLAINED_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+POSTGRESQL_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+@dataclass
+class QueryPlan:
+    scenario: str
+    sql: str
+    plan: List[str]
+    full_scans: Tuple[str, ...]
+
+
+class QueryRecorder(RequestMetrics):
+    """
+    Records the statements and parameters run on a connection, besides counting them.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.statements = []
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        if not many:
+            self.statements.append((sql, params))
+        return super().execute_wrapper(execute, sql, params, many, context)
+
+
+class HotpathExplainer:
+    """
+    Requests every endpoint against a small generated dataset, as the benchmark does, and
+    explains every distinct SQL statement they run, i.e. every ORM query of the viewsets and
+    serializers. Statements which scan a whole table are reported as full scans.
+
+    On SQLite, scans are allowed in queries with a LIMIT and no sort, as they stop after the
+    first rows in index order, e.g. the first page of forms. On PostgreSQL, whose planner
+    prefers sequential scans of small tables, sequential scans are disabled while explaining, so
+    that only statements without a usable index are reported.
+    """
+
+    def __init__(self, dataset=None):
+        self.benchmark = Benchmark(
+            dataset or Dataset(forms=3, questions=6, choices=3, submissions=20),
+            iterations=1,
+        )
+        for alias in database_aliases():
+            vendor = connections[alias].vendor
+            if vendor not in ("sqlite", "postgresql"):
+                raise NotImplementedError(
+                    f"Cannot read query plans of {vendor} databases"
+                )
+
+    def run(self):
+        """
+        Returns the QueryPlan of every distinct statement of every scenario.
+        """
+        plans = []
+        with self.benchmark.isolated():
+            self.benchmark.generate()
+            for scenario in self.get_scenarios():
+                recorders = {alias: QueryRecorder() for alias in database_aliases()}
+                with ExitStack() as stack:
+                    for alias, recorder in recorders.items():
+                        stack.enter_context(
+                            connections[alias].execute_wrapper(recorder.execute_wrapper)
+                        )
+                    self.benchmark.request(scenario)
+
+                # The same statement is explained once per scenario, on each database
+                for alias, recorder in recorders.items():
+                    explained = set()
+                    for sql, params in recorder.statements:
+                        if sql in explained or not sql.lstrip().upper().startswith(
+                            EXPLAINED_STATEMENTS
+                        ):
+                            continue
+                        explained.add(sql)
+                        plans.append(self.explain(scenario.name, alias, sql, params))
+        return plans
+
+    def get_scenarios(self):
+        benchmark = self.benchmark
+        form_id, submission_id = benchmark.form_ids[0], benchmark.submission_ids[0]
+        return benchmark.get_scenarios() + [
+            Scenario(
+                "submissions-list-filtered",
+                "GET",
+                "submissions-list",
+                query={"form_id": form_id, "after_id": submission_id},
+            ),
+            Scenario(
+                "submissions-list-by-ids",
+                "GET",
+                "submissions-list",
+                query={"id__in": ",".join(map(str, benchmark.submission_ids[:5]))},
+            ),
+            self.next_page_scenario("forms-list-page-2", "forms-list"),
+            self.next_page_scenario("submissions-list-page-2", "submissions-list"),
+        ]
+
+    def next_page_scenario(self, name, url_name):
+        response = self.benchmark.client.get(reverse(url_name), {"page_size": 2})
+        query = dict(parse_qsl(urlparse(response.data["next"]).query))
+        return Scenario(name, "GET", url_name, query=query)
+
+    def explain(self, scenario, alias, sql, params):
+        connection = connections[alias]
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+                plan = [row[3] for row in cursor.fetchall()]
+                full_scans = self.sqlite_full_scans(connection, sql, plan)
+            else:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("EXPLAIN " + sql, params)
+                plan = [row[0] for row in cursor.fetchall()]
+                full_scans = tuple(
+                    match.group(1)
+                    for line in plan
+                    for match in [POSTGRESQL_SCAN.search(line)]
+                    if match
+                )
+        return QueryPlan(scenario, sql, plan, full_scans)
+
+    def sqlite_full_scans(self, connection, sql, plan):
+        if re.search(r"\bLIMIT\b", sql) and not any(
+            "USE TEMP B-TREE" in line for line in plan
+        ):
+            return ()
+        tables = set(connection.introspection.table_names())
+        return tuple(
+            match.group(1)
+            for line in plan
+            for match in [SQLITE_SCAN.match(line)]
+            if match and match.group(1) in tables
+        )
@@ -0,0 +1,118 @@
+import csv
+import heapq
+import json
+from itertools import groupby, islice
+from operator import itemgetter
+
+from api.archive import submission_archive
+from api.models import Answer, Question, Submission
+from api.sharding import shards
+
+
+class Echo:
+    """
+    A file-like object which returns what is written to it, so that csv.writer can be used
+    to produce the rows of a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+class SubmissionExporter:
+    """
+    Streams every submission to a form as one row, with one column per question in
+    display_order. Questions of every version of the form are included, and are left empty for
+    submissions to versions without them.
+
+    Submission ids are read through a server-side cursor, and the answers of every `chunk_size`
+    submissions are fetched together, so memory use does not grow with the number of submissions.
+    Both queries are served by indexes, without sorting the form's answers as a whole. Archived
+    submissions are merged in from their segment files, see api/archive.py.
+    """
+
+    # Kept below the 999 query parameters allowed by SQLite for the answers IN clause
+    chunk_size = 500
+
+    def __init__(self, form):
+        self.form = form
+        self.using = shards.for_read(shards.for_form(form.id))
+        self.questions = list(
+            Question.all_objects.filter(form_id=form)
+            .order_by("display_order", "added_in_version")
+            .values_list("id", "question")
+        )
+
+    def rows(self):
+        """
+        Yields (submission id, form version, answers in display_order) tuples, in submission id
+        order, of the submissions in the database and in the archive.
+        """
+        question_ids = [question_id for question_id, _ in self.questions]
+        # A submission being archived may be in both, and is exported once
+        merged = heapq.merge(
+            self.database_rows(), self.archived_rows(), key=itemgetter(0)
+        )
+        for submission_id, rows in groupby(merged, key=itemgetter(0)):
+            _, form_version, answers = next(rows)
+            yield submission_id, form_version, [
+                answers.get(question_id, "") for question_id in question_ids
+            ]
+
+    def database_rows(self):
+        """
+        Yields (submission id, form version, {question id: answer}) tuples, in submission id
+        order.
+        """
+        submissions = (
+            Submission.objects.using(self.using)
+            .filter(form_id=self.form)
+            .order_by("id")
+            .values_list("id", "form_version")
+            .iterator(chunk_size=self.chunk_size)
+        )
+
+        while True:
+            chunk = dict(islice(submissions, self.chunk_size))
+            if not chunk:
+                return
+
+            answers = {submission_id: {} for submission_id in chunk}
+            chunk_answers = (
+                Answer.objects.using(self.using)
+                .filter(submission_id__in=chunk)
+                .values_list("submission_id", "question_id", "answer")
+            )
+            for submission_id, question_id, answer in chunk_answers:
+                answers[submission_id][question_id] = answer
+
+            for submission_id, form_version in chunk.items():
+                yield submission_id, form_version, answers[submission_id]
+
+    def archived_rows(self):
+        for row in submission_archive.form_rows(self.form.id):
+            yield row["id"], row["form_version"], {
+                answer["question_id"]: answer["answer"] for answer in row["answers"]
+            }
+
+    def csv(self):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            [
+                "submission_id",
+                "form_version",
+                *[question for _, question in self.questions],
+            ]
+        )
+        for submission_id, form_version, answers in self.rows():
+            yield writer.writerow([submission_id, form_version, *answers])
+
+    def ndjson(self):
+        question_ids = [str(question_id) for question_id, _ in self.questions]
+        for submission_id, form_version, answers in self.rows():
+            row = {
+                "submission_id": submission_id,
+                "form_version": form_version,
+                "answers": dict(zip(question_ids, answers)),
+            }
+            yield json.dumps(row, ensure_ascii=False) + "\n"
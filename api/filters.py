@@ -0,0 +1,82 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from api.sharding import shards
+
+# The range of the signed 64 bit integer columns which parameters are compared to
+MIN_INTEGER = -(2**63)
+MAX_INTEGER = 2**63 - 1
+
+
+class SubmissionFilterBackend(BaseFilterBackend):
+    """
+    Filters submissions by URL parameters:
+    * `form_id`: submissions to the given form
+    * `id__in`: comma separated submission ids
+    * `after_id`: submissions with an id greater than the given id
+
+    Each filter is served by the (form_id, id) index on submissions.
+    """
+
+    INVALID_INTEGER_MESSAGE = "A valid integer is required."
+    INVALID_INTEGER_LIST_MESSAGE = "A comma separated list of integers is required."
+
+    def filter_queryset(self, request, queryset, view):
+        filters = self.get_filters(request)
+
+        if "form_id" in filters:
+            queryset = queryset.filter(form_id=filters["form_id"])
+        if "id__in" in filters:
+            queryset = queryset.filter(id__in=filters["id__in"])
+        if "after_id" in filters:
+            queryset = queryset.filter(id__gt=filters["after_id"])
+
+        return queryset
+
+    def get_filters(self, request):
+        """
+        Returns the parsed value of each filter given in the request, by parameter name.
+        """
+        params = request.query_params
+        filters = {}
+
+        if "form_id" in params:
+            filters["form_id"] = self.parse_int(params, "form_id")
+        if "id__in" in params:
+            filters["id__in"] = self.parse_int_list(params, "id__in")
+        if "after_id" in params:
+            filters["after_id"] = self.parse_int(params, "after_id")
+
+        return filters
+
+    def get_shards(self, request):
+        """
+        Returns the shards which may store the filtered submissions, see api/sharding.py.
+        """
+        filters = self.get_filters(request)
+
+        aliases = shards.aliases
+        if "form_id" in filters:
+            aliases = [shards.for_form(filters["form_id"])]
+        if "id__in" in filters:
+            id_shards = shards.group_submissions(filters["id__in"])
+            aliases = [alias for alias in aliases if alias in id_shards]
+        return aliases
+
+    def parse_int(self, params, name):
+        try:
+            value = int(params[name])
+        except ValueError:
+            raise ValidationError({name: [self.INVALID_INTEGER_MESSAGE]})
+        if not MIN_INTEGER <= value <= MAX_INTEGER:
+            raise ValidationError({name: [self.INVALID_INTEGER_MESSAGE]})
+        return value
+
+    def parse_int_list(self, params, name):
+        try:
+            values = [int(value) for value in params[name].split(",")]
+        except ValueError:
+            raise ValidationError({name: [self.INVALID_INTEGER_LIST_MESSAGE]})
+        if not all(MIN_INTEGER <= value <= MAX_INTEGER for value in values):
+            raise ValidationError({name: [self.INVALID_INTEGER_LIST_MESSAGE]})
+        return values
@@ -0,0 +1,168 @@
+import atexit
+import logging
+import queue
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, close_old_connections, connections
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from api.writers import create_submissions
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFull(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many submissions are waiting to be written, try again later."
+    default_code = "buffer_full"
+    # Sent as the Retry-After header
+    wait = 1
+
+
+class SubmissionBuffer:
+    """
+    A bounded in-process queue of validated submissions, which a background thread writes in
+    batches with create_submissions.
+
+    Each submission is given a ticket, whose status is kept in a Django cache shared between
+    processes: "queued", then "created" with the submission id, or "failed" with the errors.
+    Submitting to a full buffer raises BufferFull. `drain`, registered to run at exit, stops
+    accepting submissions and writes every queued submission before returning.
+    """
+
+    QUEUED = "queued"
+    CREATED = "created"
+    FAILED = "failed"
+
+    def __init__(
+        self, max_size, batch_size, flush_interval, cache_alias, ticket_timeout
+    ):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_alias = cache_alias
+        self.ticket_timeout = ticket_timeout
+        self.lock = threading.Lock()
+        self.writer = None
+        self.stopping = False
+
+    @property
+    def tickets(self):
+        return caches[self.cache_alias]
+
+    def ticket_key(self, ticket):
+        return f"submission-ticket:{ticket}"
+
+    def set_status(self, ticket, ticket_status, **details):
+        self.tickets.set(
+            self.ticket_key(ticket),
+            {"ticket": ticket, "status": ticket_status, **details},
+            self.ticket_timeout,
+        )
+
+    def get_status(self, ticket):
+        """
+        Returns the status of a ticket, or None if it is not known.
+        """
+        return self.tickets.get(self.ticket_key(ticket))
+
+    def submit(self, entry):
+        """
+        Queues a (form id, form version, questions, answers) entry as accepted by
+        create_submissions, and returns its ticket.
+        """
+        if self.stopping:
+            raise BufferFull()
+        self.start()
+
+        ticket = uuid.uuid4().hex
+        self.set_status(ticket, self.QUEUED)
+        try:
+            self.queue.put_nowait((ticket, entry))
+        except queue.Full:
+            self.tickets.delete(self.ticket_key(ticket))
+            raise BufferFull()
+        return ticket
+
+    def start(self):
+        with self.lock:
+            if self.writer is not None:
+                return
+            self.writer = threading.Thread(
+                target=self.run, name="submission-buffer-writer", daemon=True
+            )
+            self.writer.start()
+            atexit.register(self.drain)
+
+    def run(self):
+        try:
+            while not (self.stopping and self.queue.empty()):
+                try:
+                    self.flush(timeout=self.flush_interval)
+                except Exception:
+                    # Keeps the writer alive, e.g. if the ticket cache is unavailable
+                    logger.exception("Flushing the submission buffer failed")
+        finally:
+            connections.close_all()
+
+    def flush(self, timeout=None):
+        """
+        Writes up to batch_size queued submissions in one transaction, waiting up to `timeout`
+        seconds for the first one. Returns the number of submissions written.
+        """
+        batch = []
+        try:
+            batch.append(
+                self.queue.get(timeout=timeout) if timeout else self.queue.get_nowait()
+            )
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            if not batch:
+                return 0
+
+        close_old_connections()
+        try:
+            submissions = create_submissions([entry for _, entry in batch])
+        except DatabaseError:
+            # Retried one by one, so that a single failing submission fails alone
+            logger.exception("Writing a batch of %d submissions failed", len(batch))
+            for ticket, entry in batch:
+                self.write_one(ticket, entry)
+        else:
+            for (ticket, _), submission in zip(batch, submissions):
+                self.set_status(ticket, self.CREATED, submission_id=submission.id)
+        return len(batch)
+
+    def write_one(self, ticket, entry):
+        try:
+            [submission] = create_submissions([entry])
+        except DatabaseError as e:
+            self.set_status(ticket, self.FAILED, errors=[str(e)])
+        else:
+            self.set_status(ticket, self.CREATED, submission_id=submission.id)
+
+    def drain(self, timeout=None):
+        """
+        Stops accepting submissions, and writes every queued submission.
+        """
+        self.stopping = True
+        writer = self.writer
+        if writer is not None and writer.is_alive():
+            writer.join(timeout)
+        else:
+            while self.flush():
+                pass
+
+
+submission_buffer = SubmissionBuffer(
+    max_size=settings.SUBMISSION_BUFFER["MAX_SIZE"],
+    batch_size=settings.SUBMISSION_BUFFER["BATCH_SIZE"],
+    flush_interval=settings.SUBMISSION_BUFFER["FLUSH_INTERVAL"],
+    cache_alias=settings.SUBMISSION_BUFFER["CACHE_ALIAS"],
+    ticket_timeout=settings.SUBMISSION_BUFFER["TICKET_TIMEOUT"],
+)
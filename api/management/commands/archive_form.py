@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.analytics import FormMatrix
+from api.archive import submission_archive
+from api.models import Form
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the submissions and answers of closed forms from the database into compressed "
+        "segment files, from which they are still served."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("form_ids", nargs="+", type=int, metavar="form_id")
+
+    def handle(self, *args, form_ids, **options):
+        missing = set(form_ids) - set(
+            Form.objects.filter(id__in=form_ids).values_list("id", flat=True)
+        )
+        if missing:
+            raise CommandError(
+                f"Forms do not exist: {', '.join(map(str, sorted(missing)))}"
+            )
+
+        for form_id in form_ids:
+            # Updates to submissions already in the matrix are only read from the database
+            FormMatrix(form_id).refresh()
+            num_submissions = submission_archive.archive(form_id)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Archived {num_submissions} submissions of form {form_id}."
+                )
+            )
@@ -0,0 +1,103 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bench import Benchmark, Dataset, find_regressions, throwaway_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Times every API endpoint against a generated dataset in a throwaway test database, "
+        "and compares the results with a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--forms", type=int, default=10)
+        parser.add_argument(
+            "--questions", type=int, default=10, help="Questions per form."
+        )
+        parser.add_argument(
+            "--choices",
+            type=int,
+            default=4,
+            help="Choices per radio and checkbox question.",
+        )
+        parser.add_argument(
+            "--submissions", type=int, default=500, help="Submissions per form."
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=50,
+            help="Timed requests per endpoint.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output",
+            default="bench_output.json",
+            help="File to write the results to.",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=str(settings.BASE_DIR / "bench_baseline.json"),
+            help="Results to compare with. Fails if the file does not exist, unless "
+            "--save-baseline is given.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Fails if a metric is worse than its baseline by more than this fraction.",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Stores the results as the baseline, instead of comparing with it.",
+        )
+
+    def handle(self, *args, **options):
+        dataset = Dataset(
+            forms=options["forms"],
+            questions=options["questions"],
+            choices=options["choices"],
+            submissions=options["submissions"],
+            seed=options["seed"],
+        )
+        if min(dataset.forms, dataset.questions, dataset.choices) < 1:
+            raise CommandError("--forms, --questions and --choices must be at least 1.")
+        if dataset.submissions < 1 or options["iterations"] < 1:
+            raise CommandError("--submissions and --iterations must be at least 1.")
+        baseline_path = Path(options["baseline"])
+        if not options["save_baseline"] and not baseline_path.exists():
+            raise CommandError(
+                f"No baseline at {baseline_path}, run with --save-baseline to store one."
+            )
+
+        with throwaway_database():
+            results = Benchmark(dataset, options["iterations"]).run(
+                log=self.stdout.write
+            )
+        self.write_json(options["output"], results)
+        self.stdout.write(f"Wrote results to {options['output']}.")
+
+        if options["save_baseline"]:
+            self.write_json(baseline_path, results)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline {baseline_path}."))
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline["dataset"] != results["dataset"]:
+            raise CommandError(
+                f"The baseline was measured on a different dataset: {baseline['dataset']}"
+            )
+        regressions = find_regressions(results, baseline, options["threshold"])
+        if regressions:
+            raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def write_json(self, path, results):
+        with open(path, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+            results_file.write("\n")
@@ -0,0 +1,68 @@
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.bench import ConcurrencyBenchmark, Dataset, throwaway_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares SQLite's default settings with the tuned SQLITE_PRAGMAS and busy retries, "
+        "by creating, updating and reading submissions from concurrent worker processes "
+        "against throwaway database files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--writers", type=int, default=8, help="Writing worker processes."
+        )
+        parser.add_argument(
+            "--readers", type=int, default=8, help="Reading worker processes."
+        )
+        parser.add_argument(
+            "--requests", type=int, default=100, help="Requests per worker process."
+        )
+        parser.add_argument("--forms", type=int, default=4)
+        parser.add_argument(
+            "--questions", type=int, default=10, help="Questions per form."
+        )
+        parser.add_argument(
+            "--submissions", type=int, default=200, help="Submissions per form."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Only SQLite databases can be compared.")
+        if min(options["writers"], options["requests"], options["forms"]) < 1:
+            raise CommandError("--writers, --requests and --forms must be at least 1.")
+
+        dataset = Dataset(
+            forms=options["forms"],
+            questions=options["questions"],
+            choices=4,
+            submissions=options["submissions"],
+            seed=options["seed"],
+        )
+        with tempfile.TemporaryDirectory() as root, throwaway_database(
+            Path(root) / "bench.sqlite3"
+        ):
+            results = ConcurrencyBenchmark(
+                dataset, options["writers"], options["readers"], options["requests"]
+            ).run(log=self.stdout.write)
+
+        profiles = results["profiles"]
+        metrics = list(profiles["default"])
+        self.stdout.write(f"{'':16}{'default':>12}{'tuned':>12}")
+        for metric in metrics:
+            self.stdout.write(
+                f"{metric:16}{profiles['default'][metric]:>12}"
+                f"{profiles['tuned'][metric]:>12}"
+            )
+
+        default_writes = profiles["default"]["writes_per_s"]
+        if default_writes:
+            gain = profiles["tuned"]["writes_per_s"] / default_writes
+            self.stdout.write(f"Write throughput gain: {gain:.2f}x")
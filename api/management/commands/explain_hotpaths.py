@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bench import throwaway_database
+from api.explain import HotpathExplainer
+
+
+class Command(BaseCommand):
+    help = (
+        "Explains every query run by the API endpoints against a generated dataset in a "
+        "throwaway test database, and fails if any of them scans a whole table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose",
+            action="store_true",
+            help="Prints the plan of every query, not only of those with full scans.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with throwaway_database():
+                plans = HotpathExplainer().run()
+        except NotImplementedError as error:
+            raise CommandError(error)
+
+        flagged = [plan for plan in plans if plan.full_scans]
+        for plan in plans if options["verbose"] else flagged:
+            self.stdout.write(f"{plan.scenario}: {plan.sql}")
+            for line in plan.plan:
+                self.stdout.write(f"    {line}")
+
+        if flagged:
+            raise CommandError(
+                f"{len(flagged)} of {len(plans)} queries scan a whole table: "
+                + ", ".join(
+                    sorted({table for plan in flagged for table in plan.full_scans})
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"None of the {len(plans)} queries scans a whole table.")
+        )
@@ -0,0 +1,81 @@
+import pstats
+
+from django.core.management.base import BaseCommand
+
+from api.profiling import PROFILE_HEADER, request_profiler
+
+
+class Command(BaseCommand):
+    help = (
+        "Lists the slowest profiled requests, with the functions they spent the most time in "
+        "and their largest allocations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=10, help="Number of requests to list."
+        )
+        parser.add_argument(
+            "--frames",
+            type=int,
+            default=10,
+            help="Number of functions to list per request, by their own time.",
+        )
+        parser.add_argument(
+            "--route", help="Only list requests to this route, e.g. submissions-list."
+        )
+        parser.add_argument(
+            "--token",
+            action="store_true",
+            help=f"Prints a token to send as the {PROFILE_HEADER} header to profile a "
+            "request, instead of listing profiles.",
+        )
+
+    def handle(self, *args, limit, frames, route, token, **options):
+        if token:
+            self.stdout.write(request_profiler.create_token())
+            return
+
+        profiles = request_profiler.list_profiles()
+        if route:
+            profiles = [profile for profile in profiles if profile["route"] == route]
+        if not profiles:
+            self.stdout.write(f"No profiles in {request_profiler.root}.")
+            return
+
+        profiles.sort(key=lambda profile: profile["duration_ms"], reverse=True)
+        for profile in profiles[:limit]:
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"{profile['method']} {profile['path']} ({profile['route']}) "
+                    f"{profile['status']}"
+                )
+            )
+            self.stdout.write(
+                f"  {profile['duration_ms']:.1f} ms, {profile['queries']} queries in "
+                f"{profile['sql_ms']:.1f} ms, peak memory {profile['peak_memory_kib']} KiB "
+                f"({profile['memory_scope']}), {profile['trigger']}, {profile['name']}"
+            )
+            if profile["partial"]:
+                self.stdout.write("  Partial: the streamed content is not profiled")
+            self.stdout.write("  Top functions (own ms, cumulative ms, calls):")
+            for line in self.top_frames(profile["name"], frames):
+                self.stdout.write(f"    {line}")
+            self.stdout.write("  Top allocations (KiB, blocks):")
+            for allocation in profile["top_allocations"][:frames]:
+                self.stdout.write(
+                    f"    {allocation['size_kib']:>10.1f} {allocation['count']:>8} "
+                    f"{allocation['frame']}"
+                )
+
+    def top_frames(self, name, count):
+        try:
+            stats = pstats.Stats(str(request_profiler.stats_path(name))).stats
+        except FileNotFoundError:
+            return ["(rotated away)"]
+        top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:count]
+        return [
+            f"{own_time * 1000:>10.2f} {cumulative_time * 1000:>10.2f} {calls:>8} "
+            f"{pstats.func_std_string(function)}"
+            for function, (_, calls, own_time, cumulative_time, _) in top
+        ]
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.tallies import rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = "Recounts the result tallies of forms from their answers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--form",
+            dest="form_ids",
+            type=int,
+            action="append",
+            help="Only rebuild the tallies of this form. Can be given multiple times.",
+        )
+
+    def handle(self, *args, form_ids=None, **options):
+        num_answers = rebuild_tallies(form_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt tallies from {num_answers} answers.")
+        )
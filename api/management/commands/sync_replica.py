@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.replica import SQLiteReplicaSync, read_replica
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the default SQLite database to the stand-in read replica, once or every "
+        "--interval seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds between copies, which bounds the replication lag.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Copies once, then exits."
+        )
+
+    def handle(self, *args, **options):
+        if read_replica.alias is None:
+            raise CommandError('No replica is configured in READ_REPLICA["ALIAS"].')
+        replica_sync = SQLiteReplicaSync(read_replica.alias)
+
+        while True:
+            start = time.perf_counter()
+            try:
+                replica_sync.sync()
+            except NotImplementedError as error:
+                raise CommandError(error)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"Copied to {read_replica.alias} in {elapsed:.3f}s.")
+            if options["once"]:
+                return
+            time.sleep(max(options["interval"] - elapsed, 0))
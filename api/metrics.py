@@ -0,0 +1,209 @@
+import threading
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.db import connections
+
+# The metrics of the request being served, if any. Context variables are copied to the threads
+# which asgiref runs synchronous code on, so the metrics follow a request across threads.
+current_request_metrics = ContextVar("current_request_metrics", default=None)
+
+
+class RequestMetrics:
+    """
+    The time a request spent in SQL, serializing and rendering, and its number of queries.
+    Serializing and rendering times exclude the SQL they ran.
+    """
+
+    PHASES = ("serialize", "render")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.phases = dict.fromkeys(self.PHASES, 0.0)
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - start
+            self.queries += 1
+
+    def start_timer(self, phase):
+        """
+        Returns a function which adds the time since this call, other than in SQL, to a phase.
+        """
+        start, sql_start = perf_counter(), self.sql_time
+
+        def stop():
+            self.phases[phase] += perf_counter() - start - (self.sql_time - sql_start)
+
+        return stop
+
+    def server_timing(self, total_time):
+        """
+        Returns the value of the Server-Timing header, with durations in milliseconds.
+        """
+        entries = [f'db;dur={self.sql_time * 1000:.3f};desc="{self.queries} queries"']
+        entries += [
+            f"{phase};dur={phase_time * 1000:.3f}"
+            for phase, phase_time in self.phases.items()
+        ]
+        entries.append(f"total;dur={total_time * 1000:.3f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def capture_queries(metrics):
+    """
+    Counts the queries run by this thread on every database into `metrics`.
+    """
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(
+                connections[alias].execute_wrapper(metrics.execute_wrapper)
+            )
+        yield
+
+
+@contextmanager
+def timed(phase):
+    """
+    Adds the time spent in the block, other than in SQL, to a phase of the current request.
+    """
+    metrics = current_request_metrics.get()
+    if metrics is None:
+        yield
+        return
+
+    stop = metrics.start_timer(phase)
+    try:
+        yield
+    finally:
+        stop()
+
+
+def escape_label_value(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """
+    A Prometheus histogram with one series per combination of label values, aggregated in
+    process. Observing a value is a binary search and an increment under a lock.
+    """
+
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                # Counts of each bucket and of +Inf, not cumulative, and the sum
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self.lock:
+            series = sorted(
+                (label_values, list(counts), total)
+                for label_values, (counts, total) in self.series.items()
+            )
+        for label_values, counts, total in series:
+            labels = ",".join(
+                f'{name}="{escape_label_value(value)}"'
+                for name, value in zip(self.label_names, label_values)
+            )
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines)
+
+
+# Requests are labelled by the name of their route, e.g. forms-detail, rather than their path,
+# and by their method, with every other method than these labelled "other", so that the number
+# of series is bounded
+REQUEST_LABELS = ("route", "method")
+REQUEST_METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+request_duration = Histogram(
+    "questionnaire_request_duration_seconds",
+    "Time to serve a request, excluding streamed content.",
+    REQUEST_LABELS,
+    DURATION_BUCKETS,
+)
+request_sql_duration = Histogram(
+    "questionnaire_request_sql_duration_seconds",
+    "Time a request spent running SQL queries.",
+    REQUEST_LABELS,
+    DURATION_BUCKETS,
+)
+request_serialize_duration = Histogram(
+    "questionnaire_request_serialize_duration_seconds",
+    "Time a request spent in read serializers, excluding SQL.",
+    REQUEST_LABELS,
+    DURATION_BUCKETS,
+)
+request_render_duration = Histogram(
+    "questionnaire_request_render_duration_seconds",
+    "Time a request spent rendering its response, excluding SQL.",
+    REQUEST_LABELS,
+    DURATION_BUCKETS,
+)
+request_queries = Histogram(
+    "questionnaire_request_queries",
+    "Number of SQL queries run by a request.",
+    REQUEST_LABELS,
+    (0, 1, 2, 3, 4, 5, 10, 20, 50, 100),
+)
+response_bytes = Histogram(
+    "questionnaire_response_bytes",
+    "Size of a response body.",
+    REQUEST_LABELS,
+    (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+)
+
+HISTOGRAMS = (
+    request_duration,
+    request_sql_duration,
+    request_serialize_duration,
+    request_render_duration,
+    request_queries,
+    response_bytes,
+)
+
+
+def observe_request(label_values, metrics, total_time):
+    request_duration.observe(label_values, total_time)
+    request_sql_duration.observe(label_values, metrics.sql_time)
+    request_serialize_duration.observe(label_values, metrics.phases["serialize"])
+    request_render_duration.observe(label_values, metrics.phases["render"])
+    request_queries.observe(label_values, metrics.queries)
+
+
+def render_metrics():
+    """
+    Returns every histogram in the Prometheus text exposition format.
+    """
+    return "\n".join(histogram.render() for histogram in HISTOGRAMS) + "\n"
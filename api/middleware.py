@@ -0,0 +1,63 @@
+from time import perf_counter
+
+from .metrics import (
+    REQUEST_METHODS,
+    RequestMetrics,
+    capture_queries,
+    current_request_metrics,
+    observe_request,
+    response_bytes,
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the number of queries, and the time spent in SQL, serializing and rendering, of
+    every request. They are sent as a Server-Timing header, and aggregated into per-route
+    histograms exposed at /metrics.
+
+    Should be the first middleware, so that its total time covers every other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_request_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            with capture_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            current_request_metrics.reset(token)
+        total_time = perf_counter() - start
+
+        match = request.resolver_match
+        method = request.method if request.method in REQUEST_METHODS else "other"
+        label_values = (match.view_name if match else "unmatched", method)
+        observe_request(label_values, metrics, total_time)
+        if response.streaming:
+            response.streaming_content = self.count_streamed_bytes(
+                response.streaming_content, label_values
+            )
+        else:
+            response_bytes.observe(label_values, len(response.content))
+
+        response["Server-Timing"] = metrics.server_timing(total_time)
+        return response
+
+    def process_template_response(self, request, response):
+        # Called just before the response is rendered, which happens inside get_response
+        metrics = current_request_metrics.get()
+        if metrics is not None:
+            stop = metrics.start_timer("render")
+            response.add_post_render_callback(lambda _: stop())
+        return response
+
+    def count_streamed_bytes(self, content, label_values):
+        size = 0
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+        response_bytes.observe(label_values, size)
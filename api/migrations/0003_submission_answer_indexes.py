@@ -0,0 +1,26 @@
+# Generated by Django 3.2.8 on 2026-10-18 02:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_choice"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="answer",
+            index=models.Index(
+                fields=["submission_id", "question_id"],
+                name="answer_submission_question_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["form_id", "id"], name="submission_form_id_id_idx"
+            ),
+        ),
+    ]
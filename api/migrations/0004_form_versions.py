@@ -0,0 +1,33 @@
+# Generated by Django 3.2.8 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_submission_answer_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="form",
+            name="version",
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="added_in_version",
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="removed_in_version",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="form_version",
+            field=models.IntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_form_versions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="form",
+            name="revision",
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="form",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="revision",
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.8 on 2026-10-18 02:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_revisions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tally",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("choice_id", models.IntegerField()),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "question_id",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tallies",
+                        to="api.question",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="tally",
+            constraint=models.UniqueConstraint(
+                fields=("question_id", "choice_id"), name="tally_question_choice_uniq"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.8 on 2026-10-18 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_tallies"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="answer",
+            name="choice_id",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="answer",
+            name="choice_mask",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 3.2.8 on 2026-10-18 02:43
+
+from django.db import migrations, transaction
+
+# The rules of api.answers at the time of this migration, kept here so that later changes to
+# them do not change what this migration does
+MAX_CHECKBOX_CHOICES = 63
+CHUNK_SIZE = 2000
+
+
+def typed_answer(question_type, answer):
+    try:
+        if question_type == "radio":
+            return int(answer), None
+        if question_type == "checkbox":
+            mask = 0
+            for value in answer.split(",") if answer else []:
+                choice_id = int(value)
+                if not 1 <= choice_id <= MAX_CHECKBOX_CHOICES:
+                    return None, None
+                mask |= 1 << (choice_id - 1)
+            return None, mask
+    except ValueError:
+        pass
+    # Answers which cannot be parsed are left as text only
+    return None, None
+
+
+def backfill_typed_answers(apps, schema_editor):
+    """
+    Fills the typed columns of existing radio and checkbox answers, in chunks of answers in id
+    order, each updated in its own transaction so that writers are not blocked for long.
+    """
+    Answer = apps.get_model("api", "Answer")
+    using = schema_editor.connection.alias
+    # e.g. a new shard, which stores answers but not the questions they are joined with
+    if not Answer.objects.using(using).exists():
+        return
+    answers = Answer.objects.using(using).filter(
+        question_id__question_type__in=["radio", "checkbox"]
+    )
+
+    last_id = 0
+    while True:
+        with transaction.atomic(using=using):
+            chunk = list(
+                answers.filter(id__gt=last_id)
+                .order_by("id")
+                .only("id", "answer", "question_id__question_type")
+                .select_related("question_id")[:CHUNK_SIZE]
+            )
+            if not chunk:
+                return
+            for answer in chunk:
+                answer.choice_id, answer.choice_mask = typed_answer(
+                    answer.question_id.question_type, answer.answer
+                )
+            Answer.objects.using(using).bulk_update(
+                chunk, ["choice_id", "choice_mask"], batch_size=500
+            )
+        last_id = chunk[-1].id
+
+
+class Migration(migrations.Migration):
+
+    # Each chunk is committed separately
+    atomic = False
+
+    dependencies = [
+        ("api", "0007_answer_typed_columns"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_typed_answers,
+            migrations.RunPython.noop,
+            hints={"model_name": "answer"},
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.8 on 2026-10-18 03:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_backfill_typed_answers"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="answer",
+            constraint=models.UniqueConstraint(
+                fields=("submission_id", "question_id"),
+                name="answer_submission_question_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="choice",
+            constraint=models.UniqueConstraint(
+                fields=("question_id", "choice_id"),
+                name="choice_question_choice_id_uniq",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="question",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("removed_in_version__isnull", True)),
+                fields=("form_id", "display_order"),
+                name="question_form_display_order_uniq",
+            ),
+        ),
+        # Indexes replaced by the unique constraints, which start with the same columns
+        migrations.RemoveIndex(
+            model_name="answer",
+            name="answer_submission_question_idx",
+        ),
+        migrations.AlterField(
+            model_name="answer",
+            name="submission_id",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="answers",
+                to="api.submission",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="choice",
+            name="question_id",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="choices",
+                to="api.question",
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.8 on 2026-10-18 03:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_unique_constraints"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="answer",
+            name="question_id",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="answers",
+                to="api.question",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="submission",
+            name="form_id",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="submissions",
+                to="api.form",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="tally",
+            name="question_id",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tallies",
+                to="api.question",
+            ),
+        ),
+    ]
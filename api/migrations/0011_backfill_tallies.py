@@ -0,0 +1,65 @@
+# Generated by Django 3.2.8 on 2026-10-18 05:12
+
+from collections import Counter
+
+from django.db import migrations
+
+# The rules of api.tallies at the time of this migration, kept here so that later changes to
+# them do not change what this migration does
+ANSWERS = 0
+MAX_CHECKBOX_CHOICES = 63
+CHUNK_SIZE = 2000
+
+
+def answer_choice_ids(choice_id, choice_mask):
+    if choice_id is not None:
+        return [choice_id]
+    if choice_mask is not None:
+        return [
+            bit + 1 for bit in range(MAX_CHECKBOX_CHOICES) if choice_mask & (1 << bit)
+        ]
+    return []
+
+
+def backfill_tallies(apps, schema_editor):
+    """
+    Counts the tallies of the answers written before tallies were kept, from the typed columns
+    filled by 0008_backfill_typed_answers. Tallies are recounted as a whole, so that the ones
+    already kept by writers since 0006_tallies are not counted twice.
+    """
+    Answer = apps.get_model("api", "Answer")
+    Tally = apps.get_model("api", "Tally")
+    using = schema_editor.connection.alias
+
+    counts = Counter()
+    answers = Answer.objects.using(using).values_list(
+        "question_id", "choice_id", "choice_mask"
+    )
+    for question_id, choice_id, choice_mask in answers.iterator(chunk_size=CHUNK_SIZE):
+        counts[question_id, ANSWERS] += 1
+        for selected_choice_id in answer_choice_ids(choice_id, choice_mask):
+            counts[question_id, selected_choice_id] += 1
+
+    Tally.objects.using(using).all().delete()
+    Tally.objects.using(using).bulk_create(
+        [
+            Tally(question_id_id=question_id, choice_id=choice_id, count=count)
+            for (question_id, choice_id), count in counts.items()
+        ],
+        batch_size=300,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_shard_foreign_keys"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_tallies,
+            migrations.RunPython.noop,
+            hints={"model_name": "tally"},
+        ),
+    ]
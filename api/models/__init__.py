@@ -3,3 +3,4 @@ from .question import Question
 from .submission import Submission
 from .answer import Answer
 from .choice import Choice
+from .tally import Tally
@@ -3,14 +3,30 @@ from . import Question, Submission
 
 
 class Answer(models.Model):
+    # Without a database constraint, as answers are stored on the shard of their submission
     question_id = models.ForeignKey(
-        Question, on_delete=models.CASCADE, related_name="answers"
+        Question, on_delete=models.CASCADE, related_name="answers", db_constraint=False
     )
 
-    # NOTE: Answers are stored as text (regardless of question type) for a simplified implementation.
-    # A future extension would be to store integers for Radio and Checkbox questions,
-    # and text for textbox questions.
+    # NOTE: Answers are stored as text as given (regardless of question type), and radio and
+    # checkbox answers are also stored as integers below, so that they can be aggregated in SQL.
     answer = models.TextField()
+
+    # The selected choice_id of radio answers
+    choice_id = models.IntegerField(null=True, blank=True)
+    # The selected choice_ids of checkbox answers, with bit (choice_id - 1) set for each choice
+    choice_mask = models.BigIntegerField(null=True, blank=True)
+
+    # Indexed by the unique constraint below, which starts with the submission
     submission_id = models.ForeignKey(
-        Submission, on_delete=models.CASCADE, related_name="answers"
+        Submission, on_delete=models.CASCADE, related_name="answers", db_index=False
     )
+
+    class Meta:
+        constraints = [
+            # A submission answers each question once. Also serves the answers of submissions
+            models.UniqueConstraint(
+                fields=["submission_id", "question_id"],
+                name="answer_submission_question_uniq",
+            ),
+        ]
@@ -3,9 +3,18 @@ from . import Question
 
 
 class Choice(models.Model):
+    # Indexed by the unique constraint below, which starts with the question
     question_id = models.ForeignKey(
-        Question, on_delete=models.CASCADE, related_name="choices"
+        Question, on_delete=models.CASCADE, related_name="choices", db_index=False
     )
 
     choice_id = models.IntegerField()
     choice = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["question_id", "choice_id"],
+                name="choice_question_choice_id_uniq",
+            ),
+        ]
@@ -3,3 +3,13 @@ from django.db import models
 
 class Form(models.Model):
     title = models.TextField()
+
+    # Incremented whenever the answer schema of the form changes, i.e. when questions are added,
+    # removed, reordered, change type or change their choice_ids. Submissions record the version
+    # they answered.
+    version = models.IntegerField(default=1)
+
+    # Incremented on every update of the form, and used with updated_at to answer conditional
+    # requests without loading the questions
+    revision = models.IntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
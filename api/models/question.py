@@ -1,7 +1,24 @@
 from django.db import models
+from django.db.models import Q
 from . import Form
 
 
+class QuestionQuerySet(models.QuerySet):
+    def current(self):
+        return self.filter(removed_in_version__isnull=True)
+
+    def in_version(self, version):
+        return self.filter(
+            Q(removed_in_version__isnull=True) | Q(removed_in_version__gt=version),
+            added_in_version__lte=version,
+        )
+
+
+class CurrentQuestionManager(models.Manager.from_queryset(QuestionQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().current()
+
+
 class Question(models.Model):
     QuestionTypes = (
         ("textbox", "textbox"),
@@ -18,3 +35,24 @@ class Question(models.Model):
 
     question = models.TextField()
     question_type = models.CharField(max_length=20, choices=QuestionTypes)
+
+    # The range of form versions the question belongs to. Questions are never deleted when a
+    # form is updated, so that answers to previous versions of the form keep their question.
+    added_in_version = models.IntegerField(default=1)
+    removed_in_version = models.IntegerField(null=True, blank=True)
+
+    # NOTE: The default manager only returns questions in the current version of their form,
+    # which also applies to form.questions. Use all_objects for questions of past versions.
+    objects = CurrentQuestionManager()
+    all_objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Questions of past versions keep their display_order, so only the questions of the
+            # current version are unique. Also serves the current questions of forms in order.
+            models.UniqueConstraint(
+                fields=["form_id", "display_order"],
+                condition=Q(removed_in_version__isnull=True),
+                name="question_form_display_order_uniq",
+            ),
+        ]
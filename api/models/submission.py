@@ -3,6 +3,22 @@ from . import Form
 
 
 class Submission(models.Model):
+    # Without a database constraint, as submissions may be stored on another database than
+    # their form, see api/sharding.py
     form_id = models.ForeignKey(
-        Form, on_delete=models.CASCADE, related_name="submissions"
+        Form, on_delete=models.CASCADE, related_name="submissions", db_constraint=False
     )
+
+    # The version of the form that was answered
+    form_version = models.IntegerField(default=1)
+
+    # Incremented on every update of the answers, and used with updated_at to answer conditional
+    # requests without loading the answers
+    revision = models.IntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Serves filtering by form and keyset pagination on (form_id, id)
+            models.Index(fields=["form_id", "id"], name="submission_form_id_id_idx"),
+        ]
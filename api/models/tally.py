@@ -0,0 +1,27 @@
+from django.db import models
+from . import Question
+
+
+class Tally(models.Model):
+    """
+    The number of answers to a question which selected a choice, kept up to date as answers are
+    written. Rows with choice_id ANSWERS count every answer to the question, of any type.
+    """
+
+    ANSWERS = 0
+
+    # Without a database constraint, as tallies are stored on the shard of their form
+    question_id = models.ForeignKey(
+        Question, on_delete=models.CASCADE, related_name="tallies", db_constraint=False
+    )
+
+    # The choice_id of the counted choice within the question, or ANSWERS
+    choice_id = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["question_id", "choice_id"], name="tally_question_choice_uniq"
+            ),
+        ]
@@ -0,0 +1,170 @@
+import heapq
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from functools import reduce
+from itertools import groupby, islice
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.filters import MAX_INTEGER, MIN_INTEGER
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite, unique key given by `ordering`.
+
+    Unlike DRF's CursorPagination, which keys on the first ordering field and falls back to an
+    offset for ties, every page here is a single `WHERE key > cursor ORDER BY key LIMIT n` query.
+    Pages therefore cost the same however deep they are, and no COUNT(*) is ever issued.
+    """
+
+    ordering = ("id",)
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Paginates the union of `querysets`, e.g. of each database storing a sharded table. A page
+        is read from each queryset, and the pages are merged in key order. Rows with the same key
+        in several querysets are listed once, from the first queryset.
+        """
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        reverse, position = self.cursor if self.cursor else (False, None)
+        pages = [self.read_page(queryset, position, reverse) for queryset in querysets]
+        merged = heapq.merge(*pages, key=self.get_position, reverse=reverse)
+        unique = (next(rows) for _, rows in groupby(merged, key=self.get_position))
+        results = list(islice(unique, self.page_size + 1))
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        return self.page
+
+    def read_page(self, queryset, position, reverse):
+        """
+        Returns the first page_size + 1 rows of a queryset after `position` in key order, or
+        before it if `reverse`. Sources other than querysets provide a `keyset_page` method,
+        e.g. archived submissions.
+        """
+        if hasattr(queryset, "keyset_page"):
+            return queryset.keyset_page(position, reverse, self.page_size + 1)
+
+        queryset = queryset.order_by(
+            *[("-" if reverse else "") + field for field in self.ordering]
+        )
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position, reverse))
+        return list(queryset[: self.page_size + 1])
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_keyset_filter(self, position, reverse=False):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        lookup = "lt" if reverse else "gt"
+        conditions = []
+        for idx, field in enumerate(self.ordering):
+            equal = {f: v for f, v in zip(self.ordering[:idx], position[:idx])}
+            conditions.append(Q(**equal, **{f"{field}__{lookup}": position[idx]}))
+        return reduce(or_, conditions)
+
+    def get_position(self, instance):
+        # Pages are either model instances or .values() rows
+        if isinstance(instance, dict):
+            return [instance[field] for field in self.ordering]
+        return [instance.serializable_value(field) for field in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Paged past the end, go back to the first page
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(True, self.get_position(self.page[0]))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            reverse = bool(cursor["r"])
+            position = cursor["p"]
+            if len(position) != len(self.ordering) or not all(
+                isinstance(value, int) and MIN_INTEGER <= value <= MAX_INTEGER
+                for value in position
+            ):
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return reverse, position
+
+    def encode_cursor(self, reverse, position):
+        cursor = json.dumps({"r": int(reverse), "p": position}, separators=(",", ":"))
+        encoded = urlsafe_b64encode(cursor.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+
+class FormPagination(KeysetPagination):
+    ordering = ("id",)
+
+
+class SubmissionPagination(KeysetPagination):
+    ordering = ("form_id", "id")
@@ -0,0 +1,196 @@
+import cProfile
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+from api.metrics import RequestMetrics, capture_queries
+
+# Sent with a token from `manage.py profiles --token` to profile a request
+PROFILE_HEADER = "X-Profile"
+# Set on profiled responses, with the name the profile was stored under
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+
+class RequestProfiler:
+    """
+    Profiles requests with cProfile and tracemalloc, when they carry a signed PROFILE_HEADER or
+    are one in every `sample_rate` requests.
+
+    Each profile is stored in `root` as <name>.prof, in the pstats format, next to <name>.json
+    with the route, duration, query count and top allocations of the request. Only the newest
+    `max_profiles` are kept. One request is profiled at a time in each process, and requests
+    arriving meanwhile are served without profiling.
+
+    tracemalloc traces every thread, so the memory of a profile is only that of its request if no
+    other request was served meanwhile. Its `memory_scope` is "request" then, and "process"
+    otherwise. The content of streaming responses is produced after the view returns, outside
+    of the profile, and their profiles are marked `partial`.
+    """
+
+    # Number of allocation sites stored with each profile
+    top_allocations = 10
+
+    def __init__(self, root, sample_rate, max_profiles, token_max_age):
+        self.root = Path(root)
+        self.sample_rate = sample_rate
+        self.max_profiles = max_profiles
+        self.token_max_age = token_max_age
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+        # Requests being served, and ever started, by this process
+        self.in_flight = 0
+        self.started = 0
+        self.requests_lock = threading.Lock()
+        self.signer = signing.TimestampSigner(salt="api.profiling")
+
+    def create_token(self):
+        return self.signer.sign("profile")
+
+    def get_trigger(self, request):
+        """
+        Returns why the request should be profiled, or None if it should not.
+        """
+        token = request.headers.get(PROFILE_HEADER)
+        if token:
+            try:
+                self.signer.unsign(token, max_age=self.token_max_age)
+                return "header"
+            except signing.BadSignature:
+                pass
+        if self.sample_rate and next(self.counter) % self.sample_rate == 0:
+            return "sample"
+        return None
+
+    @contextmanager
+    def serving(self):
+        with self.requests_lock:
+            self.in_flight += 1
+            self.started += 1
+        try:
+            yield
+        finally:
+            with self.requests_lock:
+                self.in_flight -= 1
+
+    def profile(self, request, get_response):
+        """
+        Returns get_response(), profiling it if the request should be profiled.
+        """
+        with self.serving():
+            return self.profile_request(request, get_response)
+
+    def profile_request(self, request, get_response):
+        trigger = self.get_trigger(request)
+        if trigger is None or not self.lock.acquire(blocking=False):
+            return get_response()
+
+        try:
+            profiler = cProfile.Profile()
+            metrics = RequestMetrics()
+            # If tracemalloc was already started, e.g. by PYTHONTRACEMALLOC, the peak memory
+            # covers the time since then, and is process-wide too
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start()
+            start = time.perf_counter()
+            process_wide, started = was_tracing or self.in_flight > 1, self.started
+            try:
+                with capture_queries(metrics):
+                    profiler.enable()
+                    try:
+                        response = get_response()
+                    finally:
+                        profiler.disable()
+                duration = time.perf_counter() - start
+                process_wide |= self.in_flight > 1 or self.started != started
+                _, peak_memory = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                if not was_tracing:
+                    tracemalloc.stop()
+
+            name = self.save(
+                profiler,
+                snapshot,
+                {
+                    "route": request.resolver_match.view_name,
+                    "method": request.method,
+                    "path": request.get_full_path(),
+                    "status": response.status_code,
+                    "trigger": trigger,
+                    "duration_ms": round(duration * 1000, 3),
+                    "queries": metrics.queries,
+                    "sql_ms": round(metrics.sql_time * 1000, 3),
+                    "peak_memory_kib": round(peak_memory / 1024, 1),
+                    "memory_scope": "process" if process_wide else "request",
+                    "partial": response.streaming,
+                },
+            )
+        finally:
+            self.lock.release()
+
+        response[PROFILE_ID_HEADER] = name
+        return response
+
+    def save(self, profiler, snapshot, details):
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Names sort by the time they were taken
+        name = f"{time.time_ns()}-{os.getpid()}-{details['route']}"
+        details["name"] = name
+        details["top_allocations"] = [
+            {
+                "frame": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_kib": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            for stat in snapshot.filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)]
+            ).statistics("lineno")[: self.top_allocations]
+        ]
+
+        profiler.dump_stats(self.root / f"{name}.prof")
+        # Written last, so that every listed profile has its stats
+        temp_path = self.root / f"{name}.json.tmp"
+        temp_path.write_text(json.dumps(details, indent=2))
+        os.replace(temp_path, self.root / f"{name}.json")
+
+        self.rotate()
+        return name
+
+    def rotate(self):
+        names = sorted(path.stem for path in self.root.glob("*.json"))
+        for name in names[: max(len(names) - self.max_profiles, 0)]:
+            for suffix in (".json", ".prof"):
+                (self.root / f"{name}{suffix}").unlink(missing_ok=True)
+
+    def list_profiles(self):
+        """
+        Returns the details of every stored profile.
+        """
+        profiles = []
+        for path in self.root.glob("*.json"):
+            try:
+                profiles.append(json.loads(path.read_text()))
+            except (FileNotFoundError, ValueError):
+                # Rotated away or being written by another process
+                pass
+        return profiles
+
+    def stats_path(self, name):
+        return self.root / f"{name}.prof"
+
+
+request_profiler = RequestProfiler(
+    root=settings.REQUEST_PROFILING["ROOT"],
+    sample_rate=settings.REQUEST_PROFILING["SAMPLE_RATE"],
+    max_profiles=settings.REQUEST_PROFILING["MAX_PROFILES"],
+    token_max_age=settings.REQUEST_PROFILING["TOKEN_MAX_AGE"],
+)
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set while a safe request is served, so that its queries read from the replica
+reading_from_replica = ContextVar("reading_from_replica", default=False)
+
+_END = object()
+
+
+class ReadReplica:
+    """
+    Routes the reads of safe requests to the `alias` database, a replica of the default one,
+    while every write, and every read of an unsafe request, goes to the default database.
+
+    Replicas lag behind the default database. A client which wrote is sent a `cookie_name`
+    cookie which expires after `sticky_seconds`, and until then its reads go to the default
+    database too, so that it reads its own writes.
+    """
+
+    def __init__(self, alias, sticky_seconds, cookie_name):
+        self.alias = alias
+        self.sticky_seconds = sticky_seconds
+        self.cookie_name = cookie_name
+
+    @contextmanager
+    def reading(self):
+        token = reading_from_replica.set(True)
+        try:
+            yield
+        finally:
+            reading_from_replica.reset(token)
+
+    def stream(self, content):
+        """
+        Reads from the replica while producing each chunk of streamed content, which is
+        iterated after the view returned.
+        """
+        iterator = iter(content)
+        while True:
+            with self.reading():
+                chunk = next(iterator, _END)
+            if chunk is _END:
+                return
+            yield chunk
+
+    def is_pinned(self, request):
+        return self.cookie_name in request.COOKIES
+
+    def pin(self, response):
+        response.set_cookie(
+            self.cookie_name, "1", max_age=self.sticky_seconds, samesite="Lax"
+        )
+
+    def alias_for(self, alias):
+        """
+        Returns the database to read from instead of `alias`: the replica while reading from
+        it, if `alias` is the default database.
+        """
+        if (
+            alias == DEFAULT_DB_ALIAS
+            and reading_from_replica.get()
+            and self.is_available()
+        ):
+            return self.alias
+        return alias
+
+    def primary_for(self, alias):
+        return DEFAULT_DB_ALIAS if alias == self.alias else alias
+
+    def is_available(self):
+        """
+        Whether the replica is configured, and is a separate database. Test mirrors of the
+        default database are read through the default connection, so that reads see the
+        writes of the current transaction. SQLite stand-ins are only read once synced.
+        """
+        if self.alias is None or self.alias not in connections:
+            return False
+        replica = connections[self.alias].settings_dict
+        if replica["NAME"] == connections[DEFAULT_DB_ALIAS].settings_dict["NAME"]:
+            return False
+        if replica["ENGINE"] == "django.db.backends.sqlite3":
+            return Path(replica["NAME"]).exists()
+        return True
+
+
+class ReplicaRouter:
+    """
+    Database router sending the reads of safe requests to `read_replica`.
+    """
+
+    def db_for_read(self, model, **hints):
+        # Also when reading through a relation from an object of another database, e.g. the
+        # form of a submission stored on a shard
+        return read_replica.alias_for(DEFAULT_DB_ALIAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema of the default database
+        if db == read_replica.alias:
+            return False
+        return None
+
+
+class SQLiteReplicaSync:
+    """
+    Copies the default SQLite database into the `alias` database file with SQLite's online
+    backup API, a stand-in for the replication of a database server. The copy is a consistent
+    snapshot, taken without blocking writers for longer than copying takes.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def sync(self):
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != "sqlite":
+            raise NotImplementedError(
+                f"Cannot copy {source.vendor} databases, use the database's replication"
+            )
+        replica_path = Path(connections[self.alias].settings_dict["NAME"])
+        # The first copy is written aside, as the replica is read as soon as its file exists
+        first_copy = not replica_path.exists()
+        target_path = replica_path.with_name(replica_path.name + ".tmp")
+        source.ensure_connection()
+        target = sqlite3.connect(
+            target_path if first_copy else replica_path,
+            timeout=settings.SQLITE_PRAGMAS["busy_timeout"] / 1000,
+        )
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
+        if first_copy:
+            os.replace(target_path, replica_path)
+
+
+read_replica = ReadReplica(
+    alias=settings.READ_REPLICA["ALIAS"],
+    sticky_seconds=settings.READ_REPLICA["STICKY_SECONDS"],
+    cookie_name=settings.READ_REPLICA["COOKIE_NAME"],
+)
@@ -0,0 +1,163 @@
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import FrozenSet, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from api.models import Choice, Form, Question
+
+
+@dataclass(frozen=True)
+class FormSchema:
+    """
+    The answer schema of one version of a form: its questions in display_order, with their
+    types and valid choice_ids.
+    """
+
+    form_id: int
+    version: int
+    question_ids: Tuple[int, ...]
+    question_types: Tuple[str, ...]
+    choice_ids: Tuple[FrozenSet[int], ...]
+
+    @property
+    def questions(self):
+        """
+        (question id, question type) pairs in display_order.
+        """
+        return tuple(zip(self.question_ids, self.question_types))
+
+    @classmethod
+    def compile(cls, form_id, version):
+        questions = list(
+            Question.all_objects.filter(form_id=form_id)
+            .in_version(version)
+            .order_by("display_order")
+            .values_list("id", "question_type")
+        )
+        choice_ids = {question_id: set() for question_id, _ in questions}
+        for question_id, choice_id in Choice.objects.filter(
+            question_id__in=choice_ids.keys()
+        ).values_list("question_id", "choice_id"):
+            choice_ids[question_id].add(choice_id)
+
+        return cls(
+            form_id=form_id,
+            version=version,
+            question_ids=tuple(question_id for question_id, _ in questions),
+            question_types=tuple(question_type for _, question_type in questions),
+            choice_ids=tuple(
+                frozenset(choice_ids[question_id]) for question_id, _ in questions
+            ),
+        )
+
+
+class FormSchemaCache:
+    """
+    Two tier cache of compiled form schemas.
+
+    Schemas are kept in a bounded in-process LRU keyed by (form id, version), in front of a
+    Django cache shared between processes, which holds the latest compiled version of each form.
+
+    The answer schema of a version only changes when questions are edited outside of the form
+    serializers, e.g. in the admin site. Every invalidation therefore stores a new generation
+    token for the form in the shared cache, and cached schemas are only used while they were
+    compiled in the current generation. Lookups by the version stored on a form or submission
+    thus need one shared cache read, and no queries, once cached.
+    """
+
+    def __init__(self, max_size, cache_alias, timeout):
+        self.max_size = max_size
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias]
+
+    def shared_key(self, form_id):
+        return f"form-schema:{form_id}"
+
+    def generation_key(self, form_id):
+        return f"form-schema-generation:{form_id}"
+
+    def get(self, form_id, version):
+        key = (form_id, version)
+        generation_key, shared_key = self.generation_key(form_id), self.shared_key(
+            form_id
+        )
+        cached = self.shared.get_many([generation_key, shared_key])
+        generation = cached.get(generation_key)
+        with self.lock:
+            local_generation, schema = self.local.get(key, (None, None))
+            if schema is not None and local_generation == generation:
+                self.local.move_to_end(key)
+                return schema
+
+        shared_generation, shared_schema = cached.get(shared_key, (None, None))
+        if shared_generation != generation:
+            shared_schema = None
+        if shared_schema is not None and shared_schema.version == version:
+            schema = shared_schema
+        else:
+            schema = FormSchema.compile(form_id, version)
+            # Schemas of past versions, used by updates to old submissions, are not shared
+            if shared_schema is None or shared_schema.version < version:
+                self.shared.set(shared_key, (generation, schema), self.timeout)
+
+        with self.lock:
+            self.local[key] = (generation, schema)
+            self.local.move_to_end(key)
+            while len(self.local) > self.max_size:
+                self.local.popitem(last=False)
+        return schema
+
+    def invalidate(self, form_id):
+        # A random token rather than a counter, which could not be incremented atomically in
+        # every cache backend
+        self.shared.set(self.generation_key(form_id), uuid.uuid4().hex, None)
+        self.shared.delete(self.shared_key(form_id))
+        with self.lock:
+            for key in [key for key in self.local if key[0] == form_id]:
+                del self.local[key]
+
+    def clear(self):
+        with self.lock:
+            self.local.clear()
+
+
+form_schema_cache = FormSchemaCache(
+    max_size=settings.FORM_SCHEMA_CACHE["MAX_SIZE"],
+    cache_alias=settings.FORM_SCHEMA_CACHE["CACHE_ALIAS"],
+    timeout=settings.FORM_SCHEMA_CACHE["TIMEOUT"],
+)
+
+
+def get_form_schema(form_id, version):
+    return form_schema_cache.get(form_id, version)
+
+
+def invalidate_form_schema(form_id):
+    form_schema_cache.invalidate(form_id)
+    # Again once the transaction commits, in case another process compiled the schema from the
+    # previous rows in the meantime
+    transaction.on_commit(lambda: form_schema_cache.invalidate(form_id))
+
+
+def get_form_schemas(form_ids):
+    """
+    Returns {form id: schema of the current version} for the given forms which exist, with one
+    query for the form versions.
+    """
+    return {
+        form_id: get_form_schema(form_id, version)
+        for form_id, version in Form.objects.filter(id__in=form_ids).values_list(
+            "id", "version"
+        )
+    }
@@ -1,5 +1,16 @@
+from .eager_loading import EagerLoadingMixin
 from .choice_serializer import ChoiceSerializer
 from .question_serializer import QuestionSerializer
 from .form_serializer import FormSerializer
 from .answer_serializer import AnswerSerializer
-from .submission_serializer import SubmissionReadSerializer, SubmissionWriteSerializer
+from .submission_serializer import (
+    SubmissionBulkItemSerializer,
+    SubmissionCompactSerializer,
+    SubmissionReadSerializer,
+    SubmissionWriteSerializer,
+)
+from .values_serializer import (
+    FormValuesSerializer,
+    SubmissionCompactValuesSerializer,
+    SubmissionValuesSerializer,
+)
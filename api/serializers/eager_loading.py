@@ -0,0 +1,20 @@
+class EagerLoadingMixin:
+    """
+    Declares the related rows a serializer renders, so that viewsets can load them in a
+    fixed number of queries instead of one query per nested instance.
+
+    Serializers nesting other serializers compose their prefetches via `get_prefetches`,
+    passing the lookup prefix under which the nested serializer is rendered.
+    """
+
+    select_related_fields = ()
+
+    @classmethod
+    def get_prefetches(cls, prefix=""):
+        return []
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        return queryset.prefetch_related(*cls.get_prefetches())
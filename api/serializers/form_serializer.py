@@ -1,9 +1,15 @@
+from django.db import transaction
+from django.db.models import F, Prefetch, prefetch_related_objects
 from rest_framework import serializers
-from api.models import Choice, Form, Question, Submission
-from . import QuestionSerializer
+from api.answers import MAX_CHECKBOX_CHOICES
+from api.models import Form, Question
+from api.schema import invalidate_form_schema
+from api.sqlite import retry_on_busy
+from api.writers import create_questions, update_questions
+from . import EagerLoadingMixin, QuestionSerializer
 
 
-class FormSerializer(serializers.ModelSerializer):
+class FormSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     questions = QuestionSerializer(many=True)
     INVALID_DISPLAY_ORDER_MESSAGE = (
         "display_order must be in running order starting from 1!"
@@ -15,66 +21,64 @@ class FormSerializer(serializers.ModelSerializer):
     NO_CHOICES_SPECIFIED_MESSAGE = (
         "Radio and Checkbox questions must have at least 1 choice!"
     )
+    TOO_MANY_CHECKBOX_CHOICES_MESSAGE = (
+        f"Checkbox questions can have at most {MAX_CHECKBOX_CHOICES} choices!"
+    )
 
     class Meta:
         model = Form
         fields = "__all__"
-
+        read_only_fields = ("version", "revision", "updated_at")
+
+    @classmethod
+    def get_prefetches(cls, prefix=""):
+        return [
+            Prefetch(
+                prefix + "questions",
+                queryset=Question.objects.order_by("display_order"),
+            ),
+            *QuestionSerializer.get_prefetches(prefix + "questions__"),
+        ]
+
+    @retry_on_busy
     def create(self, validated_data):
-        questions = validated_data.pop("questions")
-
-        form_instance = Form.objects.create(title=validated_data["title"])
-
-        # Handle creation of questions and corresponding choices
-        for question in questions:
-            choices = []
-            if "choices" in question:
-                choices = question.pop("choices")
-
-            question_instance = Question.objects.create(
-                **question,
-                form_id=form_instance,
-            )
-
-            choices = map(
-                lambda c: Choice.objects.create(**c, question_id=question_instance),
-                choices,
-            )
+        questions = validated_data["questions"]
 
-            question_instance.choices.set(choices)
+        # Handle creation of questions and corresponding choices, with a fixed number of
+        # statements per form
+        with transaction.atomic():
+            form_instance = Form.objects.create(title=validated_data["title"])
+            create_questions(form_instance, questions)
+            invalidate_form_schema(form_instance.id)
 
+        prefetch_related_objects([form_instance], *self.get_prefetches())
         return form_instance
 
     def update(self, instance, validated_data):
-        # NOTE: For a simplified implementation, this method does a cascading delete on all existing questions,
-        # choices, submissions, answers in this form. As a result, updating a form would cause existing submissions
-        # and answers to be lost.
-        instance.questions.all().delete()
-        Submission.objects.filter(form_id=instance).delete()
-
-        instance.title = validated_data["title"]
-        questions = validated_data.pop("questions")
-
-        # Handle recreation of questions and corresponding choices
-        for question in questions:
-            choices = []
-            if "choices" in question:
-                choices = question.pop("choices")
-
-            question_instance = Question.objects.create(
-                **question,
-                form_id=instance,
-            )
-
-            choices = map(
-                lambda c: Choice.objects.create(**c, question_id=question_instance),
-                choices,
-            )
-
-            question_instance.choices.set(choices)
-
-        instance.save()
-        return instance
+        # Only the questions and choices which changed are written. If the answer schema changes,
+        # the form moves to a new version, and existing submissions stay bound to the version
+        # they answered.
+        self.write_update(instance, validated_data)
+
+        # NOTE: Returns a fresh instance, as DRF discards the prefetched questions of the updated
+        # instance before rendering the response
+        return self.setup_eager_loading(Form.objects.filter(id=instance.id)).get()
+
+    @retry_on_busy
+    def write_update(self, instance, validated_data):
+        with transaction.atomic():
+            # The revision is incremented in the database first, which locks the form row (and
+            # takes the SQLite write lock) up front. The version and revision are then read back
+            # under the lock, so that concurrent updates cannot start the same version.
+            forms = Form.objects.filter(id=instance.id)
+            forms.update(revision=F("revision") + 1)
+            instance.version, instance.revision = forms.values_list(
+                "version", "revision"
+            ).get()
+            instance.title = validated_data["title"]
+            update_questions(instance, validated_data["questions"])
+            instance.save()
+            invalidate_form_schema(instance.id)
 
     def validate(self, data):
 
@@ -113,6 +117,15 @@ class FormSerializer(serializers.ModelSerializer):
             if not check_running_order(choices, "choice_id"):
                 raise serializers.ValidationError(self.INVALID_CHOICE_ID_MESSAGE)
 
+            # Checkbox answers are stored as a bitmask of the choice_id's, which limits their number
+            if (
+                question["question_type"] == "checkbox"
+                and len(choices) > MAX_CHECKBOX_CHOICES
+            ):
+                raise serializers.ValidationError(
+                    self.TOO_MANY_CHECKBOX_CHOICES_MESSAGE
+                )
+
         questions = data["questions"]
 
         if not check_running_order(questions, "display_order"):
@@ -1,12 +1,21 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from api.models import Choice, Question
-from . import ChoiceSerializer
+from . import ChoiceSerializer, EagerLoadingMixin
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     # Not required, to account for textbox questions which do not contain choices
     choices = ChoiceSerializer(many=True, required=False)
+    # Optional in PUT requests to a form, where it identifies the existing question
+    id = serializers.IntegerField(required=False)
 
     class Meta:
         model = Question
         fields = ("id", "display_order", "question", "question_type", "choices")
+
+    @classmethod
+    def get_prefetches(cls, prefix=""):
+        return [
+            Prefetch(prefix + "choices", queryset=Choice.objects.order_by("choice_id"))
+        ]
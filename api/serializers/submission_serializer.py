@@ -1,6 +1,13 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
+from api.answers import parse_choice_ids
+from api.filters import MAX_INTEGER, MIN_INTEGER
 from api.models import Answer, Form, Question, Submission
-from . import AnswerSerializer, FormSerializer, QuestionSerializer
+from api.schema import get_form_schema
+from api.sqlite import retry_on_busy
+from api.writers import create_submissions, replace_answers
+from . import AnswerSerializer, EagerLoadingMixin, FormSerializer, QuestionSerializer
 
 
 class SubmissionWriteSerializer(serializers.ModelSerializer):
@@ -19,45 +26,47 @@ class SubmissionWriteSerializer(serializers.ModelSerializer):
         "Question types do not match the specified form!"
     )
     FORM_ID_NOT_SPECIFIED_MESSAGE = "form_id is required!"
+    INVALID_RADIO_ANSWER_MESSAGE = (
+        "Radio answers must be the choice_id of one of the question's choices!"
+    )
+    INVALID_CHECKBOX_ANSWER_MESSAGE = (
+        "Checkbox answers must be comma separated choice_ids of the question's choices!"
+    )
 
     class Meta:
         model = Submission
         fields = "__all__"
+        read_only_fields = ("form_version", "revision", "updated_at")
 
     def create(self, validated_data):
         answers = validated_data.pop("answers")
         form_id = validated_data["form_id"]
 
-        submission_instance = Submission.objects.create(form_id=form_id)
-        question_instances = Question.objects.filter(form_id=form_id).order_by(
-            "display_order"
+        [submission_instance] = create_submissions(
+            [(form_id.id, form_id.version, self.form_questions, answers)]
         )
-
-        for idx, answer in enumerate(answers):
-            Answer.objects.create(
-                question_id=question_instances[idx],
-                answer=answer["answer"],
-                submission_id=submission_instance,
-            )
-
         return submission_instance
 
     def update(self, instance, validated_data):
         # NOTE: For a simplified implementation, this method deletes and recreates the answers in the submission
-        instance.answers.all().delete()
+        self.write_answers(instance, instance.revision + 1, validated_data["answers"])
+        return instance
 
-        question_instances = Question.objects.filter(form_id=instance.form_id).order_by(
-            "display_order"
+    @retry_on_busy
+    def write_answers(self, instance, revision, answers):
+        with transaction.atomic(using=instance._state.db):
+            # Written before reading the previous answers, so that the transaction waits for the
+            # SQLite write lock up front, rather than failing to upgrade a read transaction
+            instance.revision = revision
+            instance.save(update_fields=["revision", "updated_at"])
+            replace_answers(instance, self.form_questions, answers)
+
+    def to_representation(self, instance):
+        # Answers in the order they were created, which is the display_order of their questions
+        prefetch_related_objects(
+            [instance], Prefetch("answers", queryset=Answer.objects.order_by("id"))
         )
-
-        for idx, answer in enumerate(validated_data["answers"]):
-            Answer.objects.create(
-                question_id=question_instances[idx],
-                answer=answer["answer"],
-                submission_id=instance,
-            )
-
-        return instance
+        return super().to_representation(instance)
 
     def validate(self, data):
         request_method = self.context["request"].method
@@ -65,41 +74,137 @@ class SubmissionWriteSerializer(serializers.ModelSerializer):
         if request_method == "POST":
             if "form_id" not in data:
                 raise serializers.ValidationError(self.FORM_ID_NOT_SPECIFIED_MESSAGE)
-            form_id = data["form_id"]
+            form_id = data["form_id"].id
+            form_version = data["form_id"].version
         else:
-            # PUT
-            form_id = self.instance.form_id
+            # PUT, against the version of the form which the submission answered
+            form_id = self.instance.form_id_id
+            form_version = self.instance.form_version
 
         answers = data["answers"]
-        question_instances = Question.objects.filter(form_id=form_id).order_by(
-            "display_order"
-        )
 
+        # The compiled schema is cached, and its questions are shared with create and update
+        schema = get_form_schema(form_id, form_version)
+        self.form_questions = schema.questions
+        self.validate_answer_types(answers, schema.question_types)
+        self.validate_answer_formats(answers, schema.question_types, schema.choice_ids)
+
+        return data
+
+    @classmethod
+    def validate_answer_types(cls, answers, form_question_types):
+        """
+        Validates answers against the question types of a form, given in display_order.
+        """
         # NOTE: Assumes that answers given in display_order of questions
 
         # Validate number of answers provided
-        if len(question_instances) != len(answers):
-            raise serializers.ValidationError(self.INVALID_ANSWERS_LENGTH_MESSAGE)
+        if len(form_question_types) != len(answers):
+            raise serializers.ValidationError(cls.INVALID_ANSWERS_LENGTH_MESSAGE)
 
         # Validate that the answer 'question types' are valid, and match the corresponding question
         question_types = list(map(lambda e: e[0], Question.QuestionTypes))
         for idx, answer in enumerate(answers):
             if answer["question_type"] not in question_types:
-                raise serializers.ValidationError(self.INVALID_QUESTION_TYPE_MESSAGE)
-            if answer["question_type"] != question_instances[idx].question_type:
+                raise serializers.ValidationError(cls.INVALID_QUESTION_TYPE_MESSAGE)
+            if answer["question_type"] != form_question_types[idx]:
                 raise serializers.ValidationError(
-                    self.INVALID_QUESTION_TYPE_MATCH_MESSAGE
+                    cls.INVALID_QUESTION_TYPE_MATCH_MESSAGE
                 )
 
-        # TODO: Future extension. Validate the answer format based on the question type.
+    @classmethod
+    def validate_answer_formats(cls, answers, form_question_types, form_choice_ids):
+        """
+        Validates that radio and checkbox answers select choices of their question, so that they
+        can be stored as integers. Answers must have passed validate_answer_types.
+        """
+        invalid_messages = {
+            "radio": cls.INVALID_RADIO_ANSWER_MESSAGE,
+            "checkbox": cls.INVALID_CHECKBOX_ANSWER_MESSAGE,
+        }
+        for answer, question_type, choice_ids in zip(
+            answers, form_question_types, form_choice_ids
+        ):
+            if question_type not in invalid_messages:
+                continue
+            try:
+                selected_choice_ids = parse_choice_ids(question_type, answer["answer"])
+            except ValueError:
+                selected_choice_ids = None
+            if selected_choice_ids is None or not choice_ids.issuperset(
+                selected_choice_ids
+            ):
+                raise serializers.ValidationError(invalid_messages[question_type])
+
+
+class SubmissionReadSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    answers = AnswerSerializer(many=True)
+    form_id = FormSerializer()
+    select_related_fields = ("form_id",)
+
+    class Meta:
+        model = Submission
+        fields = "__all__"
 
+    @classmethod
+    def get_prefetches(cls, prefix=""):
+        return [
+            Prefetch(prefix + "answers", queryset=Answer.objects.order_by("id")),
+            *FormSerializer.get_prefetches(prefix + "form_id__"),
+        ]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # The nested form has the questions of the version which the submission answered
+        if instance.form_version != instance.form_id.version:
+            questions = QuestionSerializer.setup_eager_loading(
+                Question.all_objects.filter(form_id=instance.form_id_id)
+                .in_version(instance.form_version)
+                .order_by("display_order")
+            )
+            data["form_id"]["questions"] = QuestionSerializer(questions, many=True).data
         return data
 
 
-class SubmissionReadSerializer(serializers.ModelSerializer):
+class SubmissionCompactSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    """
+    Renders the form of a submission by its id only. Used for responses which side-load
+    each distinct form once, instead of nesting it in every submission.
+    """
+
     answers = AnswerSerializer(many=True)
-    form_id = FormSerializer()
 
     class Meta:
         model = Submission
         fields = "__all__"
+
+    @classmethod
+    def get_prefetches(cls, prefix=""):
+        return [Prefetch(prefix + "answers", queryset=Answer.objects.order_by("id"))]
+
+
+class SubmissionBulkItemSerializer(serializers.Serializer):
+    """
+    Validates one submission of a bulk upload, against the schemas of every form in the upload
+    passed as `schemas_by_form` in the context.
+    """
+
+    form_id = serializers.IntegerField(min_value=MIN_INTEGER, max_value=MAX_INTEGER)
+    answers = AnswerSerializer(many=True)
+    FORM_DOES_NOT_EXIST_MESSAGE = "Form does not exist!"
+
+    def validate(self, data):
+        schema = self.context["schemas_by_form"].get(data["form_id"])
+        if schema is None:
+            raise serializers.ValidationError(
+                {"form_id": [self.FORM_DOES_NOT_EXIST_MESSAGE]}
+            )
+
+        SubmissionWriteSerializer.validate_answer_types(
+            data["answers"], schema.question_types
+        )
+        SubmissionWriteSerializer.validate_answer_formats(
+            data["answers"], schema.question_types, schema.choice_ids
+        )
+        data["schema"] = schema
+        return data
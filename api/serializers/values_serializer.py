@@ -0,0 +1,213 @@
+from collections import defaultdict
+
+from rest_framework import serializers
+from api.models import Answer, Choice, Form, Question
+from api.sharding import shards
+
+# Formats datetimes exactly as the DateTimeFields of the model serializers
+datetime_field = serializers.DateTimeField()
+
+
+class FormValuesSerializer:
+    """
+    Renders forms exactly as FormSerializer does, from `.values(*fields)` rows rather than model
+    instances. Questions and choices are each read with one `.values()` query for every form at
+    once, and grouped into the forms by their foreign keys, without instantiating models or
+    serializer fields.
+    """
+
+    fields = ("id", "title", "version", "revision", "updated_at")
+    question_fields = ("id", "form_id", "display_order", "question", "question_type")
+
+    @classmethod
+    def to_representation(cls, rows):
+        questions = cls.get_questions([row["id"] for row in rows])
+        return [cls.represent_form(row, questions[row["id"]]) for row in rows]
+
+    @classmethod
+    def represent_form(cls, row, questions):
+        # Keys are in the order of FormSerializer's fields
+        return {
+            "id": row["id"],
+            "questions": questions,
+            "title": row["title"],
+            "version": row["version"],
+            "revision": row["revision"],
+            "updated_at": datetime_field.to_representation(row["updated_at"]),
+        }
+
+    @classmethod
+    def get_questions(cls, form_ids):
+        """
+        Returns {form id: the representations of its current questions, in display_order}.
+        """
+        questions = defaultdict(list)
+        if not form_ids:
+            return questions
+
+        rows = list(
+            Question.objects.filter(form_id__in=form_ids)
+            .order_by("display_order")
+            .values(*cls.question_fields)
+        )
+        represented = cls.represent_questions(rows)
+        for row in rows:
+            questions[row["form_id"]].append(represented[row["id"]])
+        return questions
+
+    @classmethod
+    def represent_questions(cls, rows):
+        """
+        Returns {question id: its representation} of `.values(*question_fields)` rows, with the
+        choices of every question read with one query.
+        """
+        questions = {
+            row["id"]: {
+                "id": row["id"],
+                "display_order": row["display_order"],
+                "question": row["question"],
+                "question_type": row["question_type"],
+                "choices": [],
+            }
+            for row in rows
+        }
+        if questions:
+            for row in (
+                Choice.objects.filter(question_id__in=questions)
+                .order_by("choice_id")
+                .values("id", "question_id", "choice", "choice_id")
+            ):
+                questions[row["question_id"]]["choices"].append(
+                    {
+                        "id": row["id"],
+                        "choice": row["choice"],
+                        "choice_id": row["choice_id"],
+                    }
+                )
+        return questions
+
+
+class SubmissionValuesSerializer:
+    """
+    Renders submissions exactly as SubmissionReadSerializer does, from `.values(*fields)` rows.
+    The nested forms are read from the catalog with one query, and rendered once per distinct
+    form. Answers are read from the shard of each submission, see api/sharding.py.
+    """
+
+    fields = ("id", "form_id", "form_version", "revision", "updated_at")
+
+    @classmethod
+    def to_representation(cls, rows):
+        answers = cls.get_row_answers(rows)
+        forms = cls.get_forms({(row["form_id"], row["form_version"]) for row in rows})
+        return [
+            {
+                "id": row["id"],
+                "answers": answers[row["id"]],
+                "form_id": forms[row["form_id"], row["form_version"]],
+                "form_version": row["form_version"],
+                "revision": row["revision"],
+                "updated_at": datetime_field.to_representation(row["updated_at"]),
+            }
+            for row in rows
+            # Submissions of deleted forms are deleted from other shards and the archive once
+            # the form's deletion commits
+            if (row["form_id"], row["form_version"]) in forms
+        ]
+
+    @classmethod
+    def get_forms(cls, form_versions):
+        """
+        Returns {(form id, version): the representation of the form}, which nests the questions
+        of that version of the form, with one query each for the forms, their questions of every
+        version, and their choices.
+        """
+        if not form_versions:
+            return {}
+        forms = {
+            row["id"]: row
+            for row in Form.objects.filter(
+                id__in={form_id for form_id, _ in form_versions}
+            ).values(*FormValuesSerializer.fields)
+        }
+        rows = list(
+            Question.all_objects.filter(form_id__in=forms)
+            .order_by("display_order")
+            .values(
+                *FormValuesSerializer.question_fields,
+                "added_in_version",
+                "removed_in_version",
+            )
+        )
+        questions = FormValuesSerializer.represent_questions(rows)
+        return {
+            (form_id, version): FormValuesSerializer.represent_form(
+                forms[form_id],
+                [
+                    questions[row["id"]]
+                    for row in rows
+                    if row["form_id"] == form_id
+                    and row["added_in_version"] <= version
+                    and (
+                        row["removed_in_version"] is None
+                        or row["removed_in_version"] > version
+                    )
+                ],
+            )
+            for form_id, version in form_versions
+            if form_id in forms
+        }
+
+    @classmethod
+    def get_row_answers(cls, rows):
+        # Rows of archived submissions carry their answers, see api/archive.py
+        answers = cls.get_answers([row["id"] for row in rows if "answers" not in row])
+        answers.update({row["id"]: row["answers"] for row in rows if "answers" in row})
+        return answers
+
+    @classmethod
+    def get_answers(cls, submission_ids):
+        """
+        Returns {submission id: the representations of its answers, in id order}, with one
+        query for each shard storing the submissions.
+        """
+        answers = defaultdict(list)
+        for alias, shard_submission_ids in shards.group_submissions(
+            submission_ids
+        ).items():
+            for row in (
+                Answer.objects.using(shards.for_read(alias))
+                .filter(submission_id__in=shard_submission_ids)
+                .order_by("id")
+                .values("id", "submission_id", "answer", "question_id")
+            ):
+                answers[row["submission_id"]].append(
+                    {
+                        "id": row["id"],
+                        "answer": row["answer"],
+                        "question_id": row["question_id"],
+                    }
+                )
+        return answers
+
+
+class SubmissionCompactValuesSerializer(SubmissionValuesSerializer):
+    """
+    Renders submissions exactly as SubmissionCompactSerializer does, with the form by its id
+    only.
+    """
+
+    @classmethod
+    def to_representation(cls, rows):
+        answers = cls.get_row_answers(rows)
+        return [
+            {
+                "id": row["id"],
+                "answers": answers[row["id"]],
+                "form_version": row["form_version"],
+                "revision": row["revision"],
+                "updated_at": datetime_field.to_representation(row["updated_at"]),
+                "form_id": row["form_id"],
+            }
+            for row in rows
+        ]
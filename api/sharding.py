@@ -0,0 +1,196 @@
+import zlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_migrate, pre_delete
+from django.dispatch import receiver
+
+from api.models import Answer, Form, Question, Submission, Tally
+from api.replica import read_replica
+
+# Models whose rows are placed on the shard of their form. Every other model is stored in the
+# catalog, the default database
+SHARDED_MODELS = ("submission", "answer", "tally")
+# Tables whose ids are allocated from the range of their shard
+SHARD_ID_TABLES = ("api_submission", "api_answer")
+# Databases whose id sequences reserve_ids can move
+SEQUENCE_VENDORS = ("sqlite", "postgresql")
+
+
+class ShardSet:
+    """
+    The databases which store submissions, answers and tallies, given by their `aliases`.
+
+    The rows of a form are placed on one shard, chosen by a stable hash of the form id, so that
+    a form's submissions, answers and tallies are written in one transaction. The shard of a
+    submission is known from its id alone: the shard at index i allocates submission and
+    answer ids from i * id_offset + 1 onwards.
+
+    Reads of safe requests go to the replica of a shard which is the default database, see
+    api/replica.py.
+    """
+
+    def __init__(self, aliases, id_offset):
+        self.aliases = list(aliases)
+        self.id_offset = id_offset
+
+    def for_form(self, form_id):
+        # Form ids are within the signed 64 bit range of their column, which parameters are
+        # checked against before they are looked up, see SubmissionFilterBackend
+        key = int(form_id).to_bytes(8, "big", signed=True)
+        return self.aliases[zlib.crc32(key) % len(self.aliases)]
+
+    def for_submission(self, submission_id):
+        """
+        Returns the shard of a submission id, or None if the id is outside every shard's range.
+        """
+        try:
+            index = (int(submission_id) - 1) // self.id_offset
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= index < len(self.aliases):
+            return None
+        return self.aliases[index]
+
+    def for_read(self, alias):
+        return read_replica.alias_for(alias)
+
+    def group_forms(self, items, key=None):
+        """
+        Returns {shard: the given form ids stored on it}, or of the given items, if `key`
+        returns the form id of an item.
+        """
+        groups = defaultdict(list)
+        for item in items:
+            groups[self.for_form(key(item) if key else item)].append(item)
+        return groups
+
+    def group_submissions(self, submission_ids):
+        """
+        Returns {shard: the given submission ids stored on it}. Ids outside every shard's range
+        are left out.
+        """
+        groups = defaultdict(list)
+        for submission_id in submission_ids:
+            alias = self.for_submission(submission_id)
+            if alias is not None:
+                groups[alias].append(submission_id)
+        return groups
+
+    def reserve_ids(self, alias):
+        """
+        Moves the id sequences of a shard's tables to the start of its range, unless they are
+        past it already. Shards on other databases than SEQUENCE_VENDORS fail the api.E004 system
+        check.
+        """
+        start = self.aliases.index(alias) * self.id_offset
+        if not start:
+            return
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            for table in SHARD_ID_TABLES:
+                if connection.vendor == "sqlite":
+                    cursor.execute(
+                        "INSERT INTO sqlite_sequence (name, seq) SELECT %s, 0 WHERE NOT "
+                        "EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)",
+                        [table, table],
+                    )
+                    cursor.execute(
+                        "UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s",
+                        [start, table, start],
+                    )
+                else:
+                    cursor.execute(
+                        f"SELECT setval(pg_get_serial_sequence(%s, 'id'), %s) "
+                        f"WHERE (SELECT COALESCE(MAX(id), 0) FROM {table}) < %s",
+                        [table, start, start],
+                    )
+
+
+class ShardRouter:
+    """
+    Database router keeping the sharded models on `shards`, and every other model on the
+    default database.
+
+    Queries of sharded models pick their shard with `.using()`, as only the caller knows the
+    form. Related objects are read from the shard of the instance they are related to, e.g. the
+    answers of a submission, or the submissions of a form.
+    """
+
+    def get_shard(self, instance):
+        model_name = instance._meta.model_name
+        if model_name in SHARDED_MODELS:
+            return instance._state.db
+        if model_name == "form":
+            return shards.for_form(instance.pk)
+        if model_name == "question":
+            return shards.for_form(instance.form_id_id)
+        return None
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if model._meta.model_name in SHARDED_MODELS and instance is not None:
+            shard = self.get_shard(instance)
+            if shard:
+                return shards.for_read(shard)
+        return None
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get("instance")
+        if model._meta.model_name in SHARDED_MODELS and instance is not None:
+            shard = self.get_shard(instance)
+            if shard:
+                # Writes go to the shard, never to its replica
+                return read_replica.primary_for(shard)
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS:
+            if model_name in SHARDED_MODELS and db not in shards.aliases:
+                return False
+            return None
+        if db in shards.aliases:
+            # Data migrations without a model hint only run on the default database
+            return app_label == "api" and model_name in SHARDED_MODELS
+        return None
+
+
+@receiver(post_migrate)
+def reserve_shard_ids(sender, using, **kwargs):
+    if sender.label == "api" and using in shards.aliases:
+        shards.reserve_ids(using)
+
+
+@receiver(pre_delete, sender=Form)
+def delete_form_shard_rows(sender, instance, using, **kwargs):
+    """
+    Deletes the submissions, answers and tallies of a deleted form from its shard, which the
+    cascade of the form's deletion does not reach, as sharded rows have no foreign key
+    constraints to the catalog.
+
+    They are deleted once the form's deletion commits, so that a failed deletion keeps them.
+    """
+    alias = shards.for_form(instance.pk)
+    if alias == using:
+        return
+    form_id = instance.pk
+    question_ids = list(
+        Question.all_objects.using(using)
+        .filter(form_id=form_id)
+        .values_list("id", flat=True)
+    )
+
+    def delete_rows():
+        with transaction.atomic(using=alias):
+            Answer.objects.using(alias).filter(submission_id__form_id=form_id).delete()
+            Submission.objects.using(alias).filter(form_id=form_id).delete()
+            Tally.objects.using(alias).filter(question_id__in=question_ids).delete()
+
+    transaction.on_commit(delete_rows, using=using)
+
+
+shards = ShardSet(
+    aliases=settings.SUBMISSION_SHARDS["ALIASES"],
+    id_offset=settings.SUBMISSION_SHARDS["ID_OFFSET"],
+)
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from api.archive import submission_archive
+from api.models import Choice, Form, Question
+from api.schema import invalidate_form_schema
+
+# NOTE: The form serializers invalidate compiled schemas themselves, as their bulk writes do not
+# send signals. These receivers cover forms edited through other means, e.g. the admin site,
+# which change questions in place without starting a new version. Invalidating stores a new
+# generation token in the shared cache, so that every process recompiles the schema.
+
+
+@receiver([post_save, post_delete], sender=Form)
+def invalidate_form(sender, instance, **kwargs):
+    invalidate_form_schema(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_question_form(sender, instance, **kwargs):
+    invalidate_form_schema(instance.form_id_id)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def invalidate_choice_form(sender, instance, **kwargs):
+    form_id = (
+        Question.all_objects.filter(id=instance.question_id_id)
+        .values_list("form_id", flat=True)
+        .first()
+    )
+    if form_id is not None:
+        invalidate_form_schema(form_id)
+
+
+@receiver(pre_delete, sender=Form)
+def delete_form_archive(sender, instance, using, **kwargs):
+    # Deleted once the form's deletion commits, like its rows on other shards, see
+    # delete_form_shard_rows
+    form_id = instance.pk
+    transaction.on_commit(lambda: submission_archive.delete(form_id), using=using)
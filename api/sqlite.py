@@ -0,0 +1,85 @@
+import functools
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# SQLITE_BUSY, and SQLITE_LOCKED, are both raised as an OperationalError with this message
+BUSY_MESSAGE = "database is locked"
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    """
+    Sets settings.SQLITE_PRAGMAS on every new SQLite connection.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+class BusyRetryPolicy:
+    """
+    Retries write transactions which fail because another connection holds the SQLite write
+    lock, up to `attempts` times in total, sleeping for an exponential backoff with full jitter
+    between attempts.
+
+    busy_timeout already waits for the lock, but SQLite returns SQLITE_BUSY at once when a
+    transaction which started by reading tries to write after another connection committed,
+    as waiting could not help; the whole transaction has to be run again. Only the outermost
+    call is retried, as a failed statement inside a transaction cannot be retried alone.
+    """
+
+    def __init__(self, attempts, backoff, max_backoff):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.local = threading.local()
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(self.local, "active", False) or any(
+                connection.in_atomic_block for connection in connections.all()
+            ):
+                return func(*args, **kwargs)
+
+            self.local.active = True
+            try:
+                for attempt in range(1, self.attempts + 1):
+                    try:
+                        return func(*args, **kwargs)
+                    except OperationalError as e:
+                        if BUSY_MESSAGE not in str(e) or attempt == self.attempts:
+                            raise
+                        delay = self.get_delay(attempt)
+                        logger.info(
+                            "%s failed with %r, retrying in %.3fs",
+                            func.__qualname__,
+                            str(e),
+                            delay,
+                        )
+                        time.sleep(delay)
+            finally:
+                self.local.active = False
+
+        return wrapper
+
+    def get_delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+
+retry_on_busy = BusyRetryPolicy(
+    attempts=settings.SQLITE_BUSY_RETRY["ATTEMPTS"],
+    backoff=settings.SQLITE_BUSY_RETRY["BACKOFF"],
+    max_backoff=settings.SQLITE_BUSY_RETRY["MAX_BACKOFF"],
+)
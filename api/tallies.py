@@ -0,0 +1,219 @@
+from collections import Counter
+
+from django.db import connections, router, transaction
+
+from api.answers import answer_choice_ids, typed_answer
+from api.archive import submission_archive
+from api.models import Answer, Choice, Question, Submission, Tally
+from api.sharding import shards
+
+# Databases which support INSERT ... ON CONFLICT DO UPDATE, checked by the api.E003 system check
+UPSERT_VENDORS = ("sqlite", "postgresql")
+
+
+def count_answers(answers, counts=None):
+    """
+    Adds the tally keys counted by `answers`, from their typed columns, to a Counter keyed by
+    (question id, choice_id).
+    """
+    counts = Counter() if counts is None else counts
+    for answer in answers:
+        counts[answer.question_id_id, Tally.ANSWERS] += 1
+        for choice_id in answer_choice_ids(answer.choice_id, answer.choice_mask):
+            counts[answer.question_id_id, choice_id] += 1
+    return counts
+
+
+def apply_tally_deltas(deltas, using=None):
+    """
+    Adds `deltas`, a mapping of (question id, choice_id) to a change in count, to the tallies
+    stored in the `using` database, or the model's default one.
+
+    Each batch of deltas is applied by a single upsert, which inserts missing tallies and
+    increments existing ones in place, so concurrent writers never overwrite each other's counts.
+    Must be called in the transaction which writes the counted answers.
+    """
+    rows = [
+        (question_id, choice_id, delta)
+        for (question_id, choice_id), delta in deltas.items()
+        if delta
+    ]
+    if not rows:
+        return
+
+    using = using or router.db_for_write(Tally)
+    connection = connections[using]
+
+    quote = connection.ops.quote_name
+    table = quote(Tally._meta.db_table)
+    question_column = quote(Tally._meta.get_field("question_id").column)
+    choice_column = quote("choice_id")
+    count_column = quote("count")
+
+    with connection.cursor() as cursor:
+        # Kept below the 999 query parameters allowed by SQLite
+        for start in range(0, len(rows), 300):
+            batch = rows[start : start + 300]
+            cursor.execute(
+                f"INSERT INTO {table} ({question_column}, {choice_column}, {count_column}) "
+                f"VALUES {', '.join(['(%s, %s, %s)'] * len(batch))} "
+                f"ON CONFLICT ({question_column}, {choice_column}) "
+                f"DO UPDATE SET {count_column} = {table}.{count_column} + excluded.{count_column}",
+                [value for row in batch for value in row],
+            )
+
+
+def rebuild_tallies(form_ids=None):
+    """
+    Recounts the tallies of the given forms, or of every form, from the typed columns of their
+    answers, on each shard in turn.
+
+    Returns the number of answers counted.
+    """
+    if form_ids is None:
+        question_ids_by_shard = {alias: None for alias in shards.aliases}
+    else:
+        question_ids_by_shard = {
+            alias: list(
+                Question.all_objects.filter(form_id__in=shard_form_ids).values_list(
+                    "id", flat=True
+                )
+            )
+            for alias, shard_form_ids in shards.group_forms(form_ids).items()
+        }
+
+    num_answers = 0
+    for alias, question_ids in question_ids_by_shard.items():
+        num_answers += rebuild_shard_tallies(alias, question_ids)
+    return num_answers
+
+
+def rebuild_shard_tallies(using, question_ids=None):
+    """
+    Recounts the tallies of the given questions, or of every question, stored on the `using`
+    shard, from the answers in the database and in the archive.
+    """
+    answers = Answer.objects.using(using).only(
+        "question_id", "choice_id", "choice_mask"
+    )
+    tallies = Tally.objects.using(using)
+    if question_ids is not None:
+        answers = answers.filter(question_id__in=question_ids)
+        tallies = tallies.filter(question_id__in=question_ids)
+    counts = Counter()
+    num_answers = 0
+
+    # The tallies are deleted first, so that writers which update them wait for the rebuild
+    with transaction.atomic(using=using):
+        tallies.delete()
+        for answer in answers.iterator(chunk_size=2000):
+            count_answers([answer], counts)
+            num_answers += 1
+        num_answers += count_archived_answers(using, question_ids, counts)
+        Tally.objects.using(using).bulk_create(
+            [
+                Tally(question_id_id=question_id, choice_id=choice_id, count=count)
+                for (question_id, choice_id), count in counts.items()
+            ],
+            batch_size=300,
+        )
+    return num_answers
+
+
+def count_archived_answers(using, question_ids, counts):
+    """
+    Adds the tally keys counted by the archived answers of the forms stored on the `using`
+    shard, to the given questions or to every question, to `counts`. Archived answers are stored
+    as text, and are parsed again. Returns the number of answers counted.
+    """
+    num_answers = 0
+    for form_id, (first_id, last_id) in submission_archive.get_forms().items():
+        if shards.for_form(form_id) != using:
+            continue
+        questions = Question.all_objects.filter(form_id=form_id)
+        if question_ids is not None:
+            questions = questions.filter(id__in=question_ids)
+        question_types = dict(questions.values_list("id", "question_type"))
+        if not question_types:
+            continue
+
+        # Submissions being archived may be in both, and are counted from the database
+        database_ids = set(
+            Submission.objects.using(using)
+            .filter(form_id=form_id, id__range=(first_id, last_id))
+            .values_list("id", flat=True)
+        )
+        for row in submission_archive.form_rows(form_id):
+            if row["id"] in database_ids:
+                continue
+            for answer in row["answers"]:
+                question_type = question_types.get(answer["question_id"])
+                if question_type is None:
+                    continue
+                try:
+                    choice_id, mask = typed_answer(question_type, answer["answer"])
+                except ValueError:
+                    choice_id = mask = None
+                count_answers(
+                    [
+                        Answer(
+                            question_id_id=answer["question_id"],
+                            choice_id=choice_id,
+                            choice_mask=mask,
+                        )
+                    ],
+                    counts,
+                )
+                num_answers += 1
+    return num_answers
+
+
+def form_results(form):
+    """
+    Returns the results of the current version of a form: the number of answers to each
+    question, and the number of answers selecting each choice of radio and checkbox questions.
+    """
+    questions = list(
+        Question.objects.filter(form_id=form)
+        .order_by("display_order")
+        .values_list("id", "display_order", "question", "question_type")
+    )
+    question_ids = [question_id for question_id, *_ in questions]
+    choices = {question_id: [] for question_id in question_ids}
+    for question_id, choice_id, choice in (
+        Choice.objects.filter(question_id__in=question_ids)
+        .order_by("choice_id")
+        .values_list("question_id", "choice_id", "choice")
+    ):
+        choices[question_id].append((choice_id, choice))
+    tallies = (
+        Tally.objects.using(shards.for_read(shards.for_form(form.id)))
+        .filter(question_id__in=question_ids)
+        .values_list("question_id", "choice_id", "count")
+    )
+    counts = {
+        (question_id, choice_id): count for question_id, choice_id, count in tallies
+    }
+
+    return {
+        "form_id": form.id,
+        "version": form.version,
+        "questions": [
+            {
+                "question_id": question_id,
+                "display_order": display_order,
+                "question": question,
+                "question_type": question_type,
+                "answers": counts.get((question_id, Tally.ANSWERS), 0),
+                "choices": [
+                    {
+                        "choice_id": choice_id,
+                        "choice": choice,
+                        "count": counts.get((question_id, choice_id), 0),
+                    }
+                    for choice_id, choice in choices[question_id]
+                ],
+            }
+            for question_id, display_order, question, question_type in questions
+        ],
+    }
@@ -1,3 +1,7 @@
+import tempfile
+from pathlib import Path
+
+from django.test import override_settings
 from factory import django, Faker, SubFactory
 
 from api.models import Answer, Choice, Form, Question, Submission
@@ -47,3 +51,21 @@ class ChoiceFactory(django.DjangoModelFactory):
     question_id = SubFactory(QuestionFactory)
     choice_id = 1
     choice = Faker("sentence")
+
+
+def temporary_root(test_case):
+    """
+    Returns the path of a temporary directory, which is removed once the test ends.
+    """
+    root = tempfile.TemporaryDirectory()
+    test_case.addCleanup(root.cleanup)
+    return Path(root.name)
+
+
+def override_settings_for_test(test_case, **settings):
+    """
+    Overrides settings until the test ends, e.g. to point file storage to a temporary_root.
+    """
+    settings_override = override_settings(**settings)
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
@@ -0,0 +1,267 @@
+import json
+from unittest import mock
+
+import numpy as np
+
+from api.analytics import FormAnalytics, FormMatrix
+from api.views import FormViewSet
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import (
+    ChoiceFactory,
+    FormFactory,
+    QuestionFactory,
+    override_settings_for_test,
+    temporary_root,
+)
+
+
+class AnalyticsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = FormFactory.create()
+        cls.radio = QuestionFactory.create(
+            form_id=cls.form, display_order=1, question_type="radio"
+        )
+        cls.checkbox = QuestionFactory.create(
+            form_id=cls.form, display_order=2, question_type="checkbox"
+        )
+        cls.textbox = QuestionFactory.create(
+            form_id=cls.form, display_order=3, question_type="textbox"
+        )
+        for question in [cls.radio, cls.checkbox]:
+            for choice_id in range(1, 4):
+                ChoiceFactory.create(question_id=question, choice_id=choice_id)
+
+    def setUp(self):
+        self.root = temporary_root(self)
+        override_settings_for_test(self, ANALYTICS_ROOT=self.root)
+
+    def answers(self, radio, checkbox):
+        return [
+            {"answer": radio, "question_type": "radio"},
+            {"answer": checkbox, "question_type": "checkbox"},
+            {"answer": "text", "question_type": "textbox"},
+        ]
+
+    def post_submissions(self, answers):
+        response = self.client.post(
+            reverse("submissions-bulk"),
+            [
+                {"form_id": self.form.id, "answers": self.answers(radio, checkbox)}
+                for radio, checkbox in answers
+            ],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return [result["id"] for result in response.data]
+
+    def get_analytics(self, params=None):
+        response = self.client.get(
+            reverse("forms-analytics", args=[self.form.id]), params or {}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_counts(self):
+        self.post_submissions([("1", "1,2"), ("1", "2"), ("3", "1,2,3")])
+
+        self.assertEqual(
+            self.get_analytics(),
+            {
+                "form_id": self.form.id,
+                "submissions": 3,
+                "counts": {
+                    self.radio.id: {1: 2, 2: 0, 3: 1},
+                    self.checkbox.id: {1: 2, 2: 3, 3: 1},
+                },
+            },
+        )
+
+    def test_crosstab_with_filters(self):
+        self.post_submissions(
+            [("1", "1,2"), ("1", "2"), ("2", "1"), ("3", "1,3"), ("3", "3")]
+        )
+
+        results = self.get_analytics(
+            {"question": self.radio.id, "by": self.checkbox.id}
+        )
+        self.assertEqual(results["counts"], {self.radio.id: {1: 2, 2: 1, 3: 2}})
+        self.assertEqual(
+            results["crosstab"],
+            {
+                1: {1: 1, 2: 2, 3: 0},
+                2: {1: 1, 2: 0, 3: 0},
+                3: {1: 1, 2: 0, 3: 2},
+            },
+        )
+
+        # Submissions which selected checkbox choice 1, and radio choice 1 or 3
+        results = self.get_analytics(
+            {
+                "question": self.checkbox.id,
+                "filter": [f"{self.checkbox.id}:1", f"{self.radio.id}:1,3"],
+            }
+        )
+        self.assertEqual(results["submissions"], 2)
+        self.assertEqual(results["counts"], {self.checkbox.id: {1: 2, 2: 1, 3: 1}})
+
+    @mock.patch.object(FormMatrix, "initial_capacity", 2)
+    def test_refreshed_incrementally(self):
+        submission_ids = self.post_submissions([("1", "1"), ("2", "2")])
+        self.get_analytics()
+
+        # Capacity is grown past the allocated rows, and updated submissions are overwritten
+        self.post_submissions([("3", "3")] * 3)
+        response = self.client.put(
+            reverse("submissions-detail", args=[submission_ids[0]]),
+            {"answers": self.answers("3", "1,3")},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(
+            self.get_analytics()["counts"],
+            {
+                self.radio.id: {1: 0, 2: 1, 3: 4},
+                self.checkbox.id: {1: 1, 2: 1, 3: 4},
+            },
+        )
+
+        with open(self.root / f"form-{self.form.id}" / "meta.json") as meta_file:
+            meta = json.load(meta_file)
+        self.assertEqual(meta["rows"], 5)
+        self.assertEqual(meta["capacity"], 10)
+
+    def test_unchanged_matrix_not_rewritten(self):
+        self.post_submissions([("1", "1")])
+        self.get_analytics()
+
+        with mock.patch.object(FormMatrix, "save_meta") as save_meta:
+            self.get_analytics()
+        save_meta.assert_not_called()
+
+    def test_refreshes_locked_per_form(self):
+        self.assertIs(FormMatrix(self.form.id).lock, FormMatrix(self.form.id).lock)
+        # Forms are hashed to a fixed number of locks
+        locks = {FormMatrix(form_id).lock for form_id in range(1, 1000)}
+        self.assertEqual(len(locks), len(FormMatrix.locks))
+
+    @mock.patch.object(FormMatrix, "chunk_size", 2)
+    def test_answers_applied_in_chunks(self):
+        self.post_submissions([("1", "1"), ("2", "2"), ("3", "1,3")])
+        with mock.patch.object(
+            FormMatrix,
+            "write_answers",
+            autospec=True,
+            side_effect=FormMatrix.write_answers,
+        ) as write_answers:
+            results = self.get_analytics()
+        self.assertEqual(write_answers.call_count, 3)
+        self.assertEqual(
+            results["counts"],
+            {
+                self.radio.id: {1: 1, 2: 1, 3: 1},
+                self.checkbox.id: {1: 2, 2: 1, 3: 1},
+            },
+        )
+
+    def test_answers_of_unknown_submissions_skipped(self):
+        submission_ids = self.post_submissions([("1", "1"), ("2", "2")])
+        matrix = FormMatrix(self.form.id).refresh()
+
+        # Would be written to the row of the next submission, by its sorted position
+        matrix.write_answers(
+            np.array([[10**6, submission_ids[0] - 1, self.radio.id, 3, 0]]),
+            matrix.open_column(matrix.path / "submissions.npy")[: matrix.meta["rows"]],
+        )
+        self.assertEqual(matrix.column(self.radio.id).tolist(), [1, 2])
+
+    def test_columns_added_with_new_form_version(self):
+        self.post_submissions([("1", "1")])
+        self.get_analytics()
+
+        data = {
+            "title": "updated",
+            "questions": [
+                {
+                    "display_order": 1,
+                    "question": "question 1",
+                    "question_type": "checkbox",
+                    "choices": [{"choice_id": 1, "choice": "yes"}],
+                }
+            ],
+        }
+        response = self.client.put(
+            reverse("forms-detail", args=[self.form.id]),
+            data,
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_question_id = response.data["questions"][0]["id"]
+
+        response = self.client.post(
+            reverse("submissions-list"),
+            {
+                "form_id": self.form.id,
+                "answers": [{"answer": "1", "question_type": "checkbox"}],
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Questions of previous versions keep their columns
+        results = self.get_analytics()
+        self.assertEqual(results["submissions"], 2)
+        self.assertEqual(
+            results["counts"],
+            {
+                self.radio.id: {1: 1, 2: 0, 3: 0},
+                self.checkbox.id: {1: 1, 2: 0, 3: 0},
+                new_question_id: {1: 1},
+            },
+        )
+
+    def test_analytics_within_query_budget(self):
+        self.post_submissions([("1", "1")])
+        for _ in range(2):
+            with self.assertNumQueries(FormViewSet.query_budget["analytics"]):
+                self.get_analytics()
+
+    def test_analytics_without_submissions(self):
+        results = self.get_analytics()
+        self.assertEqual(results["submissions"], 0)
+        self.assertEqual(
+            results["counts"],
+            {self.radio.id: {1: 0, 2: 0, 3: 0}, self.checkbox.id: {1: 0, 2: 0, 3: 0}},
+        )
+
+    def test_analytics_invalid_params_failure(self):
+        url = reverse("forms-analytics", args=[self.form.id])
+        for params, name, message in [
+            ({"question": "x"}, "question", FormAnalytics.INVALID_INTEGER_MESSAGE),
+            (
+                {"question": self.textbox.id},
+                "question",
+                FormAnalytics.UNKNOWN_QUESTION_MESSAGE,
+            ),
+            (
+                {"by": self.radio.id},
+                "by",
+                FormAnalytics.BY_WITHOUT_QUESTION_MESSAGE,
+            ),
+            ({"filter": "1"}, "filter", FormAnalytics.INVALID_FILTER_MESSAGE),
+            (
+                {"filter": f"{self.radio.id}:4"},
+                "filter",
+                FormAnalytics.INVALID_FILTER_MESSAGE,
+            ),
+        ]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data[name][0], message)
+
+    def test_analytics_missing_form_failure(self):
+        response = self.client.get(reverse("forms-analytics", args=[100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
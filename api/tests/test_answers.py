@@ -0,0 +1,210 @@
+import importlib
+from types import SimpleNamespace
+from unittest import mock
+
+from api.answers import choice_mask, mask_choice_ids, typed_answer
+from api.models import Answer
+from api.serializers import FormSerializer, SubmissionWriteSerializer
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import (
+    AnswerFactory,
+    ChoiceFactory,
+    FormFactory,
+    QuestionFactory,
+    SubmissionFactory,
+)
+
+backfill_migration = importlib.import_module(
+    "api.migrations.0008_backfill_typed_answers"
+)
+
+
+class TypedAnswerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = FormFactory.create()
+        cls.radio = QuestionFactory.create(
+            form_id=cls.form, display_order=1, question_type="radio"
+        )
+        cls.checkbox = QuestionFactory.create(
+            form_id=cls.form, display_order=2, question_type="checkbox"
+        )
+        cls.textbox = QuestionFactory.create(
+            form_id=cls.form, display_order=3, question_type="textbox"
+        )
+        for question in [cls.radio, cls.checkbox]:
+            for choice_id in range(1, 4):
+                ChoiceFactory.create(question_id=question, choice_id=choice_id)
+
+    def post_submission(self, radio, checkbox, textbox="text"):
+        return self.client.post(
+            reverse("submissions-list"),
+            {
+                "form_id": self.form.id,
+                "answers": [
+                    {"answer": radio, "question_type": "radio"},
+                    {"answer": checkbox, "question_type": "checkbox"},
+                    {"answer": textbox, "question_type": "textbox"},
+                ],
+            },
+            content_type="application/json",
+        )
+
+    def typed_columns(self, submission_id):
+        return list(
+            Answer.objects.filter(submission_id=submission_id)
+            .order_by("id")
+            .values_list("choice_id", "choice_mask")
+        )
+
+    def test_post_stores_typed_answers(self):
+        response = self.post_submission("2", "1,3", "2")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            self.typed_columns(response.data["id"]),
+            [(2, None), (None, 0b101), (None, None)],
+        )
+
+        # Answers are returned as given
+        self.assertEqual(
+            [answer["answer"] for answer in response.data["answers"]],
+            ["2", "1,3", "2"],
+        )
+
+    def test_put_stores_typed_answers(self):
+        submission_id = self.post_submission("2", "1,3").data["id"]
+        response = self.client.put(
+            reverse("submissions-detail", args=[submission_id]),
+            {
+                "answers": [
+                    {"answer": "3", "question_type": "radio"},
+                    {"answer": "2", "question_type": "checkbox"},
+                    {"answer": "text", "question_type": "textbox"},
+                ]
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.typed_columns(submission_id), [(3, None), (None, 0b10), (None, None)]
+        )
+
+    def test_post_invalid_radio_answer_failure(self):
+        for answer in ["one", "1,2", "4", "0"]:
+            response = self.post_submission(answer, "1")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(
+                response.data["non_field_errors"][0],
+                SubmissionWriteSerializer.INVALID_RADIO_ANSWER_MESSAGE,
+            )
+        self.assertEqual(Answer.objects.count(), 0)
+
+    def test_post_invalid_checkbox_answer_failure(self):
+        for answer in ["1,", "one", "1;2", "1,4"]:
+            response = self.post_submission("1", answer)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(
+                response.data["non_field_errors"][0],
+                SubmissionWriteSerializer.INVALID_CHECKBOX_ANSWER_MESSAGE,
+            )
+        self.assertEqual(Answer.objects.count(), 0)
+
+    def test_bulk_post_invalid_answer_failure(self):
+        valid = {
+            "form_id": self.form.id,
+            "answers": [
+                {"answer": "1", "question_type": "radio"},
+                {"answer": "2", "question_type": "checkbox"},
+                {"answer": "text", "question_type": "textbox"},
+            ],
+        }
+        invalid = {**valid, "answers": [{**valid["answers"][0], "answer": "5"}]}
+        invalid["answers"] += valid["answers"][1:]
+
+        response = self.client.post(
+            reverse("submissions-bulk"),
+            [valid, invalid],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            response.data[1]["errors"]["non_field_errors"][0],
+            SubmissionWriteSerializer.INVALID_RADIO_ANSWER_MESSAGE,
+        )
+        self.assertEqual(Answer.objects.count(), 3)
+
+    def test_post_form_too_many_checkbox_choices_failure(self):
+        data = {
+            "title": "form title",
+            "questions": [
+                {
+                    "display_order": 1,
+                    "question": "question 1",
+                    "question_type": "checkbox",
+                    "choices": [
+                        {"choice_id": i, "choice": str(i)} for i in range(1, 65)
+                    ],
+                }
+            ],
+        }
+        response = self.client.post(
+            reverse("forms-list"), data, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["non_field_errors"][0],
+            FormSerializer.TOO_MANY_CHECKBOX_CHOICES_MESSAGE,
+        )
+
+    def test_backfill_typed_answers(self):
+        # One submission per answer, as each submission answers a question once
+        answers = [
+            AnswerFactory.create(
+                submission_id=SubmissionFactory.create(form_id=self.form),
+                question_id=question,
+                answer=answer,
+            )
+            for question, answer in [
+                (self.radio, "2"),
+                (self.radio, "not a choice"),
+                (self.checkbox, "1,3"),
+                (self.checkbox, ""),
+                (self.checkbox, "1,64"),
+                (self.textbox, "3"),
+            ]
+        ]
+
+        # Chunks smaller than the number of answers
+        with mock.patch.object(backfill_migration, "CHUNK_SIZE", 4):
+            backfill_migration.backfill_typed_answers(
+                apps, SimpleNamespace(connection=connection)
+            )
+
+        self.assertEqual(
+            [
+                typed_columns
+                for answer in answers
+                for typed_columns in self.typed_columns(answer.submission_id_id)
+            ],
+            [
+                (2, None),
+                (None, None),
+                (None, 0b101),
+                (None, 0),
+                (None, None),
+                (None, None),
+            ],
+        )
+        self.assertEqual(len(answers), Answer.objects.count())
+
+    def test_typed_answer(self):
+        self.assertEqual(typed_answer("radio", "3"), (3, None))
+        self.assertEqual(typed_answer("checkbox", "1,2,63"), (None, 3 | 1 << 62))
+        self.assertEqual(typed_answer("textbox", "3"), (None, None))
+        with self.assertRaises(ValueError):
+            typed_answer("checkbox", "64")
+        self.assertEqual(mask_choice_ids(choice_mask([5, 1, 63])), [1, 5, 63])
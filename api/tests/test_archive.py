@@ -0,0 +1,298 @@
+from io import StringIO
+from unittest import mock
+
+from api.archive import delete_submissions, submission_archive
+from api.models import Answer, Submission
+from api.tallies import rebuild_tallies
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import (
+    ChoiceFactory,
+    FormFactory,
+    QuestionFactory,
+    override_settings_for_test,
+    temporary_root,
+)
+
+
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = FormFactory.create()
+        cls.other_form = FormFactory.create()
+        for form in [cls.form, cls.other_form]:
+            radio = QuestionFactory.create(
+                form_id=form, display_order=1, question_type="radio"
+            )
+            QuestionFactory.create(
+                form_id=form, display_order=2, question_type="textbox"
+            )
+            for choice_id in range(1, 3):
+                ChoiceFactory.create(question_id=radio, choice_id=choice_id)
+
+    def setUp(self):
+        root = temporary_root(self)
+        override_settings_for_test(
+            self,
+            ANALYTICS_ROOT=root / "analytics",
+            SUBMISSION_ARCHIVE={
+                **settings.SUBMISSION_ARCHIVE,
+                "ROOT": root / "archive",
+            },
+        )
+        patcher = mock.patch.multiple(
+            submission_archive, block_size=2, delete_chunk_size=2
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_submissions(self, form, count):
+        response = self.client.post(
+            reverse("submissions-bulk"),
+            [
+                {
+                    "form_id": form.id,
+                    "answers": [
+                        {"answer": str(i % 2 + 1), "question_type": "radio"},
+                        {"answer": f"text {i}", "question_type": "textbox"},
+                    ],
+                }
+                for i in range(count)
+            ],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return [result["id"] for result in response.data]
+
+    def list_submissions(self, **params):
+        listed, url = [], reverse("submissions-list")
+        params.setdefault("page_size", 2)
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            listed += response.data["results"]
+            url, params = response.data["next"], {}
+        return listed
+
+    def archive(self, form):
+        out = StringIO()
+        call_command("archive_form", form.id, stdout=out)
+        return out.getvalue()
+
+    def test_archived_submissions_served_unchanged(self):
+        submission_ids = self.post_submissions(self.form, 5)
+        self.client.put(
+            reverse("submissions-detail", args=[submission_ids[0]]),
+            {
+                "answers": [
+                    {"answer": "2", "question_type": "radio"},
+                    {"answer": "updated", "question_type": "textbox"},
+                ]
+            },
+            content_type="application/json",
+        )
+        url = reverse("submissions-detail", args=[submission_ids[0]])
+        before = self.client.get(url)
+        listed_before = self.list_submissions()
+        export_before = self.export(self.form)
+
+        self.assertEqual(
+            self.archive(self.form), f"Archived 5 submissions of form {self.form.id}.\n"
+        )
+
+        self.assertFalse(Submission.objects.filter(form_id=self.form).exists())
+        self.assertFalse(
+            Answer.objects.filter(submission_id__in=submission_ids).exists()
+        )
+        after = self.client.get(url)
+        self.assertEqual(after.status_code, status.HTTP_200_OK)
+        self.assertEqual(after.data, before.data)
+        self.assertEqual(after["ETag"], before["ETag"])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.list_submissions(), listed_before)
+        self.assertEqual(self.export(self.form), export_before)
+
+        # Archived submissions are read only
+        response = self.client.put(
+            url,
+            {"answers": [{"answer": "1", "question_type": "radio"}] * 2},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_blocks_appended_to_segment(self):
+        self.post_submissions(self.form, 3)
+        self.archive(self.form)
+        meta = submission_archive.get_meta(self.form.id)
+        self.assertEqual(len(meta["blocks"]), 2)
+
+        self.post_submissions(self.form, 2)
+        self.archive(self.form)
+        meta = submission_archive.get_meta(self.form.id)
+        self.assertEqual(len(meta["blocks"]), 3)
+        self.assertEqual(meta["segments"], 1)
+        self.assertEqual(len(submission_archive.get_index(self.form.id)), 5)
+        self.assertEqual(len(self.list_submissions(form_id=self.form.id)), 5)
+
+    def test_interrupted_archive_deletes_archived_submissions(self):
+        submission_ids = self.post_submissions(self.form, 3)
+        with mock.patch("api.archive.delete_submissions") as delete_submissions:
+            self.archive(self.form)
+        delete_submissions.assert_called()
+        self.assertEqual(
+            [submission["id"] for submission in self.list_submissions()],
+            submission_ids,
+        )
+
+        self.assertEqual(
+            self.archive(self.form), f"Archived 0 submissions of form {self.form.id}.\n"
+        )
+        self.assertFalse(Submission.objects.filter(form_id=self.form).exists())
+        self.assertEqual(len(submission_archive.get_index(self.form.id)), 3)
+
+    def test_submission_updated_while_archiving_kept(self):
+        submission_ids = self.post_submissions(self.form, 3)
+        url = reverse("submissions-detail", args=[submission_ids[1]])
+        answers = [
+            {"answer": "2", "question_type": "radio"},
+            {"answer": "updated", "question_type": "textbox"},
+        ]
+
+        def update_then_delete(using, revisions):
+            # Committed after the submission was read into the archive
+            if submission_ids[1] not in revisions:
+                return delete_submissions(using, revisions)
+            response = self.client.put(
+                url, {"answers": answers}, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return delete_submissions(using, revisions)
+
+        with mock.patch(
+            "api.archive.delete_submissions", side_effect=update_then_delete
+        ):
+            self.archive(self.form)
+
+        self.assertEqual(
+            list(Submission.objects.values_list("id", flat=True)), [submission_ids[1]]
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.data["revision"], 2)
+        self.assertEqual(response.data["answers"][1]["answer"], "updated")
+        self.assertEqual(len(self.list_submissions()), 3)
+
+        # Archived again by the next run
+        self.assertEqual(
+            self.archive(self.form), f"Archived 1 submissions of form {self.form.id}.\n"
+        )
+        self.assertFalse(Submission.objects.exists())
+        self.assertEqual(len(submission_archive.get_index(self.form.id)), 3)
+        response = self.client.get(url)
+        self.assertEqual(response.data["revision"], 2)
+        self.assertEqual(response.data["answers"][1]["answer"], "updated")
+
+    def test_list_merges_archived_and_database_submissions(self):
+        archived_ids = self.post_submissions(self.form, 3)
+        other_ids = self.post_submissions(self.other_form, 2)
+        archived_ids += self.post_submissions(self.form, 2)
+        self.archive(self.form)
+        new_ids = self.post_submissions(self.form, 1)
+
+        def listed_ids(**params):
+            return [submission["id"] for submission in self.list_submissions(**params)]
+
+        self.assertEqual(listed_ids(), archived_ids + new_ids + other_ids)
+        self.assertEqual(listed_ids(form_id=self.form.id), archived_ids + new_ids)
+        self.assertEqual(
+            listed_ids(id__in=f"{archived_ids[1]},{other_ids[0]},{new_ids[0]}"),
+            [archived_ids[1], new_ids[0], other_ids[0]],
+        )
+        self.assertEqual(
+            listed_ids(after_id=archived_ids[2]), archived_ids[3:] + new_ids + other_ids
+        )
+
+        # Paging backwards from the end
+        response = self.client.get(
+            reverse("submissions-list"), {"form_id": self.form.id, "page_size": 4}
+        )
+        response = self.client.get(response.data["next"])
+        response = self.client.get(response.data["previous"])
+        self.assertEqual(
+            [submission["id"] for submission in response.data["results"]],
+            archived_ids[:4],
+        )
+
+    def test_decoded_blocks_cache_bounded(self):
+        submission_ids = self.post_submissions(self.form, 6)
+        self.archive(self.form)
+        with mock.patch.multiple(
+            submission_archive, cache_blocks=2, blocks=submission_archive.blocks.copy()
+        ):
+            submission_archive.blocks.clear()
+            for submission_id in submission_ids:
+                self.assertEqual(
+                    submission_archive.get(submission_id)["id"], submission_id
+                )
+            self.assertEqual(len(submission_archive.blocks), 2)
+
+    def test_rebuilds_count_archived_answers(self):
+        self.post_submissions(self.form, 5)
+        results = self.client.get(reverse("forms-results", args=[self.form.id])).data
+        analytics_url = reverse("forms-analytics", args=[self.form.id])
+        analytics = self.client.get(analytics_url).data
+
+        # Submissions still in the database once archived are counted once
+        with mock.patch("api.archive.delete_submissions"):
+            self.archive(self.form)
+        for num_submissions in [5, 0]:
+            self.assertEqual(
+                Submission.objects.filter(form_id=self.form).count(), num_submissions
+            )
+            self.assertEqual(rebuild_tallies([self.form.id]), 10)
+            self.assertEqual(
+                self.client.get(reverse("forms-results", args=[self.form.id])).data,
+                results,
+            )
+            override_settings_for_test(
+                self, ANALYTICS_ROOT=temporary_root(self) / "analytics"
+            )
+            self.assertEqual(self.client.get(analytics_url).data, analytics)
+            self.archive(self.form)
+
+    def test_deleted_form_archive_deleted(self):
+        submission_ids = self.post_submissions(self.form, 3)
+        other_submission_ids = self.post_submissions(self.other_form, 1)
+        self.archive(self.form)
+        self.archive(self.other_form)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.form.delete()
+        # Until the deletion commits, the form's archived submissions are not served
+        self.assertEqual(
+            [submission["id"] for submission in self.list_submissions()],
+            other_submission_ids,
+        )
+        response = self.client.get(
+            reverse("submissions-detail", args=[submission_ids[0]])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(submission_archive.get(submission_ids[0]))
+        self.assertFalse(submission_archive.form_path(self.form.id).exists())
+        self.assertEqual(list(submission_archive.get_forms()), [self.other_form.id])
+
+    def test_archive_unknown_form(self):
+        with self.assertRaises(CommandError):
+            call_command("archive_form", self.form.id + self.other_form.id)
+
+    def export(self, form):
+        response = self.client.get(
+            reverse("forms-export-submissions", args=[form.id]), {"format": "csv"}
+        )
+        return b"".join(response.streaming_content)
@@ -0,0 +1,111 @@
+import asyncio
+import re
+
+from api.views import FormViewSet
+
+from django.test import AsyncClient, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import (
+    AnswerFactory,
+    ChoiceFactory,
+    FormFactory,
+    QuestionFactory,
+    SubmissionFactory,
+)
+
+
+# The asynchronous views read from the database on other threads, which only see committed data
+class AsyncReadViewTest(TransactionTestCase):
+    def setUp(self):
+        self.forms = [FormFactory.create() for _ in range(2)]
+        for form in self.forms:
+            question = QuestionFactory.create(
+                form_id=form, display_order=1, question_type="radio"
+            )
+            ChoiceFactory.create(question_id=question, choice_id=1)
+            for _ in range(3):
+                AnswerFactory.create(
+                    submission_id=SubmissionFactory.create(form_id=form),
+                    question_id=question,
+                    answer="1",
+                )
+
+    def assertSameResponse(self, url, async_url, params=None, **headers):
+        response = self.client.get(url, params, **headers)
+        async_response = self.client.get(async_url, params, **headers)
+        self.assertEqual(async_response.status_code, response.status_code)
+        self.assertEqual(async_response.get("ETag"), response.get("ETag"))
+        # Pagination links point to the endpoint which was requested
+        self.assertEqual(
+            async_response.content.replace(b"/async/", b"/"), response.content
+        )
+        return async_response
+
+    def test_forms_same_json(self):
+        self.assertSameResponse(reverse("forms-list"), reverse("async-forms-list"))
+        self.assertSameResponse(
+            reverse("forms-list"), reverse("async-forms-list"), {"page_size": 1}
+        )
+        form_id = self.forms[0].id
+        response = self.assertSameResponse(
+            reverse("forms-detail", args=[form_id]),
+            reverse("async-forms-detail", args=[form_id]),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Conditional requests are answered the same
+        response = self.assertSameResponse(
+            reverse("forms-detail", args=[form_id]),
+            reverse("async-forms-detail", args=[form_id]),
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_submissions_same_json(self):
+        for params in [None, {"include": "forms"}, {"form_id": self.forms[1].id}]:
+            self.assertSameResponse(
+                reverse("submissions-list"), reverse("async-submissions-list"), params
+            )
+        submission_id = SubmissionFactory._meta.model.objects.first().id
+        response = self.assertSameResponse(
+            reverse("submissions-detail", args=[submission_id]),
+            reverse("async-submissions-detail", args=[submission_id]),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_errors_same_json(self):
+        self.assertSameResponse(
+            reverse("submissions-list"),
+            reverse("async-submissions-list"),
+            {"include": "users"},
+        )
+        self.assertSameResponse(
+            reverse("forms-detail", args=[100]),
+            reverse("async-forms-detail", args=[100]),
+        )
+
+    def test_write_methods_not_allowed(self):
+        response = self.client.post(
+            reverse("async-forms-list"), {}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_pool_queries_counted(self):
+        response = asyncio.run(AsyncClient().get(reverse("async-forms-list")))
+        queries = re.search(r'desc="(\d+) queries"', response["Server-Timing"])
+        # Including those setting up the connection of a new pool thread
+        self.assertGreaterEqual(int(queries.group(1)), FormViewSet.query_budget["list"])
+
+    def test_concurrent_requests(self):
+        async def get_all():
+            client = AsyncClient()
+            return await asyncio.gather(
+                *[client.get(reverse("async-submissions-list")) for _ in range(50)]
+            )
+
+        responses = asyncio.run(get_all())
+        self.assertTrue(
+            all(response.status_code == status.HTTP_200_OK for response in responses)
+        )
+        self.assertEqual(len({response.content for response in responses}), 1)
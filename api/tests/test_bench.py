@@ -0,0 +1,92 @@
+from unittest import mock
+
+from api.bench import Benchmark, Dataset, find_regressions
+from api.models import Form, Submission
+from api.urls import urlpatterns
+from api.views import FormViewSet, SubmissionViewSet
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.results = Benchmark(
+            Dataset(forms=2, questions=4, choices=3, submissions=5), iterations=2
+        ).run()
+
+    def test_dataset_generated(self):
+        self.assertGreaterEqual(Form.objects.count(), 2)
+        self.assertGreaterEqual(Submission.objects.count(), 10)
+
+    def test_every_endpoint_measured(self):
+        measured = {
+            metrics["url_name"] for metrics in self.results["endpoints"].values()
+        }
+        routes = set()
+        for pattern in urlpatterns:
+            for url in getattr(pattern, "url_patterns", [pattern]):
+                routes.add(url.name)
+        self.assertEqual(measured, routes)
+
+    def test_query_counts_measured(self):
+        endpoints = self.results["endpoints"]
+        self.assertEqual(
+            endpoints["forms-list"]["queries"], FormViewSet.query_budget["list"]
+        )
+        self.assertEqual(
+            endpoints["submissions-detail"]["queries"],
+            SubmissionViewSet.query_budget["retrieve"],
+        )
+        for metrics in endpoints.values():
+            self.assertLessEqual(metrics["p50_ms"], metrics["p99_ms"])
+            self.assertGreater(metrics["throughput_rps"], 0)
+            self.assertGreater(metrics["peak_memory_kib"], 0)
+
+    def test_no_regressions_against_itself(self):
+        self.assertEqual(find_regressions(self.results, self.results, 0.25), [])
+
+    def test_regressions_past_threshold(self):
+        baseline = {
+            "endpoints": {
+                "forms-list": {
+                    "p50_ms": 10.0,
+                    "p90_ms": 10.0,
+                    "p99_ms": 1.0,
+                    "throughput_rps": 100.0,
+                    "queries": 3,
+                    "peak_memory_kib": 100.0,
+                }
+            }
+        }
+        results = {
+            "endpoints": {
+                "forms-list": {
+                    # Within the threshold
+                    "p50_ms": 12.0,
+                    # Past the threshold
+                    "p90_ms": 14.0,
+                    # Past the threshold, but within the latency tolerance
+                    "p99_ms": 1.8,
+                    "throughput_rps": 70.0,
+                    "queries": 4,
+                    "peak_memory_kib": 90.0,
+                },
+                # Not in the baseline
+                "forms-detail": {},
+            }
+        }
+        self.assertEqual(
+            find_regressions(results, baseline, 0.25),
+            [
+                "forms-list: p90_ms 14.0 (baseline 10.0)",
+                "forms-list: throughput_rps 70.0 (baseline 100.0)",
+                "forms-list: queries 4 (baseline 3)",
+            ],
+        )
+
+    def test_missing_baseline_failure(self):
+        with mock.patch("api.management.commands.bench.throwaway_database") as database:
+            with self.assertRaisesMessage(CommandError, "No baseline at"):
+                call_command("bench", baseline="does-not-exist.json")
+        database.assert_not_called()
@@ -0,0 +1,143 @@
+from unittest import mock
+
+from api.checks import check_bulk_insert_pks
+from api.models import Answer, Submission
+from api.serializers import SubmissionBulkItemSerializer, SubmissionWriteSerializer
+from api.views import SubmissionViewSet
+from django.db import connections
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import ChoiceFactory, FormFactory, QuestionFactory
+
+
+class BulkSubmissionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form1 = FormFactory.create()
+        cls.form2 = FormFactory.create()
+        cls.form1_questions = [
+            QuestionFactory.create(
+                form_id=cls.form1, display_order=i + 1, question_type=question_type
+            )
+            for i, question_type in enumerate(["radio", "textbox"])
+        ]
+        cls.form2_questions = [
+            QuestionFactory.create(
+                form_id=cls.form2, display_order=1, question_type="checkbox"
+            )
+        ]
+        for question in [cls.form1_questions[0], cls.form2_questions[0]]:
+            for choice_id in [1, 2]:
+                ChoiceFactory.create(question_id=question, choice_id=choice_id)
+
+    def form1_submission(self, name="John Doe"):
+        return {
+            "form_id": self.form1.id,
+            "answers": [
+                {"answer": "1", "question_type": "radio"},
+                {"answer": name, "question_type": "textbox"},
+            ],
+        }
+
+    def form2_submission(self):
+        return {
+            "form_id": self.form2.id,
+            "answers": [{"answer": "1,2", "question_type": "checkbox"}],
+        }
+
+    def post(self, data):
+        return self.client.post(
+            reverse("submissions-bulk"), data, content_type="application/json"
+        )
+
+    def test_bulk_post_success(self):
+        response = self.post([self.form1_submission(), self.form2_submission()])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        submissions = Submission.objects.order_by("id")
+        self.assertEqual(
+            response.data, [{"id": submission.id} for submission in submissions]
+        )
+        self.assertEqual(
+            [s.form_id_id for s in submissions], [self.form1.id, self.form2.id]
+        )
+        self.assertEqual(
+            list(
+                Answer.objects.order_by("id").values_list(
+                    "submission_id", "question_id", "answer"
+                )
+            ),
+            [
+                (submissions[0].id, self.form1_questions[0].id, "1"),
+                (submissions[0].id, self.form1_questions[1].id, "John Doe"),
+                (submissions[1].id, self.form2_questions[0].id, "1,2"),
+            ],
+        )
+
+    def test_bulk_post_partial_failure(self):
+        wrong_type = self.form1_submission()
+        wrong_type["answers"][0]["question_type"] = "checkbox"
+        response = self.post(
+            [
+                self.form1_submission(),
+                wrong_type,
+                {"form_id": 100, "answers": []},
+                {"answers": []},
+                self.form2_submission(),
+                {"form_id": 10**20, "answers": []},
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        submission_ids = list(
+            Submission.objects.order_by("id").values_list("id", flat=True)
+        )
+        self.assertEqual(len(submission_ids), 2)
+        self.assertEqual(response.data[0], {"id": submission_ids[0]})
+        self.assertEqual(
+            response.data[1]["errors"]["non_field_errors"][0],
+            SubmissionWriteSerializer.INVALID_QUESTION_TYPE_MATCH_MESSAGE,
+        )
+        self.assertEqual(
+            response.data[2]["errors"]["form_id"][0],
+            SubmissionBulkItemSerializer.FORM_DOES_NOT_EXIST_MESSAGE,
+        )
+        self.assertIn("form_id", response.data[3]["errors"])
+        self.assertEqual(response.data[4], {"id": submission_ids[1]})
+        self.assertIn("form_id", response.data[5]["errors"])
+        self.assertEqual(Answer.objects.count(), 3)
+
+    def test_bulk_post_constant_queries(self):
+        # Form versions, 2 savepoints, insert and read back submissions, 1 release, insert
+        # answers, upsert tallies, 1 release. The compiled form schemas are cached after the
+        # first upload.
+        self.post([self.form1_submission(), self.form2_submission()])
+        with self.assertNumQueries(9):
+            self.post([self.form1_submission(), self.form2_submission()])
+        with self.assertNumQueries(9):
+            self.post(
+                [self.form1_submission(str(i)) for i in range(50)]
+                + [self.form2_submission()]
+            )
+        self.assertEqual(Submission.objects.count(), 55)
+        self.assertEqual(Answer.objects.count(), 107)
+
+    def test_bulk_post_not_a_list_failure(self):
+        response = self.post(self.form1_submission())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["non_field_errors"][0],
+            SubmissionViewSet.BULK_NOT_A_LIST_MESSAGE,
+        )
+        self.assertEqual(Submission.objects.count(), 0)
+
+    def test_bulk_insert_pks_check(self):
+        self.assertEqual(check_bulk_insert_pks(None), [])
+        connection = connections["default"]
+        with mock.patch.object(connection, "vendor", "mysql"), mock.patch.object(
+            connection.features, "can_return_rows_from_bulk_insert", False
+        ):
+            self.assertEqual(
+                [error.id for error in check_bulk_insert_pks(None)], ["api.E002"]
+            )
@@ -0,0 +1,107 @@
+from api.views import FormViewSet, SubmissionViewSet
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import AnswerFactory, FormFactory, QuestionFactory, SubmissionFactory
+
+
+class ConditionalRetrieveTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = FormFactory.create()
+        cls.question = QuestionFactory.create(
+            form_id=cls.form, display_order=1, question_type="textbox"
+        )
+        cls.submission = SubmissionFactory.create(form_id=cls.form)
+        AnswerFactory.create(submission_id=cls.submission, question_id=cls.question)
+
+    def form_url(self):
+        return reverse("forms-detail", args=[self.form.id])
+
+    def submission_url(self):
+        return reverse("submissions-detail", args=[self.submission.id])
+
+    def put_form(self, title, question_type="textbox"):
+        data = {
+            "title": title,
+            "questions": [
+                {
+                    "display_order": 1,
+                    "question": "question 1",
+                    "question_type": question_type,
+                }
+            ],
+        }
+        response = self.client.put(
+            self.form_url(), data, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_sets_validators(self):
+        for url in [self.form_url(), self.submission_url()]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response["ETag"].startswith('"'))
+            self.assertIn("Last-Modified", response)
+
+    def test_form_if_none_match_not_modified(self):
+        etag = self.client.get(self.form_url())["ETag"]
+
+        with self.assertNumQueries(FormViewSet.query_budget["retrieve_not_modified"]):
+            response = self.client.get(self.form_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+    def test_submission_if_none_match_not_modified(self):
+        etag = self.client.get(self.submission_url())["ETag"]
+
+        with self.assertNumQueries(
+            SubmissionViewSet.query_budget["retrieve_not_modified"]
+        ):
+            response = self.client.get(self.submission_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since_not_modified(self):
+        last_modified = self.client.get(self.form_url())["Last-Modified"]
+        response = self.client.get(
+            self.form_url(), HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_form_etag_changes_after_put(self):
+        etag = self.client.get(self.form_url())["ETag"]
+        self.put_form("updated title")
+
+        response = self.client.get(self.form_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["title"], "updated title")
+
+    def test_submission_etag_changes_after_put(self):
+        etag = self.client.get(self.submission_url())["ETag"]
+        response = self.client.put(
+            self.submission_url(),
+            {"answers": [{"answer": "updated", "question_type": "textbox"}]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.submission_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_submission_etag_changes_after_form_put(self):
+        # The submission nests its form, so edits to the form change the submission's ETag
+        etag = self.client.get(self.submission_url())["ETag"]
+        self.put_form("updated title")
+
+        response = self.client.get(self.submission_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_missing_object_not_found(self):
+        response = self.client.get(
+            reverse("forms-detail", args=[100]), HTTP_IF_NONE_MATCH='"form-100-1"'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
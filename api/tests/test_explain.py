@@ -0,0 +1,52 @@
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from api.explain import HotpathExplainer
+from api.models import Question
+from .factory import ChoiceFactory, FormFactory, QuestionFactory
+
+
+class HotpathExplainerTest(TestCase):
+    def test_hotpaths_use_indexes(self):
+        plans = HotpathExplainer().run()
+
+        self.assertTrue(plans)
+        self.assertEqual(
+            [(plan.scenario, plan.sql) for plan in plans if plan.full_scans], []
+        )
+
+    def test_full_scan_flagged(self):
+        explainer = HotpathExplainer()
+        plan = explainer.explain(
+            "answers",
+            "default",
+            'SELECT * FROM "api_answer" WHERE "answer" = %s',
+            ["text"],
+        )
+
+        self.assertEqual(plan.full_scans, ("api_answer",))
+
+
+class UniqueConstraintTest(TestCase):
+    def setUp(self):
+        self.form = FormFactory()
+        self.question = QuestionFactory(form_id=self.form, display_order=1)
+
+    def test_duplicate_choice_id_rejected(self):
+        ChoiceFactory(question_id=self.question, choice_id=1)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ChoiceFactory(question_id=self.question, choice_id=1)
+
+    def test_duplicate_display_order_rejected(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            QuestionFactory(form_id=self.form, display_order=1)
+
+    def test_removed_question_keeps_display_order(self):
+        Question.all_objects.filter(id=self.question.id).update(removed_in_version=2)
+
+        QuestionFactory(form_id=self.form, display_order=1)
+
+        self.assertEqual(
+            Question.all_objects.filter(form_id=self.form, display_order=1).count(), 2
+        )
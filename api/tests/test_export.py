@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+from unittest import mock
+
+from api.export import SubmissionExporter
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import AnswerFactory, FormFactory, QuestionFactory, SubmissionFactory
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form1 = FormFactory.create()
+        cls.form2 = FormFactory.create()
+        # Created out of display_order, to check that columns follow display_order
+        cls.question2 = QuestionFactory.create(
+            form_id=cls.form1, display_order=2, question="second"
+        )
+        cls.question1 = QuestionFactory.create(
+            form_id=cls.form1, display_order=1, question="first"
+        )
+
+        cls.submissions = [
+            SubmissionFactory.create(form_id=cls.form1) for _ in range(3)
+        ]
+        for idx, submission in enumerate(cls.submissions):
+            AnswerFactory.create(
+                submission_id=submission, question_id=cls.question2, answer=f"b{idx}"
+            )
+            AnswerFactory.create(
+                submission_id=submission, question_id=cls.question1, answer=f"a{idx}"
+            )
+
+        # Submissions to other forms are not exported
+        AnswerFactory.create(submission_id=SubmissionFactory.create(form_id=cls.form2))
+
+    def export(self, form, export_format):
+        response = self.client.get(
+            reverse("forms-export-submissions", args=[form.id]),
+            {"format": export_format},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_export_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export(self.form1, "csv"))))
+        self.assertEqual(rows[0], ["submission_id", "form_version", "first", "second"])
+        self.assertEqual(
+            rows[1:],
+            [
+                [str(s.id), "1", f"a{idx}", f"b{idx}"]
+                for idx, s in enumerate(self.submissions)
+            ],
+        )
+
+    def test_export_ndjson(self):
+        rows = [
+            json.loads(line) for line in self.export(self.form1, "ndjson").splitlines()
+        ]
+        self.assertEqual(
+            rows,
+            [
+                {
+                    "submission_id": s.id,
+                    "form_version": 1,
+                    "answers": {
+                        str(self.question1.id): f"a{idx}",
+                        str(self.question2.id): f"b{idx}",
+                    },
+                }
+                for idx, s in enumerate(self.submissions)
+            ],
+        )
+
+    def test_export_streams_in_chunks(self):
+        # The form, its questions, the submission cursor, and the answers of each chunk
+        with self.assertNumQueries(4):
+            expected = self.export(self.form1, "csv")
+
+        with mock.patch.object(SubmissionExporter, "chunk_size", 2):
+            with self.assertNumQueries(5):
+                self.assertEqual(self.export(self.form1, "csv"), expected)
+
+    def test_export_unknown_format_failure(self):
+        response = self.client.get(
+            reverse("forms-export-submissions", args=[self.form1.id]), {"format": "xml"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_missing_form_failure(self):
+        response = self.client.get(
+            reverse("forms-export-submissions", args=[100]), {"format": "csv"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,100 @@
+from unittest import skipUnless
+
+from api.filters import SubmissionFilterBackend
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from .factory import AnswerFactory, FormFactory, QuestionFactory, SubmissionFactory
+
+
+class SubmissionFilterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form1 = FormFactory.create()
+        cls.form2 = FormFactory.create()
+        cls.question = QuestionFactory.create(form_id=cls.form1)
+        cls.submissions = [
+            SubmissionFactory.create(form_id=form)
+            for form in [cls.form1, cls.form2, cls.form1, cls.form2]
+        ]
+        for submission in cls.submissions:
+            AnswerFactory.create(submission_id=submission, question_id=cls.question)
+
+    def get_ids(self, params):
+        response = self.client.get(reverse("submissions-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [result["id"] for result in response.data["results"]]
+
+    def test_filter_by_form_id(self):
+        self.assertEqual(
+            self.get_ids({"form_id": self.form1.id}),
+            [self.submissions[0].id, self.submissions[2].id],
+        )
+
+    def test_filter_by_id_in(self):
+        ids = f"{self.submissions[3].id},{self.submissions[0].id}"
+        self.assertEqual(
+            self.get_ids({"id__in": ids}),
+            [self.submissions[0].id, self.submissions[3].id],
+        )
+
+    def test_filter_by_after_id(self):
+        self.assertEqual(
+            self.get_ids(
+                {"form_id": self.form2.id, "after_id": self.submissions[1].id}
+            ),
+            [self.submissions[3].id],
+        )
+
+    def test_filter_invalid_value_failure(self):
+        response = self.client.get(reverse("submissions-list"), {"form_id": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["form_id"][0], SubmissionFilterBackend.INVALID_INTEGER_MESSAGE
+        )
+
+        response = self.client.get(reverse("submissions-list"), {"id__in": "1,a"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["id__in"][0],
+            SubmissionFilterBackend.INVALID_INTEGER_LIST_MESSAGE,
+        )
+
+    def test_filter_out_of_range_value_failure(self):
+        # Values outside the range of the 64 bit columns are invalid, rather than overflowing
+        response = self.client.get(reverse("submissions-list"), {"after_id": 2**63})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["after_id"][0],
+            SubmissionFilterBackend.INVALID_INTEGER_MESSAGE,
+        )
+
+        response = self.client.get(
+            reverse("submissions-list"), {"id__in": f"1,{-(2**63) - 1}"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["id__in"][0],
+            SubmissionFilterBackend.INVALID_INTEGER_LIST_MESSAGE,
+        )
+
+    @skipUnless(connection.vendor == "sqlite", "Checks SQLite query plans")
+    def test_filters_use_indexes(self):
+        for params in [
+            {"form_id": self.form1.id},
+            {"form_id": self.form1.id, "after_id": self.submissions[0].id},
+            {"id__in": f"{self.submissions[0].id},{self.submissions[1].id}"},
+            {"after_id": self.submissions[0].id},
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse("submissions-list"), params)
+
+            for query in queries.captured_queries:
+                with connection.cursor() as cursor:
+                    cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                    plan = [row[-1] for row in cursor.fetchall()]
+                for step in plan:
+                    if step.startswith(("SCAN", "SEARCH")):
+                        self.assertIn("USING", step, (params, query["sql"]))
@@ -1,10 +1,13 @@
-from api.models import Form, Question
+from unittest import mock
+
+from api.models import Choice, Form, Question
 from api.serializers import FormSerializer, QuestionSerializer
 from api.views import FormViewSet
+from django.db import DatabaseError
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
-from .factory import FormFactory, QuestionFactory
+from .factory import ChoiceFactory, FormFactory, QuestionFactory
 
 
 class FormTest(TestCase):
@@ -22,10 +25,11 @@ class FormTest(TestCase):
 
     def test_get_all_forms(self):
         response = self.client.get(reverse("forms-list"))
-        forms = Form.objects.all()
+        forms = Form.objects.all().order_by("id")
         serializer = FormSerializer(forms, many=True)
 
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
+        self.assertIsNone(response.data["next"])
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_get_individual_form(self):
@@ -36,6 +40,38 @@ class FormTest(TestCase):
         self.assertEqual(response.data, serializer.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_forms_within_query_budget(self):
+        for form in [self.form1, self.form2, FormFactory.create()]:
+            for i in range(1, 4):
+                question = QuestionFactory.create(
+                    form_id=form, display_order=10 + i, question_type="radio"
+                )
+                for choice_id in range(1, 4):
+                    ChoiceFactory.create(question_id=question, choice_id=choice_id)
+
+        with self.assertNumQueries(FormViewSet.query_budget["list"]):
+            response = self.client.get(reverse("forms-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(FormViewSet.query_budget["retrieve"]):
+            response = self.client.get(reverse("forms-detail", args=[1]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_form_questions_and_choices_in_display_order(self):
+        form = FormFactory.create()
+        for display_order in [2, 1]:
+            question = QuestionFactory.create(
+                form_id=form, display_order=display_order, question_type="radio"
+            )
+            for choice_id in [2, 1]:
+                ChoiceFactory.create(question_id=question, choice_id=choice_id)
+
+        response = self.client.get(reverse("forms-detail", args=[form.id]))
+        questions = response.data["questions"]
+        self.assertEqual([q["display_order"] for q in questions], [1, 2])
+        for question in questions:
+            self.assertEqual([c["choice_id"] for c in question["choices"]], [1, 2])
+
     def test_post_form_with_questions_success(self):
         data = {
             "title": "test form",
@@ -73,6 +109,56 @@ class FormTest(TestCase):
         self.assertEqual(Form.objects.count(), self.num_forms_default + 1)
         self.assertEqual(Question.objects.count(), self.num_questions_default + 3)
 
+    def form_data(self, num_questions, num_choices):
+        return {
+            "title": "test form",
+            "questions": [
+                {
+                    "display_order": i + 1,
+                    "question": f"question {i + 1}",
+                    "question_type": "radio",
+                    "choices": [
+                        {"choice_id": j + 1, "choice": f"choice {j + 1}"}
+                        for j in range(num_choices)
+                    ],
+                }
+                for i in range(num_questions)
+            ],
+        }
+
+    def test_post_form_constant_queries(self):
+        for num_questions, num_choices in [(1, 1), (20, 10)]:
+            # 3 savepoints, insert form, insert and read back questions, insert choices,
+            # 3 releases, then questions and choices in the response
+            with self.assertNumQueries(12):
+                response = self.client.post(
+                    reverse("forms-list"),
+                    self.form_data(num_questions, num_choices),
+                    content_type="application/json",
+                )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(
+                response.data,
+                FormSerializer(Form.objects.get(id=response.data["id"])).data,
+            )
+            self.assertEqual(len(response.data["questions"]), num_questions)
+            self.assertEqual(
+                len(response.data["questions"][-1]["choices"]), num_choices
+            )
+
+    def test_post_form_rolled_back_on_failure(self):
+        with mock.patch.object(
+            Choice.objects, "bulk_create", side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            self.client.post(
+                reverse("forms-list"),
+                self.form_data(2, 2),
+                content_type="application/json",
+            )
+
+        self.assertEqual(Form.objects.count(), self.num_forms_default)
+        self.assertEqual(Question.objects.count(), self.num_questions_default)
+
     def test_post_form_zero_questions_success(self):
         data = {"title": "test form", "questions": []}
         response = self.client.post(
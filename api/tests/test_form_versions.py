@@ -0,0 +1,253 @@
+import csv
+import io
+
+from api.models import Answer, Choice, Form, Question, Submission
+from api.serializers import SubmissionReadSerializer
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+
+class FormVersionTest(TestCase):
+    def setUp(self):
+        self.data = {
+            "title": "test form",
+            "questions": [
+                {
+                    "display_order": 1,
+                    "question": "question 1",
+                    "question_type": "radio",
+                    "choices": [
+                        {"choice_id": 1, "choice": "yes"},
+                        {"choice_id": 2, "choice": "no"},
+                    ],
+                },
+                {
+                    "display_order": 2,
+                    "question": "question 2",
+                    "question_type": "textbox",
+                },
+            ],
+        }
+        response = self.client.post(
+            reverse("forms-list"), self.data, content_type="application/json"
+        )
+        self.form = Form.objects.get(id=response.data["id"])
+        self.question_ids = [q["id"] for q in response.data["questions"]]
+
+        self.submission_ids = [self.post_submission(["1", "text"]) for _ in range(3)]
+
+    def post_submission(self, answers, version=1):
+        response = self.client.post(
+            reverse("submissions-list"),
+            {
+                "form_id": self.form.id,
+                "answers": [
+                    {"answer": answer, "question_type": question_type}
+                    for answer, question_type in zip(
+                        answers, ["radio", "textbox", "textbox"]
+                    )
+                ],
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["form_version"], version)
+        return response.data["id"]
+
+    def put_form(self):
+        response = self.client.put(
+            reverse("forms-detail", args=[self.form.id]),
+            self.data,
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_put_form_text_changes_in_place(self):
+        self.data["title"] = "updated form"
+        self.data["questions"][0]["question"] = "updated question 1"
+        self.data["questions"][0]["choices"][1]["choice"] = "maybe"
+
+        response = self.put_form()
+
+        self.assertEqual(response.data["version"], 1)
+        self.assertEqual(response.data["title"], "updated form")
+        self.assertEqual(
+            [q["id"] for q in response.data["questions"]], self.question_ids
+        )
+        self.assertEqual(
+            response.data["questions"][0]["question"], "updated question 1"
+        )
+        self.assertEqual(response.data["questions"][0]["choices"][1]["choice"], "maybe")
+        self.assertEqual(Question.all_objects.count(), 2)
+        self.assertEqual(Choice.objects.count(), 2)
+        self.assertEqual(Submission.objects.count(), 3)
+        self.assertEqual(Answer.objects.count(), 6)
+
+    def test_put_form_schema_change_starts_new_version(self):
+        # Changing the choice_ids of question 1 and adding question 3 changes the schema,
+        # while question 2 is unchanged
+        self.data["questions"][0]["choices"].append({"choice_id": 3, "choice": "maybe"})
+        self.data["questions"].append(
+            {"display_order": 3, "question": "question 3", "question_type": "textbox"}
+        )
+
+        response = self.put_form()
+
+        self.assertEqual(response.data["version"], 2)
+        new_question_ids = [q["id"] for q in response.data["questions"]]
+        self.assertNotEqual(new_question_ids[0], self.question_ids[0])
+        self.assertEqual(new_question_ids[1], self.question_ids[1])
+        self.assertEqual(len(response.data["questions"][0]["choices"]), 3)
+
+        # Existing submissions and the questions they answered are kept
+        self.assertEqual(Question.objects.count(), 3)
+        self.assertEqual(Question.all_objects.count(), 4)
+        self.assertEqual(
+            Question.all_objects.get(id=self.question_ids[0]).removed_in_version, 2
+        )
+        self.assertEqual(Answer.objects.count(), 6)
+        self.assertEqual(
+            set(Submission.objects.values_list("form_version", flat=True)), {1}
+        )
+
+        # New submissions answer the new version
+        response = self.client.post(
+            reverse("submissions-list"),
+            {
+                "form_id": self.form.id,
+                "answers": [
+                    {"answer": "3", "question_type": "radio"},
+                    {"answer": "text", "question_type": "textbox"},
+                    {"answer": "text", "question_type": "textbox"},
+                ],
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["form_version"], 2)
+        self.assertEqual(
+            [answer["question_id"] for answer in response.data["answers"]],
+            new_question_ids,
+        )
+
+    def test_put_form_moved_questions_start_new_version(self):
+        self.data["questions"].append(
+            {"display_order": 3, "question": "question 3", "question_type": "textbox"}
+        )
+        self.put_form()
+        submission_id = self.post_submission(["1", "name", "email"], version=2)
+
+        # Swapping two questions of the same type keeps their answers with their text
+        questions = self.data["questions"]
+        questions[1]["display_order"], questions[2]["display_order"] = 3, 2
+        questions[1], questions[2] = questions[2], questions[1]
+        response = self.put_form()
+
+        self.assertEqual(response.data["version"], 3)
+        self.assertEqual(
+            [q["question"] for q in response.data["questions"]],
+            ["question 1", "question 3", "question 2"],
+        )
+        response = self.client.get(
+            reverse("forms-export-submissions", args=[self.form.id]),
+            {"format": "csv"},
+        )
+        header, *rows = csv.reader(
+            io.StringIO(b"".join(response.streaming_content).decode())
+        )
+        self.assertEqual(rows[-1][:2], [str(submission_id), "2"])
+        # Answers stay in the columns of the retired questions they answered, which are
+        # ordered by display_order after the questions that replaced them
+        self.assertEqual(
+            header,
+            ["submission_id", "form_version"]
+            + ["question 1", "question 2", "question 3", "question 3", "question 2"],
+        )
+        self.assertEqual(rows[-1][2:], ["1", "name", "", "email", ""])
+
+    def test_put_form_questions_matched_by_id(self):
+        response = self.client.get(reverse("forms-detail", args=[self.form.id]))
+        self.data["questions"] = response.data["questions"]
+        self.data["questions"][1]["question"] = "question 1"
+
+        # The text of question 2 changes in place, even though it is the text of question 1
+        response = self.put_form()
+        self.assertEqual(response.data["version"], 1)
+        self.assertEqual(
+            [q["id"] for q in response.data["questions"]], self.question_ids
+        )
+
+        # A question at another display_order is a schema change
+        questions = self.data["questions"]
+        questions[0]["display_order"], questions[1]["display_order"] = 2, 1
+        response = self.put_form()
+        self.assertEqual(response.data["version"], 2)
+        self.assertEqual(
+            Question.all_objects.filter(id__in=self.question_ids)
+            .exclude(removed_in_version=2)
+            .count(),
+            0,
+        )
+
+    def test_put_submission_to_previous_version(self):
+        self.data["questions"].pop()
+        self.put_form()
+
+        # The submission is validated against, and answers, the version it was made for
+        response = self.client.put(
+            reverse("submissions-detail", args=[self.submission_ids[0]]),
+            {
+                "answers": [
+                    {"answer": "2", "question_type": "radio"},
+                    {"answer": "updated", "question_type": "textbox"},
+                ]
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["form_version"], 1)
+        self.assertEqual(
+            [answer["question_id"] for answer in response.data["answers"]],
+            self.question_ids,
+        )
+
+    def test_submission_nests_questions_of_its_version(self):
+        self.data["questions"].pop()
+        self.put_form()
+        self.post_submission(["1"], version=2)
+
+        response = self.client.get(reverse("submissions-list"))
+        self.assertEqual(
+            [
+                [question["id"] for question in submission["form_id"]["questions"]]
+                for submission in response.data["results"]
+            ],
+            [self.question_ids] * 3 + [self.question_ids[:1]],
+        )
+        response = self.client.get(
+            reverse("submissions-detail", args=[self.submission_ids[0]])
+        )
+        self.assertEqual(
+            [question["id"] for question in response.data["form_id"]["questions"]],
+            self.question_ids,
+        )
+        self.assertEqual(response.data["form_id"]["version"], 2)
+        self.assertEqual(
+            response.data,
+            SubmissionReadSerializer(
+                Submission.objects.get(id=self.submission_ids[0])
+            ).data,
+        )
+
+    def test_put_form_cost_does_not_depend_on_submissions(self):
+        self.data["questions"][1]["question"] = "updated question 2"
+        with self.assertNumQueries(14):
+            self.put_form()
+
+        for _ in range(20):
+            self.post_submission(["2", "text"])
+        self.data["questions"][1]["question"] = "updated again"
+        with self.assertNumQueries(14):
+            self.put_form()
@@ -0,0 +1,209 @@
+from unittest import mock
+
+from api.checks import check_shared_caches
+from api.ingestion import BufferFull, SubmissionBuffer, submission_buffer
+from api.models import Answer, Submission, Tally
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from .factory import ChoiceFactory, FormFactory, QuestionFactory
+
+
+def create_form():
+    form = FormFactory.create()
+    question = QuestionFactory.create(
+        form_id=form, display_order=1, question_type="radio"
+    )
+    for choice_id in [1, 2]:
+        ChoiceFactory.create(question_id=question, choice_id=choice_id)
+    return form
+
+
+def new_buffer(max_size=100):
+    return SubmissionBuffer(
+        max_size=max_size,
+        batch_size=10,
+        flush_interval=0.01,
+        cache_alias="default",
+        ticket_timeout=60,
+    )
+
+
+class IngestionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = create_form()
+
+    def setUp(self):
+        cache.clear()
+        # Submissions are written by calling flush, rather than by the writer thread
+        patcher = mock.patch.object(SubmissionBuffer, "start")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer = new_buffer()
+        patcher = mock.patch("api.views.submission_buffer", self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_async(self, answer="1"):
+        return self.client.post(
+            reverse("submissions-list"),
+            {
+                "form_id": self.form.id,
+                "answers": [{"answer": answer, "question_type": "radio"}],
+            },
+            content_type="application/json",
+            HTTP_PREFER="respond-async",
+        )
+
+    def get_ticket(self, ticket):
+        response = self.client.get(reverse("submissions-ticket", args=[ticket]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_post_async_accepted(self):
+        response = self.post_async()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        ticket = response.data["ticket"]
+        self.assertEqual(response.data["status"], SubmissionBuffer.QUEUED)
+        self.assertTrue(
+            response["Location"].endswith(reverse("submissions-ticket", args=[ticket]))
+        )
+        self.assertEqual(self.get_ticket(ticket)["status"], SubmissionBuffer.QUEUED)
+        self.assertEqual(Submission.objects.count(), 0)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        ticket_status = self.get_ticket(ticket)
+        self.assertEqual(ticket_status["status"], SubmissionBuffer.CREATED)
+
+        submission = Submission.objects.get(id=ticket_status["submission_id"])
+        self.assertEqual(submission.form_id, self.form)
+        self.assertEqual(
+            list(submission.answers.values_list("answer", "choice_id")), [("1", 1)]
+        )
+        self.assertEqual(Tally.objects.get(choice_id=1).count, 1)
+
+    def test_post_async_flushed_in_batches(self):
+        tickets = [self.post_async().data["ticket"] for _ in range(25)]
+
+        # Each batch is written in one transaction: 2 savepoints, insert and read back the
+        # submissions, 1 release, insert answers, upsert tallies, 1 release
+        with self.assertNumQueries(8):
+            self.assertEqual(self.buffer.flush(), 10)
+        self.assertEqual(self.buffer.flush(), 10)
+        self.assertEqual(self.buffer.flush(), 5)
+        self.assertEqual(self.buffer.flush(), 0)
+
+        submission_ids = [self.get_ticket(t)["submission_id"] for t in tickets]
+        self.assertEqual(
+            submission_ids,
+            list(Submission.objects.order_by("id").values_list("id", flat=True)),
+        )
+        self.assertEqual(Answer.objects.count(), 25)
+
+    def test_post_async_validated_before_queueing(self):
+        response = self.post_async(answer="3")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.buffer.queue.qsize(), 0)
+
+    def test_post_async_buffer_full_failure(self):
+        self.buffer.queue.maxsize = 1
+        self.assertEqual(self.post_async().status_code, status.HTTP_202_ACCEPTED)
+
+        response = self.post_async()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(response.data["detail"], BufferFull.default_detail)
+
+    def test_drain_writes_queued_submissions(self):
+        tickets = [self.post_async().data["ticket"] for _ in range(15)]
+        self.buffer.drain()
+
+        self.assertEqual(Submission.objects.count(), 15)
+        self.assertTrue(
+            all(
+                self.get_ticket(ticket)["status"] == SubmissionBuffer.CREATED
+                for ticket in tickets
+            )
+        )
+        # No submissions are accepted once draining
+        self.assertEqual(
+            self.post_async().status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    def test_failed_batch_retried_one_by_one(self):
+        tickets = [self.post_async().data["ticket"] for _ in range(2)]
+
+        with mock.patch(
+            "api.ingestion.create_submissions",
+            side_effect=[
+                DatabaseError("batch failed"),
+                [Submission(id=100)],
+                DatabaseError("submission failed"),
+            ],
+        ), self.assertLogs("api.ingestion", "ERROR"):
+            self.buffer.flush()
+
+        self.assertEqual(
+            self.get_ticket(tickets[0]),
+            {
+                "ticket": tickets[0],
+                "status": SubmissionBuffer.CREATED,
+                "submission_id": 100,
+            },
+        )
+        self.assertEqual(
+            self.get_ticket(tickets[1]),
+            {
+                "ticket": tickets[1],
+                "status": SubmissionBuffer.FAILED,
+                "errors": ["submission failed"],
+            },
+        )
+
+    def test_unknown_ticket_failure(self):
+        response = self.client.get(reverse("submissions-ticket", args=["0" * 32]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_module_buffer_from_settings(self):
+        self.assertEqual(submission_buffer.batch_size, 500)
+        self.assertEqual(submission_buffer.queue.maxsize, 10000)
+        self.assertEqual(submission_buffer.cache_alias, "shared")
+
+    def test_process_local_ticket_cache_check(self):
+        self.assertEqual(check_shared_caches(None), [])
+        with override_settings(
+            SUBMISSION_BUFFER={**settings.SUBMISSION_BUFFER, "CACHE_ALIAS": "default"}
+        ):
+            self.assertEqual(
+                [error.id for error in check_shared_caches(None)], ["api.E001"]
+            )
+
+
+class IngestionWriterTest(TransactionTestCase):
+    def test_writer_thread_drained(self):
+        cache.clear()
+        form = create_form()
+        buffer = new_buffer()
+        with mock.patch("api.views.submission_buffer", buffer), mock.patch(
+            "atexit.register"
+        ):
+            for _ in range(20):
+                response = self.client.post(
+                    reverse("submissions-list"),
+                    {
+                        "form_id": form.id,
+                        "answers": [{"answer": "2", "question_type": "radio"}],
+                    },
+                    content_type="application/json",
+                    HTTP_PREFER="respond-async",
+                )
+                self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            buffer.drain(timeout=10)
+
+        self.assertFalse(buffer.writer.is_alive())
+        self.assertEqual(Submission.objects.count(), 20)
+        self.assertEqual(Tally.objects.get(choice_id=2).count, 20)
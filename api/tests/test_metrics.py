@@ -0,0 +1,127 @@
+import re
+
+from api.metrics import Histogram
+from api.views import FormViewSet
+from django.test import TestCase
+from django.urls import reverse
+from .factory import AnswerFactory, FormFactory, QuestionFactory, SubmissionFactory
+
+
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = FormFactory.create()
+        question = QuestionFactory.create(form_id=cls.form, question_type="textbox")
+        submission = SubmissionFactory.create(form_id=cls.form)
+        AnswerFactory.create(submission_id=submission, question_id=question)
+
+    def scrape(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8"
+        )
+        return response.content.decode()
+
+    def sample(self, metrics, name, labels):
+        match = re.search(
+            rf"^{re.escape(name)}{{{re.escape(labels)}}} (\S+)$", metrics, re.MULTILINE
+        )
+        return float(match.group(1)) if match else 0
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("forms-list"))
+        entries = [entry.split(";") for entry in response["Server-Timing"].split(", ")]
+        self.assertEqual(
+            [entry[0] for entry in entries], ["db", "serialize", "render", "total"]
+        )
+        self.assertEqual(
+            entries[0][2], f'desc="{FormViewSet.query_budget["list"]} queries"'
+        )
+        for entry in entries:
+            self.assertRegex(entry[1], r"^dur=\d+\.\d{3}$")
+
+    def test_requests_aggregated_per_route(self):
+        labels = 'route="forms-list",method="GET"'
+        before = self.scrape()
+        self.client.get(reverse("forms-list"))
+        self.client.get(reverse("forms-list"))
+        after = self.scrape()
+
+        for name in [
+            "questionnaire_request_duration_seconds_count",
+            "questionnaire_request_sql_duration_seconds_count",
+            "questionnaire_request_serialize_duration_seconds_count",
+            "questionnaire_request_render_duration_seconds_count",
+            "questionnaire_response_bytes_count",
+        ]:
+            self.assertEqual(
+                self.sample(after, name, labels) - self.sample(before, name, labels), 2
+            )
+        queries = 'route="forms-list",method="GET",le="3"'
+        self.assertEqual(
+            self.sample(after, "questionnaire_request_queries_bucket", queries)
+            - self.sample(before, "questionnaire_request_queries_bucket", queries),
+            2,
+        )
+
+    def test_streamed_response_bytes(self):
+        labels = 'route="forms-export-submissions",method="GET"'
+        before = self.sample(self.scrape(), "questionnaire_response_bytes_sum", labels)
+        response = self.client.get(
+            reverse("forms-export-submissions", args=[self.form.id]), {"format": "csv"}
+        )
+        size = len(b"".join(response.streaming_content))
+        after = self.sample(self.scrape(), "questionnaire_response_bytes_sum", labels)
+        self.assertEqual(after - before, size)
+
+    def test_metrics_forbidden_to_other_addresses(self):
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, 403)
+        with self.settings(METRICS_ALLOWED_NETWORKS=["203.0.113.0/24"]):
+            response = self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, 200)
+
+    def test_unmatched_requests(self):
+        before = self.scrape()
+        self.client.get("/missing/")
+        labels = 'route="unmatched",method="GET"'
+        name = "questionnaire_request_duration_seconds_count"
+        self.assertEqual(
+            self.sample(self.scrape(), name, labels)
+            - self.sample(before, name, labels),
+            1,
+        )
+
+    def test_unknown_methods_labelled_other(self):
+        before = self.scrape()
+        self.client.generic("BREW", "/missing/")
+        labels = 'route="unmatched",method="other"'
+        name = "questionnaire_request_duration_seconds_count"
+        self.assertEqual(
+            self.sample(self.scrape(), name, labels)
+            - self.sample(before, name, labels),
+            1,
+        )
+        self.assertNotIn('method="BREW"', self.scrape())
+
+
+class HistogramTest(TestCase):
+    def test_render(self):
+        histogram = Histogram("test_seconds", "A test.", ("route",), (1, 5))
+        for value in [0.5, 1, 3, 10]:
+            histogram.observe(('a "quoted" \\ route',), value)
+        self.assertEqual(
+            histogram.render(),
+            "\n".join(
+                [
+                    "# HELP test_seconds A test.",
+                    "# TYPE test_seconds histogram",
+                    'test_seconds_bucket{route="a \\"quoted\\" \\\\ route",le="1"} 2',
+                    'test_seconds_bucket{route="a \\"quoted\\" \\\\ route",le="5"} 3',
+                    'test_seconds_bucket{route="a \\"quoted\\" \\\\ route",le="+Inf"} 4',
+                    'test_seconds_sum{route="a \\"quoted\\" \\\\ route"} 14.5',
+                    'test_seconds_count{route="a \\"quoted\\" \\\\ route"} 4',
+                ]
+            ),
+        )
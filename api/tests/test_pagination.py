@@ -0,0 +1,79 @@
+import json
+from base64 import urlsafe_b64encode
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from .factory import FormFactory, SubmissionFactory
+
+
+class PaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.forms = FormFactory.create_batch(3)
+        # Interleave submissions across forms so that (form_id, id) differs from id order
+        cls.submissions = [
+            SubmissionFactory.create(form_id=cls.forms[i % 3]) for i in range(10)
+        ]
+
+    def get_all_pages(self, url, page_size):
+        ids, pages = [], 0
+        response = self.client.get(url, {"page_size": page_size})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [result["id"] for result in response.data["results"]]
+            pages += 1
+            if response.data["next"] is None:
+                return ids, pages
+            # The page size is carried over in the next link
+            response = self.client.get(response.data["next"])
+
+    def test_forms_paginated_by_id(self):
+        ids, pages = self.get_all_pages(reverse("forms-list"), 2)
+        self.assertEqual(ids, sorted(form.id for form in self.forms))
+        self.assertEqual(pages, 2)
+
+    def test_submissions_paginated_by_form_id_and_id(self):
+        ids, pages = self.get_all_pages(reverse("submissions-list"), 3)
+        expected = [
+            s.id for s in sorted(self.submissions, key=lambda s: (s.form_id_id, s.id))
+        ]
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 4)
+
+    def test_previous_link_returns_previous_page(self):
+        url = reverse("submissions-list")
+        first = self.client.get(url, {"page_size": 4})
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+
+        self.assertIsNone(first.data["previous"])
+        self.assertEqual(
+            [r["id"] for r in back.data["results"]],
+            [r["id"] for r in first.data["results"]],
+        )
+
+    def test_cursor_is_stable_when_rows_are_inserted_before_it(self):
+        url = reverse("forms-list")
+        first = self.client.get(url, {"page_size": 1})
+        FormFactory.create()  # appended at the end, must not shift the next page
+        second = self.client.get(first.data["next"])
+        self.assertEqual(second.data["results"][0]["id"], self.forms[1].id)
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("submissions-list"), {"page_size": 2})
+        self.assertFalse(
+            any("COUNT(" in query["sql"].upper() for query in queries.captured_queries)
+        )
+
+    def test_invalid_cursor_failure(self):
+        response = self.client.get(reverse("forms-list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Positions outside the range of the 64 bit columns
+        cursor = urlsafe_b64encode(json.dumps({"r": 0, "p": [2**63]}).encode())
+        response = self.client.get(reverse("forms-list"), {"cursor": cursor.decode()})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
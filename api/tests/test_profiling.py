@@ -0,0 +1,119 @@
+import itertools
+import json
+from io import StringIO
+from unittest import mock
+
+from api.profiling import PROFILE_HEADER, PROFILE_ID_HEADER, request_profiler
+from api.views import FormViewSet
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import FormFactory, QuestionFactory, temporary_root
+
+
+class RequestProfilingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = FormFactory.create()
+        QuestionFactory.create(form_id=cls.form, question_type="textbox")
+
+    def setUp(self):
+        self.root = temporary_root(self)
+        for attribute, value in [
+            ("root", self.root),
+            ("sample_rate", 0),
+            ("counter", itertools.count(1)),
+        ]:
+            patcher = mock.patch.object(request_profiler, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def profile_headers(self, token):
+        return {"HTTP_" + PROFILE_HEADER.upper().replace("-", "_"): token}
+
+    def get_forms(self, token=None):
+        headers = self.profile_headers(token) if token else {}
+        response = self.client.get(reverse("forms-list"), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def stored_profiles(self):
+        return sorted(path.stem for path in self.root.glob("*.json"))
+
+    def test_profiled_with_signed_header(self):
+        response = self.get_forms(request_profiler.create_token())
+        name = response[PROFILE_ID_HEADER]
+        self.assertEqual(self.stored_profiles(), [name])
+        self.assertTrue((self.root / f"{name}.prof").exists())
+
+        details = json.loads((self.root / f"{name}.json").read_text())
+        self.assertEqual(details["route"], "forms-list")
+        self.assertEqual(details["method"], "GET")
+        self.assertEqual(details["status"], 200)
+        self.assertEqual(details["trigger"], "header")
+        self.assertEqual(details["queries"], FormViewSet.query_budget["list"])
+        self.assertGreater(details["duration_ms"], 0)
+        self.assertTrue(details["top_allocations"])
+        self.assertEqual(details["memory_scope"], "request")
+        self.assertFalse(details["partial"])
+
+    def test_concurrent_requests_profiled_process_wide(self):
+        # Another request being served
+        with mock.patch.object(request_profiler, "in_flight", 1):
+            name = self.get_forms(request_profiler.create_token())[PROFILE_ID_HEADER]
+        details = json.loads((self.root / f"{name}.json").read_text())
+        self.assertEqual(details["memory_scope"], "process")
+
+    def test_streamed_responses_profiled_partially(self):
+        response = self.client.get(
+            reverse("forms-export-submissions", args=[self.form.id]),
+            {"format": "csv"},
+            **self.profile_headers(request_profiler.create_token()),
+        )
+        b"".join(response.streaming_content)
+        name = response[PROFILE_ID_HEADER]
+        details = json.loads((self.root / f"{name}.json").read_text())
+        self.assertTrue(details["partial"])
+
+    def test_not_profiled_without_valid_token(self):
+        self.get_forms()
+        response = self.get_forms("profile:forged:signature")
+        self.assertNotIn(PROFILE_ID_HEADER, response)
+        self.assertEqual(self.stored_profiles(), [])
+
+    def test_sampled_requests_profiled(self):
+        request_profiler.sample_rate = 2
+        responses = [self.get_forms() for _ in range(4)]
+        self.assertEqual(
+            [PROFILE_ID_HEADER in response for response in responses],
+            [False, True, False, True],
+        )
+
+    def test_oldest_profiles_rotated(self):
+        with mock.patch.object(request_profiler, "max_profiles", 2):
+            token = request_profiler.create_token()
+            names = [self.get_forms(token)[PROFILE_ID_HEADER] for _ in range(3)]
+        self.assertEqual(self.stored_profiles(), names[1:])
+        self.assertEqual(len(list(self.root.glob("*.prof"))), 2)
+
+    def test_profiles_command_lists_slowest(self):
+        token = request_profiler.create_token()
+        self.get_forms(token)
+        self.client.get(
+            reverse("forms-detail", args=[self.form.id]),
+            **self.profile_headers(token),
+        )
+
+        out = StringIO()
+        call_command("profiles", "--route", "forms-list", stdout=out)
+        output = out.getvalue()
+        self.assertIn("GET /forms/ (forms-list) 200", output)
+        self.assertNotIn("forms-detail", output)
+        self.assertIn("Top functions", output)
+        self.assertIn("Top allocations", output)
+
+    def test_profiles_command_without_profiles(self):
+        out = StringIO()
+        call_command("profiles", stdout=out)
+        self.assertIn("No profiles", out.getvalue())
@@ -0,0 +1,121 @@
+import sqlite3
+from unittest import mock
+
+from api.models import Form
+from api.replica import ReplicaRouter, SQLiteReplicaSync, read_replica
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import FormFactory, QuestionFactory, temporary_root
+
+
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_test_mirror_not_available(self):
+        self.assertFalse(read_replica.is_available())
+
+    @mock.patch.object(read_replica, "is_available", return_value=True)
+    def test_reads_routed_while_reading(self, is_available):
+        self.assertEqual(self.router.db_for_read(Form), "default")
+        with read_replica.reading():
+            self.assertEqual(self.router.db_for_read(Form), read_replica.alias)
+            self.assertEqual(self.router.db_for_write(Form), "default")
+        self.assertEqual(self.router.db_for_read(Form), "default")
+
+    def test_replica_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate(read_replica.alias, "api"))
+        self.assertIsNone(self.router.allow_migrate("default", "api"))
+
+
+class ReplicaReadViewSetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = FormFactory.create()
+        QuestionFactory.create(form_id=cls.form, question_type="textbox")
+
+    def setUp(self):
+        patcher = mock.patch.object(read_replica, "reading", wraps=read_replica.reading)
+        self.reading = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_safe_requests_read_from_replica(self):
+        response = self.client.get(reverse("forms-detail", args=[self.form.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.reading.assert_called_once()
+        self.assertNotIn(read_replica.cookie_name, response.cookies)
+
+    def test_streamed_content_read_from_replica(self):
+        response = self.client.get(
+            reverse("forms-export-submissions", args=[self.form.id]), {"format": "csv"}
+        )
+        b"".join(response.streaming_content)
+
+        # Once for the view, and once for each chunk and the end of the content
+        self.assertGreater(self.reading.call_count, 2)
+
+    def test_writes_pin_client_to_default_database(self):
+        response = self.client.post(
+            reverse("submissions-list"),
+            {
+                "form_id": self.form.id,
+                "answers": [{"answer": "text", "question_type": "textbox"}],
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.cookies[read_replica.cookie_name]["max-age"],
+            read_replica.sticky_seconds,
+        )
+        self.reading.assert_not_called()
+
+        # The test client sends the cookie back
+        response = self.client.get(reverse("submissions-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.reading.assert_not_called()
+
+    def test_failed_writes_do_not_pin(self):
+        response = self.client.post(
+            reverse("submissions-list"),
+            {"form_id": self.form.id, "answers": []},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(read_replica.cookie_name, response.cookies)
+
+
+class SQLiteReplicaSyncTest(TransactionTestCase):
+    # The backup waits for transactions on the default database to end, so none may be open
+
+    def setUp(self):
+        self.replica_path = temporary_root(self) / "replica.sqlite3"
+        patcher = mock.patch.dict(
+            connections[read_replica.alias].settings_dict, NAME=self.replica_path
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def count_replica_forms(self):
+        replica = sqlite3.connect(self.replica_path)
+        try:
+            return replica.execute("SELECT COUNT(*) FROM api_form").fetchone()[0]
+        finally:
+            replica.close()
+
+    def test_sync_copies_database(self):
+        FormFactory.create()
+        replica_sync = SQLiteReplicaSync(read_replica.alias)
+
+        replica_sync.sync()
+        self.assertEqual(self.count_replica_forms(), 1)
+        self.assertTrue(read_replica.is_available())
+
+        FormFactory.create()
+        replica_sync.sync()
+        self.assertEqual(self.count_replica_forms(), 2)
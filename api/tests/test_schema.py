@@ -0,0 +1,107 @@
+from unittest import mock
+
+from api.models import Form
+from api.schema import FormSchema, FormSchemaCache, form_schema_cache, get_form_schema
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import ChoiceFactory, FormFactory, QuestionFactory
+
+
+class FormSchemaTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = FormFactory.create()
+        cls.questions = [
+            QuestionFactory.create(
+                form_id=cls.form,
+                display_order=display_order,
+                question_type=question_type,
+            )
+            for display_order, question_type in [(2, "textbox"), (1, "radio")]
+        ]
+        for choice_id in [1, 2]:
+            ChoiceFactory.create(question_id=cls.questions[1], choice_id=choice_id)
+
+    def setUp(self):
+        form_schema_cache.shared.clear()
+        form_schema_cache.clear()
+
+    def test_compile_schema(self):
+        schema = FormSchema.compile(self.form.id, 1)
+        self.assertEqual(schema.version, 1)
+        self.assertEqual(
+            schema.question_ids, (self.questions[1].id, self.questions[0].id)
+        )
+        self.assertEqual(schema.question_types, ("radio", "textbox"))
+        self.assertEqual(schema.choice_ids, (frozenset([1, 2]), frozenset()))
+
+    def test_cached_schema_needs_no_queries(self):
+        with self.assertNumQueries(2):
+            schema = get_form_schema(self.form.id, 1)
+        with self.assertNumQueries(0):
+            self.assertIs(get_form_schema(self.form.id, 1), schema)
+
+        # Other processes find the schema in the shared cache
+        form_schema_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_form_schema(self.form.id, 1), schema)
+
+    def test_edits_invalidate_schemas_of_other_processes(self):
+        other_process_cache = FormSchemaCache(
+            max_size=10, cache_alias=form_schema_cache.cache_alias, timeout=60
+        )
+        self.assertEqual(
+            other_process_cache.get(self.form.id, 1).question_types,
+            ("radio", "textbox"),
+        )
+
+        # Edited in place, e.g. in the admin site, without starting a new version
+        question = self.questions[0]
+        question.question_type = "checkbox"
+        question.save()
+
+        with self.assertNumQueries(2):
+            schema = other_process_cache.get(self.form.id, 1)
+        self.assertEqual(schema.question_types, ("radio", "checkbox"))
+        with self.assertNumQueries(0):
+            other_process_cache.get(self.form.id, 1)
+
+    def test_local_cache_is_bounded(self):
+        local_cache = FormSchemaCache(max_size=2, cache_alias="default", timeout=60)
+        forms = FormFactory.create_batch(3)
+        for form in forms:
+            local_cache.get(form.id, 1)
+
+        self.assertEqual(
+            list(local_cache.local.keys()), [(forms[1].id, 1), (forms[2].id, 1)]
+        )
+
+    def test_form_update_invalidates_schema(self):
+        data = {
+            "title": "updated form",
+            "questions": [
+                {"display_order": 1, "question": "question", "question_type": "textbox"}
+            ],
+        }
+        get_form_schema(self.form.id, 1)
+
+        with mock.patch.object(
+            form_schema_cache, "invalidate", wraps=form_schema_cache.invalidate
+        ) as invalidate:
+            response = self.client.put(
+                reverse("forms-detail", args=[self.form.id]),
+                data,
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        invalidate.assert_called_with(self.form.id)
+
+        form = Form.objects.get(id=self.form.id)
+        self.assertEqual(
+            get_form_schema(form.id, form.version).question_types, ("textbox",)
+        )
+        # The previous version is still available to update old submissions
+        self.assertEqual(
+            get_form_schema(form.id, 1).question_types, ("radio", "textbox")
+        )
@@ -0,0 +1,231 @@
+from unittest import mock
+
+from api.checks import check_shard_sequences
+from api.models import Answer, Submission, Tally
+from api.sharding import ShardRouter, ShardSet, shards
+from api.tallies import rebuild_tallies
+from django.db import connections
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import ChoiceFactory, FormFactory, QuestionFactory
+
+SHARDS = ["shard_1", "shard_2"]
+
+
+class ShardSetTest(TestCase):
+    def setUp(self):
+        self.shard_set = ShardSet(SHARDS, id_offset=1000)
+
+    def test_forms_placed_by_stable_hash(self):
+        self.assertEqual(
+            [self.shard_set.for_form(form_id) for form_id in range(1, 7)],
+            [self.shard_set.for_form(str(form_id)) for form_id in range(1, 7)],
+        )
+        self.assertEqual(
+            {self.shard_set.for_form(form_id) for form_id in range(1, 100)},
+            set(SHARDS),
+        )
+
+    def test_submissions_placed_by_id_range(self):
+        self.assertEqual(self.shard_set.for_submission(1), "shard_1")
+        self.assertEqual(self.shard_set.for_submission(1000), "shard_1")
+        self.assertEqual(self.shard_set.for_submission(1001), "shard_2")
+        self.assertIsNone(self.shard_set.for_submission(2001))
+        self.assertIsNone(self.shard_set.for_submission(0))
+        self.assertIsNone(self.shard_set.for_submission("abc"))
+
+    def test_sharded_models_only_migrated_on_shards(self):
+        router = ShardRouter()
+        with mock.patch.object(shards, "aliases", SHARDS):
+            self.assertFalse(router.allow_migrate("default", "api", "submission"))
+            self.assertIsNone(router.allow_migrate("default", "api", "form"))
+            self.assertTrue(router.allow_migrate("shard_1", "api", "answer"))
+            self.assertFalse(router.allow_migrate("shard_1", "api", "question"))
+            self.assertFalse(router.allow_migrate("shard_1", "api"))
+
+    def test_shard_sequences_check(self):
+        with mock.patch.object(shards, "aliases", SHARDS):
+            self.assertEqual(check_shard_sequences(None), [])
+            with mock.patch.object(connections["shard_2"], "vendor", "mysql"):
+                self.assertEqual(
+                    [error.id for error in check_shard_sequences(None)], ["api.E004"]
+                )
+            # The range of the first shard starts at 1
+            with mock.patch.object(connections["shard_1"], "vendor", "mysql"):
+                self.assertEqual(check_shard_sequences(None), [])
+
+
+class ShardedSubmissionsTest(TestCase):
+    databases = {"default", *SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        # One form on each shard
+        cls.forms = {}
+        while len(cls.forms) < len(SHARDS):
+            form = FormFactory.create()
+            alias = ShardSet(SHARDS, shards.id_offset).for_form(form.id)
+            cls.forms.setdefault(alias, form)
+        for form in cls.forms.values():
+            question = QuestionFactory.create(
+                form_id=form, display_order=1, question_type="radio"
+            )
+            ChoiceFactory.create(question_id=question, choice_id=1)
+            ChoiceFactory.create(question_id=question, choice_id=2)
+
+    def setUp(self):
+        patcher = mock.patch.object(shards, "aliases", SHARDS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for alias in SHARDS:
+            shards.reserve_ids(alias)
+
+    def post_submission(self, form, answer="1"):
+        response = self.client.post(
+            reverse("submissions-list"),
+            {
+                "form_id": form.id,
+                "answers": [{"answer": answer, "question_type": "radio"}],
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def test_submissions_written_to_shard_of_form(self):
+        for alias, form in self.forms.items():
+            submission_id = self.post_submission(form)
+
+            self.assertEqual(shards.for_submission(submission_id), alias)
+            self.assertTrue(
+                Submission.objects.using(alias).filter(id=submission_id).exists()
+            )
+            self.assertEqual(
+                Answer.objects.using(alias).filter(submission_id=submission_id).count(),
+                1,
+            )
+        self.assertFalse(Submission.objects.using("default").exists())
+
+    def test_bulk_upload_across_shards(self):
+        forms = [self.forms["shard_2"], self.forms["shard_1"], self.forms["shard_2"]]
+        response = self.client.post(
+            reverse("submissions-bulk"),
+            [
+                {
+                    "form_id": form.id,
+                    "answers": [{"answer": "2", "question_type": "radio"}],
+                }
+                for form in forms
+            ],
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [shards.for_submission(result["id"]) for result in response.data],
+            ["shard_2", "shard_1", "shard_2"],
+        )
+
+    def test_retrieve_and_update_by_id(self):
+        form = self.forms["shard_2"]
+        submission_id = self.post_submission(form)
+        url = reverse("submissions-detail", args=[submission_id])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["form_id"]["id"], form.id)
+        self.assertEqual(response.data["answers"][0]["answer"], "1")
+
+        response = self.client.put(
+            url,
+            {"answers": [{"answer": "2", "question_type": "radio"}]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url).data["answers"][0]["answer"], "2")
+
+        response = self.client.get(reverse("submissions-detail", args=[3 * 2**40]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_merges_shards(self):
+        submission_ids = [
+            self.post_submission(form)
+            for form in [*self.forms.values(), *self.forms.values()]
+        ]
+        expected = sorted(
+            (
+                (form.id, submission_id)
+                for form, submission_id in zip(
+                    [*self.forms.values(), *self.forms.values()], submission_ids
+                )
+            )
+        )
+
+        listed, url = [], reverse("submissions-list") + "?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            listed += [
+                (submission["form_id"]["id"], submission["id"])
+                for submission in response.data["results"]
+            ]
+            url = response.data["next"]
+        self.assertEqual(listed, expected)
+
+        form = self.forms["shard_2"]
+        response = self.client.get(reverse("submissions-list"), {"form_id": form.id})
+        self.assertEqual(
+            [submission["id"] for submission in response.data["results"]],
+            [
+                submission_id
+                for form_id, submission_id in expected
+                if form_id == form.id
+            ],
+        )
+
+        # Form ids are hashed as 64 bit integers, which the filter checks first
+        response = self.client.get(reverse("submissions-list"), {"form_id": 10**20})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(
+            reverse("submissions-list"),
+            {"id__in": f"{submission_ids[0]},{submission_ids[1]}", "include": "forms"},
+        )
+        self.assertEqual(
+            sorted(submission["id"] for submission in response.data["results"]),
+            sorted(submission_ids[:2]),
+        )
+        self.assertEqual(len(response.data["forms"]), 2)
+
+    def test_tallies_kept_on_shard_of_form(self):
+        form = self.forms["shard_1"]
+        self.post_submission(form, "1")
+        self.post_submission(form, "2")
+        self.post_submission(self.forms["shard_2"], "2")
+
+        response = self.client.get(reverse("forms-results", args=[form.id]))
+        self.assertEqual(
+            [choice["count"] for choice in response.data["questions"][0]["choices"]],
+            [1, 1],
+        )
+
+        Tally.objects.using("shard_1").update(count=0)
+        self.assertEqual(rebuild_tallies([form.id]), 2)
+        self.assertEqual(rebuild_tallies(), 3)
+        response = self.client.get(reverse("forms-results", args=[form.id]))
+        self.assertEqual(response.data["questions"][0]["answers"], 2)
+
+    def test_form_deletion_deletes_rows_on_shard(self):
+        form, other_form = self.forms["shard_1"], self.forms["shard_2"]
+        self.post_submission(form)
+        self.post_submission(other_form)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            form.delete()
+
+        self.assertFalse(Submission.objects.using("shard_1").exists())
+        self.assertFalse(Answer.objects.using("shard_1").exists())
+        self.assertFalse(Tally.objects.using("shard_1").exists())
+        self.assertEqual(Submission.objects.using("shard_2").count(), 1)
+        self.assertTrue(Tally.objects.using("shard_2").exists())
@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection
+from django.test import SimpleTestCase, TestCase
+
+from api.sqlite import BusyRetryPolicy
+
+
+class SQLitePragmasTest(TestCase):
+    def get_pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_set_on_connection(self):
+        self.assertEqual(
+            self.get_pragma("busy_timeout"), settings.SQLITE_PRAGMAS["busy_timeout"]
+        )
+        self.assertEqual(
+            self.get_pragma("cache_size"), settings.SQLITE_PRAGMAS["cache_size"]
+        )
+        # NORMAL
+        self.assertEqual(self.get_pragma("synchronous"), 1)
+
+
+def write_mock(side_effect):
+    write = mock.Mock(side_effect=side_effect)
+    # Logged when retried
+    write.__qualname__ = "write"
+    return write
+
+
+class BusyRetryPolicyTest(SimpleTestCase):
+    def setUp(self):
+        self.retry = BusyRetryPolicy(attempts=3, backoff=0, max_backoff=0)
+
+    def test_busy_error_retried(self):
+        func = write_mock([OperationalError("database is locked")] * 2 + ["written"])
+
+        self.assertEqual(self.retry(func)(), "written")
+        self.assertEqual(func.call_count, 3)
+
+    def test_retries_limited(self):
+        func = write_mock(OperationalError("database is locked"))
+
+        with self.assertRaises(OperationalError):
+            self.retry(func)()
+        self.assertEqual(func.call_count, 3)
+
+    def test_other_errors_not_retried(self):
+        func = write_mock(IntegrityError("UNIQUE constraint failed"))
+
+        with self.assertRaises(IntegrityError):
+            self.retry(func)()
+        self.assertEqual(func.call_count, 1)
+
+    def test_only_outermost_call_retried(self):
+        inner = write_mock(OperationalError("database is locked"))
+        outer = self.retry(lambda: self.retry(inner)())
+
+        with self.assertRaises(OperationalError):
+            outer()
+        self.assertEqual(inner.call_count, 3)
+
+    def test_backoff_limited(self):
+        retry = BusyRetryPolicy(attempts=10, backoff=0.01, max_backoff=0.05)
+
+        for attempt in range(1, 10):
+            self.assertLessEqual(retry.get_delay(attempt), 0.05)
+
+
+class BusyRetryTransactionTest(TestCase):
+    def test_not_retried_inside_transaction(self):
+        # Every TestCase test runs inside a transaction
+        retry = BusyRetryPolicy(attempts=3, backoff=0, max_backoff=0)
+        func = write_mock(OperationalError("database is locked"))
+
+        with self.assertRaises(OperationalError):
+            retry(func)()
+        self.assertEqual(func.call_count, 1)
@@ -1,14 +1,23 @@
 from api.models import Answer, Form, Question, Submission
 from api.serializers import (
     AnswerSerializer,
+    FormSerializer,
     SubmissionReadSerializer,
     SubmissionWriteSerializer,
 )
+from api.schema import get_form_schema
+from api.views import SubmissionViewSet
 from django.test import TestCase
 from django.urls import reverse
 from factory import Faker
 from rest_framework import status
-from .factory import AnswerFactory, FormFactory, QuestionFactory, SubmissionFactory
+from .factory import (
+    AnswerFactory,
+    ChoiceFactory,
+    FormFactory,
+    QuestionFactory,
+    SubmissionFactory,
+)
 
 
 class SubmissionTest(TestCase):
@@ -31,6 +40,10 @@ class SubmissionTest(TestCase):
             )
             for i in range(cls.num_questions_default)
         ]
+        # Choices of the radio and checkbox questions
+        for question in cls.questions[:2]:
+            for choice_id in range(1, 5):
+                ChoiceFactory.create(question_id=question, choice_id=choice_id)
 
         cls.submission1 = SubmissionFactory(form_id=cls.form1)
         cls.submission2 = SubmissionFactory(form_id=cls.form1)
@@ -49,9 +62,10 @@ class SubmissionTest(TestCase):
 
     def test_get_all_submissions(self):
         response = self.client.get(reverse("submissions-list"))
-        submissions = Submission.objects.all()
+        submissions = Submission.objects.all().order_by("form_id", "id")
         serializer = SubmissionReadSerializer(submissions, many=True)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
+        self.assertIsNone(response.data["next"])
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_get_individual_submission(self):
@@ -61,6 +75,54 @@ class SubmissionTest(TestCase):
         self.assertEqual(response.data, serializer.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_submissions_within_query_budget(self):
+        for form in [self.form1, self.form2]:
+            for _ in range(5):
+                submission = SubmissionFactory.create(form_id=form)
+                for question in self.questions:
+                    AnswerFactory.create(submission_id=submission, question_id=question)
+
+        with self.assertNumQueries(SubmissionViewSet.query_budget["list"]):
+            response = self.client.get(reverse("submissions-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(SubmissionViewSet.query_budget["retrieve"]):
+            response = self.client.get(reverse("submissions-detail", args=[1]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_submissions_include_forms(self):
+        SubmissionFactory.create(form_id=self.form2)
+        with self.assertNumQueries(
+            SubmissionViewSet.query_budget["list_include_forms"]
+        ):
+            response = self.client.get(
+                reverse("submissions-list"), {"include": "forms"}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["form_id"] for result in response.data["results"]],
+            [self.form1.id, self.form1.id, self.form2.id],
+        )
+        self.assertEqual(
+            response.data["results"][0]["answers"],
+            AnswerSerializer(self.answers1, many=True).data,
+        )
+        self.assertEqual(
+            response.data["forms"],
+            {
+                str(self.form1.id): FormSerializer(self.form1).data,
+                str(self.form2.id): FormSerializer(self.form2).data,
+            },
+        )
+
+    def test_get_submissions_invalid_include_failure(self):
+        response = self.client.get(reverse("submissions-list"), {"include": "answers"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["include"][0], SubmissionViewSet.INVALID_INCLUDE_MESSAGE
+        )
+
     def test_post_submissions_success(self):
         data = {
             "form_id": self.form1.id,
@@ -79,6 +141,48 @@ class SubmissionTest(TestCase):
         self.assertEqual(Submission.objects.count(), self.num_submissions_default + 1)
         self.assertEqual(Answer.objects.count(), self.num_answers_default + 3)
 
+    def test_post_and_put_submission_constant_queries(self):
+        # The number of queries does not depend on the number of questions in the form
+        for num_questions in [1, 10]:
+            form = FormFactory.create()
+            for i in range(num_questions):
+                QuestionFactory.create(
+                    form_id=form, display_order=i + 1, question_type="textbox"
+                )
+            answers = [
+                {"answer": str(i), "question_type": "textbox"}
+                for i in range(num_questions)
+            ]
+
+            # The compiled form schema is cached, so that no questions are queried
+            get_form_schema(form.id, form.version)
+
+            # form, 2 savepoints, insert and read back the submission, 1 release,
+            # insert answers, upsert tallies, 1 release, and the answers in the response
+            with self.assertNumQueries(10):
+                response = self.client.post(
+                    reverse("submissions-list"),
+                    {"form_id": form.id, "answers": answers},
+                    content_type="application/json",
+                )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(
+                [answer["answer"] for answer in response.data["answers"]],
+                [str(i) for i in range(num_questions)],
+            )
+
+            # submission, 2 savepoints, previous answers, delete and insert answers, 1 release,
+            # bump the revision, 1 release, and the answers in the response. The tallies of the
+            # textbox answers are unchanged, so they are not written.
+            with self.assertNumQueries(10):
+                response = self.client.put(
+                    reverse("submissions-detail", args=[response.data["id"]]),
+                    {"answers": answers},
+                    content_type="application/json",
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["answers"]), num_questions)
+
     def test_post_missing_form_id_failure(self):
         data = {
             "answers": [
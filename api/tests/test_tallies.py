@@ -0,0 +1,225 @@
+import importlib
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from api.checks import check_tally_upserts
+from api.models import Tally
+from api.views import FormViewSet
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from .factory import (
+    AnswerFactory,
+    ChoiceFactory,
+    FormFactory,
+    QuestionFactory,
+    SubmissionFactory,
+)
+
+backfill_migration = importlib.import_module("api.migrations.0011_backfill_tallies")
+
+
+class TallyTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.form = FormFactory.create()
+        cls.radio = QuestionFactory.create(
+            form_id=cls.form, display_order=1, question_type="radio"
+        )
+        cls.checkbox = QuestionFactory.create(
+            form_id=cls.form, display_order=2, question_type="checkbox"
+        )
+        cls.textbox = QuestionFactory.create(
+            form_id=cls.form, display_order=3, question_type="textbox"
+        )
+        for question in [cls.radio, cls.checkbox]:
+            for choice_id in range(1, 4):
+                ChoiceFactory.create(question_id=question, choice_id=choice_id)
+
+    def answers(self, radio, checkbox, textbox="text"):
+        return [
+            {"answer": radio, "question_type": "radio"},
+            {"answer": checkbox, "question_type": "checkbox"},
+            {"answer": textbox, "question_type": "textbox"},
+        ]
+
+    def post_submission(self, radio, checkbox):
+        response = self.client.post(
+            reverse("submissions-list"),
+            {"form_id": self.form.id, "answers": self.answers(radio, checkbox)},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def get_results(self):
+        response = self.client.get(reverse("forms-results", args=[self.form.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def choice_counts(self, results):
+        return {
+            question["question_type"]: (
+                question["answers"],
+                [choice["count"] for choice in question["choices"]],
+            )
+            for question in results["questions"]
+        }
+
+    def tallies(self):
+        # Tallies decremented to zero are kept, and count the same as missing tallies
+        return {
+            (question_id, choice_id): count
+            for question_id, choice_id, count in Tally.objects.exclude(
+                count=0
+            ).values_list("question_id", "choice_id", "count")
+        }
+
+    def test_results_counted_on_post(self):
+        self.post_submission("1", "1,2")
+        self.post_submission("1", "2,3")
+        self.post_submission("3", "2")
+
+        results = self.get_results()
+        self.assertEqual(results["form_id"], self.form.id)
+        self.assertEqual(
+            [question["question_id"] for question in results["questions"]],
+            [self.radio.id, self.checkbox.id, self.textbox.id],
+        )
+        self.assertEqual(
+            self.choice_counts(results),
+            {
+                "radio": (3, [2, 0, 1]),
+                "checkbox": (3, [1, 3, 1]),
+                "textbox": (3, []),
+            },
+        )
+
+    def test_results_updated_by_deltas_on_put(self):
+        submission_id = self.post_submission("1", "1,2")
+        self.post_submission("1", "1")
+
+        response = self.client.put(
+            reverse("submissions-detail", args=[submission_id]),
+            {"answers": self.answers("2", "3")},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.choice_counts(self.get_results()),
+            {
+                "radio": (2, [1, 1, 0]),
+                "checkbox": (2, [1, 0, 1]),
+                "textbox": (2, []),
+            },
+        )
+
+    def test_results_counted_on_bulk_post(self):
+        submissions = [
+            {"form_id": self.form.id, "answers": self.answers(str(i % 3 + 1), "1,3")}
+            for i in range(6)
+        ]
+        response = self.client.post(
+            reverse("submissions-bulk"), submissions, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            self.choice_counts(self.get_results()),
+            {
+                "radio": (6, [2, 2, 2]),
+                "checkbox": (6, [6, 0, 6]),
+                "textbox": (6, []),
+            },
+        )
+
+    def test_results_within_query_budget(self):
+        self.post_submission("1", "1,2")
+        with self.assertNumQueries(FormViewSet.query_budget["results"]):
+            self.get_results()
+
+    def test_results_without_submissions(self):
+        self.assertEqual(
+            self.choice_counts(self.get_results()),
+            {
+                "radio": (0, [0, 0, 0]),
+                "checkbox": (0, [0, 0, 0]),
+                "textbox": (0, []),
+            },
+        )
+
+    def test_results_missing_form_failure(self):
+        response = self.client.get(reverse("forms-results", args=[100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rebuild_tallies_matches_incremental_counts(self):
+        submission_id = self.post_submission("1", "1,2")
+        self.post_submission("3", "2")
+        self.client.put(
+            reverse("submissions-detail", args=[submission_id]),
+            {"answers": self.answers("2", "3")},
+            content_type="application/json",
+        )
+        expected = self.tallies()
+
+        # Answers written without the serializers, and drifted tallies, are recounted
+        Tally.objects.update(count=100)
+        other_form_tally = Tally.objects.create(
+            question_id=QuestionFactory.create(), choice_id=Tally.ANSWERS, count=5
+        )
+        out = StringIO()
+        call_command("rebuild_tallies", "--form", str(self.form.id), stdout=out)
+        self.assertIn("Rebuilt tallies from 6 answers", out.getvalue())
+
+        other_form_tally.delete()
+        self.assertEqual(self.tallies(), expected)
+
+    def test_rebuild_tallies_of_every_form(self):
+        submission = SubmissionFactory.create(form_id=self.form)
+        AnswerFactory.create(
+            submission_id=submission, question_id=self.radio, answer="2", choice_id=2
+        )
+        AnswerFactory.create(
+            submission_id=submission,
+            question_id=self.checkbox,
+            answer="1,3",
+            choice_mask=0b101,
+        )
+
+        call_command("rebuild_tallies", stdout=StringIO())
+        self.assertEqual(
+            self.choice_counts(self.get_results()),
+            {
+                "radio": (1, [0, 1, 0]),
+                "checkbox": (1, [1, 0, 1]),
+                "textbox": (0, []),
+            },
+        )
+
+    def test_backfill_tallies(self):
+        submission_id = self.post_submission("1", "1,2")
+        self.post_submission("3", "2")
+        self.client.put(
+            reverse("submissions-detail", args=[submission_id]),
+            {"answers": self.answers("2", "1,3")},
+            content_type="application/json",
+        )
+        expected = self.tallies()
+
+        # Answers written before tallies were kept, and tallies kept since
+        Tally.objects.filter(question_id=self.radio).delete()
+        with mock.patch.object(backfill_migration, "CHUNK_SIZE", 2):
+            backfill_migration.backfill_tallies(
+                apps, SimpleNamespace(connection=connection)
+            )
+        self.assertEqual(self.tallies(), expected)
+
+    def test_tally_upserts_check(self):
+        self.assertEqual(check_tally_upserts(None), [])
+        with mock.patch.object(connections["default"], "vendor", "oracle"):
+            self.assertEqual(
+                [error.id for error in check_tally_upserts(None)], ["api.E003"]
+            )
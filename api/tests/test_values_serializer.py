@@ -0,0 +1,132 @@
+from collections import OrderedDict
+
+from api.models import Form, Submission
+from api.serializers import (
+    FormSerializer,
+    FormValuesSerializer,
+    SubmissionCompactSerializer,
+    SubmissionCompactValuesSerializer,
+    SubmissionReadSerializer,
+    SubmissionValuesSerializer,
+)
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from .factory import (
+    AnswerFactory,
+    ChoiceFactory,
+    FormFactory,
+    QuestionFactory,
+    SubmissionFactory,
+)
+
+
+class ValuesSerializerTest(TestCase):
+    """
+    The values serializers must render byte for byte what the model serializers render.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.forms = [
+            FormFactory.create(title='Café ☕ "quoted" \\ form'),
+            FormFactory.create(),
+            FormFactory.create(),
+        ]
+        for form in cls.forms[:2]:
+            # Created out of display_order, with choices out of choice_id order
+            radio = QuestionFactory.create(
+                form_id=form, display_order=2, question_type="radio"
+            )
+            textbox = QuestionFactory.create(
+                form_id=form, display_order=1, question_type="textbox"
+            )
+            # Removed in a past version, so not rendered
+            QuestionFactory.create(
+                form_id=form,
+                display_order=3,
+                question_type="textbox",
+                removed_in_version=1,
+            )
+            for choice_id in (2, 1, 3):
+                ChoiceFactory.create(question_id=radio, choice_id=choice_id)
+
+            for _ in range(2):
+                submission = SubmissionFactory.create(form_id=form)
+                AnswerFactory.create(
+                    submission_id=submission, question_id=textbox, answer="ünïcode"
+                )
+                AnswerFactory.create(
+                    submission_id=submission, question_id=radio, answer="2"
+                )
+        # A submission without answers, to a form without questions
+        SubmissionFactory.create(form_id=cls.forms[2])
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def assertRendersSame(self, serializer_class, values_serializer_class, queryset):
+        instances = serializer_class.setup_eager_loading(queryset)
+        rows = queryset.values(*values_serializer_class.fields)
+        self.assertEqual(
+            self.render(values_serializer_class.to_representation(list(rows))),
+            self.render(serializer_class(instances, many=True).data),
+        )
+
+    def test_forms(self):
+        self.assertRendersSame(
+            FormSerializer, FormValuesSerializer, Form.objects.order_by("id")
+        )
+
+    def test_submissions(self):
+        self.assertRendersSame(
+            SubmissionReadSerializer,
+            SubmissionValuesSerializer,
+            Submission.objects.order_by("form_id", "id"),
+        )
+
+    def test_compact_submissions(self):
+        self.assertRendersSame(
+            SubmissionCompactSerializer,
+            SubmissionCompactValuesSerializer,
+            Submission.objects.order_by("form_id", "id"),
+        )
+
+    def test_empty(self):
+        self.assertRendersSame(
+            FormSerializer, FormValuesSerializer, Form.objects.none()
+        )
+
+    def test_form_endpoints(self):
+        forms = FormSerializer.setup_eager_loading(Form.objects.order_by("id"))
+        data = FormSerializer(forms, many=True).data
+        response = self.client.get(reverse("forms-list"), {"format": "json"})
+        self.assertEqual(
+            response.content,
+            self.render(
+                OrderedDict([("next", None), ("previous", None), ("results", data)])
+            ),
+        )
+
+        response = self.client.get(
+            reverse("forms-detail", args=[self.forms[0].id]), {"format": "json"}
+        )
+        self.assertEqual(response.content, self.render(data[0]))
+
+    def test_submission_endpoints(self):
+        submissions = SubmissionReadSerializer.setup_eager_loading(
+            Submission.objects.order_by("form_id", "id")
+        )
+        data = SubmissionReadSerializer(submissions, many=True).data
+        response = self.client.get(reverse("submissions-list"), {"format": "json"})
+        self.assertEqual(
+            response.content,
+            self.render(
+                OrderedDict([("next", None), ("previous", None), ("results", data)])
+            ),
+        )
+
+        response = self.client.get(
+            reverse("submissions-detail", args=[data[0]["id"]]), {"format": "json"}
+        )
+        self.assertEqual(response.content, self.render(data[0]))
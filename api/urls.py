@@ -11,4 +11,5 @@ router.register(r"submissions", views.SubmissionViewSet, basename="submissions")
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("metrics", views.metrics, name="metrics"),
 ]
@@ -1,28 +1,474 @@
+import ipaddress
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 
 from .serializers import (
     FormSerializer,
+    FormValuesSerializer,
+    SubmissionBulkItemSerializer,
+    SubmissionCompactSerializer,
+    SubmissionCompactValuesSerializer,
     SubmissionReadSerializer,
+    SubmissionValuesSerializer,
     SubmissionWriteSerializer,
 )
+from .analytics import FormAnalytics, FormMatrix
+from .archive import submission_archive
+from .export import SubmissionExporter
+from .filters import MAX_INTEGER, MIN_INTEGER, SubmissionFilterBackend
+from .ingestion import submission_buffer
+from .metrics import render_metrics, timed
 from .models import Form, Submission
+from .pagination import FormPagination, SubmissionPagination
+from .profiling import request_profiler
+from .renderers import CSVRenderer, NDJSONRenderer
+from .replica import read_replica
+from .schema import get_form_schemas
+from .sharding import shards
+from .tallies import form_results
+from .writers import create_submissions
+
+
+class ValuesReadViewSetMixin:
+    """
+    Serves list and retrieve from `.values()` rows rendered by `get_values_serializer_class()`,
+    which outputs exactly what the read serializer would, without instantiating models or
+    serializer fields for every row.
+
+    `query_budget` declares the number of queries each read action may issue, regardless
+    of the number of rows returned. It is enforced by the test suite.
+    """
+
+    query_budget = {}
+
+    def get_values_serializer_class(self):
+        raise NotImplementedError
+
+    def get_values_queryset(self, serializer_class):
+        return self.filter_queryset(self.get_queryset()).values(
+            *serializer_class.fields
+        )
+
+    def get_values_querysets(self, serializer_class):
+        """
+        Returns the querysets whose rows are listed, of which the paginator merges one page.
+        """
+        return [self.get_values_queryset(serializer_class)]
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_values_serializer_class()
+        page = self.paginator.paginate_querysets(
+            self.get_values_querysets(serializer_class), request, view=self
+        )
+        with timed("serialize"):
+            data = serializer_class.to_representation(page)
+        return self.get_paginated_response(data)
+
+    def get_values_row(self, serializer_class):
+        return (
+            self.get_values_queryset(serializer_class)
+            .filter(pk=self.kwargs["pk"])
+            .first()
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer_class = self.get_values_serializer_class()
+        row = self.get_values_row(serializer_class)
+        if row is None:
+            raise NotFound()
+        with timed("serialize"):
+            [data] = serializer_class.to_representation([row])
+        return Response(data)
+
+
+class ProfilingViewSetMixin:
+    """
+    Profiles the DRF dispatch of the requests selected by `request_profiler`, see
+    api/profiling.py.
+    """
 
+    def dispatch(self, request, *args, **kwargs):
+        dispatch = super().dispatch
+        return request_profiler.profile(
+            request, lambda: dispatch(request, *args, **kwargs)
+        )
 
-class FormViewSet(viewsets.ModelViewSet):
+
+class ReplicaReadViewSetMixin:
+    """
+    Reads from the replica while serving safe requests, including their streamed content, and
+    pins clients which wrote to the default database, see api/replica.py.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code < 400:
+                read_replica.pin(response)
+            return response
+        if read_replica.is_pinned(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        with read_replica.reading():
+            response = super().dispatch(request, *args, **kwargs)
+        if response.streaming:
+            response.streaming_content = read_replica.stream(response.streaming_content)
+        return response
+
+
+class ConditionalRetrieveMixin:
+    """
+    Adds strong ETags and Last-Modified headers to retrieve responses, and answers conditional
+    requests with 304 Not Modified from `get_validators`, a single indexed lookup, without
+    loading the object.
+    """
+
+    def get_validators(self):
+        """
+        Returns the (etag, last modified datetime) of the requested object, or None if it does
+        not exist.
+        """
+        raise NotImplementedError
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        etag = quote_etag(etag)
+        last_modified = int(last_modified.timestamp())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class FormViewSet(
+    ProfilingViewSetMixin,
+    ReplicaReadViewSetMixin,
+    ConditionalRetrieveMixin,
+    ValuesReadViewSetMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Form.objects.all().order_by("id")
     http_method_names = ["get", "post", "put", "head"]
     serializer_class = FormSerializer
+    pagination_class = FormPagination
+    # forms, questions, choices
+    # retrieve: validators, forms, questions, choices
+    # results: forms, questions, choices, tallies
+    # analytics: forms, questions, choices, last answer id, new submissions, new answers. New
+    # answers are read in chunks of FormMatrix.chunk_size.
+    query_budget = {
+        "list": 3,
+        "retrieve": 4,
+        "retrieve_not_modified": 1,
+        "results": 4,
+        "analytics": 6,
+    }
+
+    def get_values_serializer_class(self):
+        return FormValuesSerializer
 
+    def get_validators(self):
+        validators = (
+            Form.objects.filter(id=self.kwargs["pk"])
+            .values_list("id", "revision", "updated_at")
+            .first()
+        )
+        if validators is None:
+            return None
+        form_id, revision, updated_at = validators
+        return f"form-{form_id}-{revision}", updated_at
 
-class SubmissionViewSet(viewsets.ModelViewSet):
-    queryset = Submission.objects.all().order_by("form_id")
+    @action(detail=True, methods=["get"])
+    def results(self, request, pk=None):
+        # Served from the tallies, without reading any submissions
+        return Response(form_results(self.get_object()))
+
+    @action(detail=True, methods=["get"])
+    def analytics(self, request, pk=None):
+        # Counted from the form's memory mapped answer matrix, after applying the answers written
+        # since it was last refreshed
+        matrix = FormMatrix(self.get_object().id).refresh()
+        return Response(FormAnalytics(matrix, request.query_params).get_results())
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="submissions/export",
+        renderer_classes=[CSVRenderer, NDJSONRenderer],
+    )
+    def export_submissions(self, request, pk=None):
+        # The renderer is picked from ?format=csv|ndjson by content negotiation, but rows are
+        # streamed directly rather than rendered from a fully built list.
+        exporter = SubmissionExporter(self.get_object())
+        export_format = request.accepted_renderer.format
+        rows = {"csv": exporter.csv, "ndjson": exporter.ndjson}[export_format]()
+
+        response = StreamingHttpResponse(
+            rows,
+            content_type=request.accepted_renderer.media_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="form-{pk}-submissions.{export_format}"'
+        )
+        return response
+
+
+class SubmissionViewSet(
+    ProfilingViewSetMixin,
+    ReplicaReadViewSetMixin,
+    ConditionalRetrieveMixin,
+    ValuesReadViewSetMixin,
+    viewsets.ModelViewSet,
+):
+    queryset = Submission.objects.all().order_by("form_id", "id")
     http_method_names = ["get", "post", "put", "head"]
+    pagination_class = SubmissionPagination
+    filter_backends = [SubmissionFilterBackend]
+    # On each shard: submissions, answers. Then forms, questions, choices
+    # With ?include=forms: the same
+    # retrieve: validators of the submission and form, submissions, answers, forms, questions,
+    # choices. Archived submissions are read from their segment files instead
+    query_budget = {
+        "list": 5,
+        "retrieve": 7,
+        "retrieve_not_modified": 2,
+        "list_include_forms": 5,
+    }
+
+    INCLUDE_QUERY_PARAM = "include"
+    SUPPORTED_INCLUDES = ("forms",)
+    INVALID_INCLUDE_MESSAGE = "Only the following can be included: forms"
 
     def get_serializer_class(self):
         method = self.request.method
         if method == "PUT" or method == "POST":
             return SubmissionWriteSerializer
+        elif self.action == "list" and "forms" in self.get_includes():
+            return SubmissionCompactSerializer
         else:
             return SubmissionReadSerializer
+
+    def get_values_serializer_class(self):
+        if self.action == "list" and "forms" in self.get_includes():
+            return SubmissionCompactValuesSerializer
+        return SubmissionValuesSerializer
+
+    def get_queryset(self):
+        # Submissions are read from the shard given by their id, see api/sharding.py
+        if "pk" not in self.kwargs:
+            return super().get_queryset()
+        alias = shards.for_submission(self.kwargs["pk"])
+        if alias is None:
+            return self.queryset.none()
+        return self.queryset.using(shards.for_read(alias))
+
+    def get_values_querysets(self, serializer_class):
+        # Pages are merged from every shard which may store the listed submissions, and from
+        # the archive
+        filter_backend = SubmissionFilterBackend()
+        return [
+            *[
+                self.filter_queryset(
+                    self.queryset.using(shards.for_read(alias))
+                ).values(*serializer_class.fields)
+                for alias in filter_backend.get_shards(self.request)
+            ],
+            submission_archive.select(**filter_backend.get_filters(self.request)),
+        ]
+
+    def get_values_row(self, serializer_class):
+        row = super().get_values_row(serializer_class)
+        if row is None:
+            row = submission_archive.get(self.kwargs["pk"])
+            # The archive of a deleted form is deleted once the form's deletion commits
+            if row is not None and not Form.objects.filter(id=row["form_id"]).exists():
+                return None
+        return row
+
+    def get_validators(self):
+        # The response nests the form, so the validators cover both the submission and form
+        validators = (
+            self.get_queryset()
+            .filter(id=self.kwargs["pk"])
+            .values_list("id", "revision", "updated_at", "form_id")
+            .first()
+        )
+        if validators is None:
+            row = submission_archive.get(self.kwargs["pk"])
+            if row is None:
+                return None
+            validators = (row["id"], row["revision"], row["updated_at"], row["form_id"])
+        submission_id, revision, updated_at, form_id = validators
+        form_validators = (
+            Form.objects.filter(id=form_id)
+            .values_list("revision", "updated_at")
+            .first()
+        )
+        if form_validators is None:
+            return None
+        form_revision, form_updated_at = form_validators
+        return (
+            f"submission-{submission_id}-{revision}-form-{form_id}-{form_revision}",
+            max(updated_at, form_updated_at),
+        )
+
+    def create(self, request, *args, **kwargs):
+        # Clients opt in to buffered writes with the `Prefer: respond-async` header (RFC 7240)
+        if "respond-async" not in request.headers.get("Prefer", ""):
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        form = serializer.validated_data["form_id"]
+        ticket = submission_buffer.submit(
+            (
+                form.id,
+                form.version,
+                serializer.form_questions,
+                serializer.validated_data["answers"],
+            )
+        )
+        return Response(
+            {"ticket": ticket, "status": submission_buffer.QUEUED},
+            status=status.HTTP_202_ACCEPTED,
+            headers={
+                "Location": request.build_absolute_uri(
+                    reverse("submissions-ticket", args=[ticket])
+                )
+            },
+        )
+
+    @action(detail=False, methods=["get"], url_path=r"tickets/(?P<ticket>[0-9a-f]{32})")
+    def ticket(self, request, ticket=None):
+        ticket_status = submission_buffer.get_status(ticket)
+        if ticket_status is None:
+            raise NotFound()
+        return Response(ticket_status)
+
+    def get_includes(self):
+        param = self.request.query_params.get(self.INCLUDE_QUERY_PARAM)
+        if not param:
+            return []
+        includes = param.split(",")
+        if any(include not in self.SUPPORTED_INCLUDES for include in includes):
+            raise ValidationError(
+                {self.INCLUDE_QUERY_PARAM: [self.INVALID_INCLUDE_MESSAGE]}
+            )
+        return includes
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if "forms" in self.get_includes():
+            form_ids = {
+                submission["form_id"] for submission in response.data["results"]
+            }
+            response.data["forms"] = self.get_included_forms(form_ids)
+        return response
+
+    BULK_NOT_A_LIST_MESSAGE = "Expected a list of submissions!"
+    BULK_TOO_LARGE_MESSAGE = "At most 1000 submissions can be uploaded at once!"
+    MAX_BULK_SIZE = 1000
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({"non_field_errors": [self.BULK_NOT_A_LIST_MESSAGE]})
+        if len(items) > self.MAX_BULK_SIZE:
+            raise ValidationError({"non_field_errors": [self.BULK_TOO_LARGE_MESSAGE]})
+
+        # Load the schemas of every form in the upload at once, then validate each item
+        # Invalid form ids, including ones out of range of the id column, fail their item's
+        # validation instead
+        form_ids = set()
+        for item in items:
+            try:
+                form_id = int(item["form_id"])
+            except (TypeError, KeyError, ValueError):
+                continue
+            if MIN_INTEGER <= form_id <= MAX_INTEGER:
+                form_ids.add(form_id)
+        context = {"schemas_by_form": get_form_schemas(form_ids)}
+        item_serializers = [
+            SubmissionBulkItemSerializer(data=item, context=context) for item in items
+        ]
+        valid = [serializer for serializer in item_serializers if serializer.is_valid()]
+
+        submissions = create_submissions(
+            [
+                (
+                    data["form_id"],
+                    data["schema"].version,
+                    data["schema"].questions,
+                    data["answers"],
+                )
+                for data in (serializer.validated_data for serializer in valid)
+            ]
+        )
+        submission_ids = iter(submission.id for submission in submissions)
+
+        results = [
+            (
+                {"id": next(submission_ids)}
+                if not serializer.errors
+                else {"errors": serializer.errors}
+            )
+            for serializer in item_serializers
+        ]
+        return Response(
+            results,
+            status=(
+                status.HTTP_201_CREATED
+                if len(valid) == len(item_serializers)
+                else status.HTTP_207_MULTI_STATUS
+            ),
+        )
+
+    def get_included_forms(self, form_ids):
+        # Each distinct form is serialized once per response, keyed by its id
+        rows = (
+            Form.objects.filter(id__in=form_ids)
+            .order_by("id")
+            .values(*FormValuesSerializer.fields)
+        )
+        with timed("serialize"):
+            forms = FormValuesSerializer.to_representation(rows)
+        return {str(form["id"]): form for form in forms}
+
+
+def metrics(request):
+    # Only served to the scrapers of METRICS_ALLOWED_NETWORKS, as route timings and query counts
+    # reveal how the service is used
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        address = None
+    if address is None or not any(
+        address in ipaddress.ip_network(network)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+    ):
+        return HttpResponseForbidden()
+
+    # Aggregated by each server process, which is scraped separately
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,241 @@
+from django.db import router, transaction
+
+from api.answers import typed_answer
+from api.models import Answer, Choice, Question, Submission
+from api.sharding import shards
+from api.sqlite import retry_on_busy
+from api.tallies import apply_tally_deltas, count_answers
+
+
+def bulk_create_with_pks(model, objs, using=None):
+    """
+    Inserts `objs` with bulk_create into the `using` database, or the model's default one, and
+    sets their primary keys.
+
+    Backends that cannot return rows from a bulk insert (SQLite before Django 4.0) get their keys
+    read back after the insert. This is safe as the insert and the read happen in one
+    transaction, which holds SQLite's write lock, and AUTOINCREMENT keys are assigned in order.
+    Other databases which cannot return rows fail the api.E002 system check.
+    """
+    using = using or router.db_for_write(model)
+
+    with transaction.atomic(using=using):
+        objs = model._base_manager.using(using).bulk_create(objs)
+        if not objs or objs[0].pk is not None:
+            return objs
+
+        pks = (
+            model._base_manager.using(using)
+            .order_by("-pk")
+            .values_list("pk", flat=True)[: len(objs)]
+        )
+        for obj, pk in zip(objs, reversed(pks)):
+            obj.pk = pk
+            obj._state.adding = False
+            obj._state.db = using
+
+    return objs
+
+
+def create_questions(form, questions):
+    """
+    Creates the questions of a form and all of their choices, with one bulk insert for each
+    table regardless of the number of questions. The questions are added in the current
+    version of the form.
+
+    `questions` are validated question dicts, each with an optional list of choice dicts.
+    """
+    with transaction.atomic():
+        question_instances = bulk_create_with_pks(
+            Question,
+            [
+                Question(
+                    form_id=form,
+                    added_in_version=form.version,
+                    **{
+                        field: value
+                        for field, value in question.items()
+                        if field not in ("id", "choices")
+                    },
+                )
+                for question in questions
+            ],
+        )
+        Choice.objects.bulk_create(
+            [
+                Choice(question_id=question_instance, **choice)
+                for question_instance, question in zip(question_instances, questions)
+                for choice in question.get("choices", [])
+            ]
+        )
+    return question_instances
+
+
+def update_questions(form, questions):
+    """
+    Updates the questions of a form to the given validated question dicts, touching only the
+    rows that changed.
+
+    Questions are matched by their id, if given, and otherwise by display_order. A question
+    without an id whose text is that of another current question is matched to that question,
+    as it was moved. Changes to question or choice text are made in place. Any other change to
+    a question (its display_order, its type or its choice_ids) or adding or removing a question
+    changes the answer schema. The form then moves to a new version, in which changed questions
+    are recreated, and previous questions are kept for the existing submissions.
+
+    Returns whether a new version was started. The form instance is not saved.
+    """
+    current_questions = list(
+        Question.objects.filter(form_id=form).prefetch_related("choices")
+    )
+    by_id = {question.id: question for question in current_questions}
+    by_display_order = {
+        question.display_order: question for question in current_questions
+    }
+    by_text = {question.question: question for question in current_questions}
+    matched_ids = set()
+    retired_questions, new_questions = [], []
+    changed_questions, changed_choices = [], []
+
+    def match(question):
+        if "id" in question:
+            return by_id.get(question["id"])
+        existing = by_display_order.get(question["display_order"])
+        if existing is None or existing.question != question["question"]:
+            existing = by_text.get(question["question"], existing)
+        return existing
+
+    for question in questions:
+        existing = match(question)
+        if existing is not None and existing.id in matched_ids:
+            existing = None
+        if existing is not None:
+            matched_ids.add(existing.id)
+        choices = {
+            choice["choice_id"]: choice for choice in question.get("choices", [])
+        }
+        existing_choices = (
+            {choice.choice_id: choice for choice in existing.choices.all()}
+            if existing
+            else {}
+        )
+
+        if (
+            existing is None
+            or existing.display_order != question["display_order"]
+            or existing.question_type != question["question_type"]
+            or existing_choices.keys() != choices.keys()
+        ):
+            if existing is not None:
+                retired_questions.append(existing)
+            new_questions.append(question)
+            continue
+
+        if existing.question != question["question"]:
+            existing.question = question["question"]
+            changed_questions.append(existing)
+        for choice_id, choice in choices.items():
+            if existing_choices[choice_id].choice != choice["choice"]:
+                existing_choices[choice_id].choice = choice["choice"]
+                changed_choices.append(existing_choices[choice_id])
+
+    # Questions which are no longer given are removed
+    retired_questions += [
+        question for question in current_questions if question.id not in matched_ids
+    ]
+    schema_changed = bool(retired_questions or new_questions)
+
+    with transaction.atomic():
+        Question.objects.bulk_update(changed_questions, ["question"])
+        Choice.objects.bulk_update(changed_choices, ["choice"])
+
+        if schema_changed:
+            form.version += 1
+            Question.objects.filter(
+                id__in=[question.id for question in retired_questions]
+            ).update(removed_in_version=form.version)
+            create_questions(form, new_questions)
+
+    return schema_changed
+
+
+@retry_on_busy
+def create_submissions(entries):
+    """
+    Creates a submission for each (form id, form version, questions, answers) entry, with one
+    bulk insert for the submissions and one for all of their answers on each shard, in one
+    transaction per shard. Returns the submissions in the order of `entries`.
+
+    `questions` are the (question id, question type) pairs of the form version in
+    display_order, and `answers` are the validated answers in the same order. The tallies of
+    the answers are incremented in the same transaction.
+    """
+    indexes_by_shard = shards.group_forms(
+        range(len(entries)), key=lambda i: entries[i][0]
+    )
+    submissions = [None] * len(entries)
+    for alias, indexes in indexes_by_shard.items():
+        shard_entries = [entries[i] for i in indexes]
+        with transaction.atomic(using=alias):
+            shard_submissions = bulk_create_with_pks(
+                Submission,
+                [
+                    Submission(form_id_id=form_id, form_version=form_version)
+                    for form_id, form_version, _, _ in shard_entries
+                ],
+                using=alias,
+            )
+            answer_instances = [
+                answer
+                for submission, (_, _, questions, answers) in zip(
+                    shard_submissions, shard_entries
+                )
+                for answer in build_answers(submission, questions, answers)
+            ]
+            Answer.objects.using(alias).bulk_create(answer_instances)
+
+            apply_tally_deltas(count_answers(answer_instances), using=alias)
+        for i, submission in zip(indexes, shard_submissions):
+            submissions[i] = submission
+    return submissions
+
+
+@retry_on_busy
+def replace_answers(submission, questions, answers):
+    """
+    Replaces the answers of a submission with one delete and one bulk insert, and applies the
+    difference between the old and new answers to the tallies.
+    """
+    using = submission._state.db
+    with transaction.atomic(using=using):
+        submission_answers = Answer.objects.using(using).filter(
+            submission_id=submission
+        )
+        previous_answers = submission_answers.only(
+            "question_id", "choice_id", "choice_mask"
+        )
+        deltas = {key: -count for key, count in count_answers(previous_answers).items()}
+
+        submission_answers.delete()
+        answer_instances = build_answers(submission, questions, answers)
+        Answer.objects.using(using).bulk_create(answer_instances)
+
+        for key, count in count_answers(answer_instances).items():
+            deltas[key] = deltas.get(key, 0) + count
+        apply_tally_deltas(deltas, using=using)
+
+
+def build_answers(submission, questions, answers):
+    answer_instances = []
+    for (question_id, question_type), answer in zip(questions, answers):
+        choice_id, choice_mask = typed_answer(question_type, answer["answer"])
+        answer_instances.append(
+            Answer(
+                question_id_id=question_id,
+                answer=answer["answer"],
+                choice_id=choice_id,
+                choice_mask=choice_mask,
+                submission_id=submission,
+            )
+        )
+    return answer_instances
@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that the timings it reports cover every other middleware
+    "api.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -79,7 +81,152 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        # Seconds a connection is reused for, instead of connecting for every request
+        "CONN_MAX_AGE": 60,
+    },
+    # Serves the reads of safe requests, see api/replica.py. This SQLite copy of the default
+    # database is a stand-in, kept up to date by `manage.py sync_replica`
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.replica.sqlite3",
+        "CONN_MAX_AGE": 60,
+        "TEST": {"MIRROR": "default"},
+    },
+    # Shards for submissions, see SUBMISSION_SHARDS. Migrated with `migrate --database`
+    "shard_1": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.shard_1.sqlite3",
+        "CONN_MAX_AGE": 60,
+    },
+    "shard_2": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.shard_2.sqlite3",
+        "CONN_MAX_AGE": 60,
+    },
+}
+
+DATABASE_ROUTERS = ["api.sharding.ShardRouter", "api.replica.ReplicaRouter"]
+
+# Databases storing submissions, answers and tallies, see api/sharding.py. Forms, questions and
+# choices are stored in the default database
+SUBMISSION_SHARDS = {
+    # e.g. ["shard_1", "shard_2"]. Forms are assigned to shards by a hash of their id, so
+    # existing submissions must be moved when the shards change
+    "ALIASES": ["default"],
+    # Size of the range of submission and answer ids allocated by each shard, within the
+    # integers exactly representable in JSON clients
+    "ID_OFFSET": 2**40,
+}
+
+READ_REPLICA = {
+    # Database alias of the replica, or None to read everything from the default database
+    "ALIAS": "replica",
+    # Seconds for which a client which wrote reads from the default database, which should
+    # exceed the replication lag
+    "STICKY_SECONDS": 10,
+    "COOKIE_NAME": "read_primary",
+}
+
+# Set on every SQLite connection, see api/sqlite.py
+SQLITE_PRAGMAS = {
+    # Readers do not block the writer, nor the writer readers, and commits append to the
+    # write-ahead log rather than rewriting pages through a rollback journal
+    "journal_mode": "wal",
+    # Only fsyncs at checkpoints. A power loss may roll back the last commits, but cannot
+    # corrupt the database
+    "synchronous": "normal",
+    # Milliseconds to wait for the write lock before failing with "database is locked"
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    # Negative sizes are in KiB, i.e. 64 MiB
+    "cache_size": -64 * 1024,
+    "temp_store": "memory",
+}
+
+# Write transactions which fail with "database is locked", see api/sqlite.py
+SQLITE_BUSY_RETRY = {
+    # Attempts in total, including the first one
+    "ATTEMPTS": 5,
+    # Seconds, doubled after each attempt, up to MAX_BACKOFF
+    "BACKOFF": 0.01,
+    "MAX_BACKOFF": 0.5,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# NOTE: Use a cache shared between processes, such as Memcached or Redis, when running more
+# than one process.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Shared by the processes of one host. Deployments over several hosts point it to a
+    # memcached or Redis server instead.
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+    },
+}
+
+# Compiled form schemas used to validate submissions, see api/schema.py
+FORM_SCHEMA_CACHE = {
+    # Number of schemas kept in each process
+    "MAX_SIZE": 1024,
+    # Cache shared between processes, which also holds the generation tokens which invalidate
+    # the schemas kept by every process
+    "CACHE_ALIAS": "shared",
+    "TIMEOUT": 60 * 60,
+}
+
+SUBMISSION_BUFFER = {
+    # Number of submissions waiting to be written, past which submissions are refused
+    "MAX_SIZE": 10000,
+    # Number of submissions written per transaction
+    "BATCH_SIZE": 500,
+    # Seconds the writer waits for submissions before checking for shutdown
+    "FLUSH_INTERVAL": 0.5,
+    # Cache shared between processes which holds ticket statuses. Process-local caches fail the
+    # system checks, as a ticket may be looked up by another process than the one writing it.
+    "CACHE_ALIAS": "shared",
+    "TICKET_TIMEOUT": 60 * 60,
+}
+
+# Addresses or networks of the Prometheus scrapers allowed to GET /metrics. Behind a proxy,
+# REMOTE_ADDR is the address of the proxy, which must then keep /metrics internal.
+METRICS_ALLOWED_NETWORKS = ["127.0.0.1/32", "::1/128"]
+
+# Number of threads which run the database reads of the asynchronous read endpoints
+ASYNC_READ_WORKERS = 8
+
+# Directory of the memory mapped answer matrices used by form analytics
+ANALYTICS_ROOT = BASE_DIR / "analytics"
+
+# Submissions of closed forms moved out of the database by `manage.py archive_form`, see
+# api/archive.py
+SUBMISSION_ARCHIVE = {
+    "ROOT": BASE_DIR / "archive",
+    # Number of submissions compressed together. A whole block is read to serve any of them
+    "BLOCK_SIZE": 256,
+    # Bytes past which blocks are appended to a new segment file
+    "SEGMENT_SIZE": 64 * 1024 * 1024,
+    # Number of decoded blocks kept in each process
+    "CACHE_BLOCKS": 256,
+    # Number of archived submissions deleted from the database per transaction
+    "DELETE_CHUNK_SIZE": 500,
+}
+
+# Profiles of requests to the forms and submissions endpoints, see api/profiling.py
+REQUEST_PROFILING = {
+    "ROOT": BASE_DIR / "profiles",
+    # Profiles one in every SAMPLE_RATE requests of each process. 0 only profiles requests
+    # with a signed X-Profile header
+    "SAMPLE_RATE": 0,
+    # Number of profiles kept, past which the oldest are deleted
+    "MAX_PROFILES": 200,
+    # Seconds for which a token from `manage.py profiles --token` is accepted
+    "TOKEN_MAX_AGE": 60 * 60,
 }
 
 
@@ -18,5 +18,6 @@ from django.urls import path, include
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("async/", include("api.async_urls")),
     path("", include("api.urls")),
 ]